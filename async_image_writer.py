@@ -0,0 +1,218 @@
+"""
+Async Image Writer Module
+Encodes rendered frames to PNG in helper processes while the next frame renders.
+
+With write_still=True Blender deflates every 16-bit PNG on the render thread
+before the next render can start. In async mode the v7 script renders without
+writing, reads the composited linear pixels from a Viewer node and hands them
+to AsyncImageWriter: the raw float buffer is dumped as .npy into a queue
+directory and a long-lived helper process (`python async_image_writer.py`,
+NumPy + zlib, no bpy) applies the sRGB transfer, quantizes and writes the PNG.
+Helpers run outside Blender, so encoding does not compete with the render for
+the GIL.
+
+Backpressure: at most max_pending frames are queued; submit() waits for the
+helpers once the queue is full, so memory and queue size stay bounded when
+encoding falls behind. Work that depends on a file being complete (render
+cache store, manifest entry) is registered with when_written() and runs once
+the helper has published the file; a frame whose encoding fails never runs
+its callbacks.
+"""
+
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from pattern_synthesis import linear_to_srgb
+
+_SCRIPT_PATH = os.path.abspath(__file__)
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_COLOR_TYPES = {1: 0, 3: 2, 4: 6}
+# Rec.709 亮度系数 (Blender 默认色彩管理下保存 BW 图像所用的系数)
+_REC709_LUMA = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+FAILED_SUFFIX = ".failed"
+
+
+def _png_chunk(chunk_type, data):
+    return (struct.pack(">I", len(data)) + chunk_type + data +
+            struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def encode_png(filepath, pixels, bit_depth=16, compression=15):
+    """
+    Writes (H, W, C) integer pixels, row 0 at the top, as PNG.
+
+    Args:
+        bit_depth: 8 or 16
+        compression: Blender's 0-100 PNG compression setting
+    """
+    height, width, channels = pixels.shape
+    dtype = ">u2" if bit_depth == 16 else "u1"
+    rows = np.ascontiguousarray(pixels, dtype=dtype).reshape(height, width * channels).view(np.uint8)
+    # 每行前加滤波类型字节 0 (None)
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rows], axis=1)
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, _PNG_COLOR_TYPES[channels], 0, 0, 0)
+    level = min(9, max(0, int(round(compression * 9 / 100.0))))
+
+    tmp_path = f"{filepath}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PNG_SIGNATURE)
+        f.write(_png_chunk(b"IHDR", header))
+        f.write(_png_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)))
+        f.write(_png_chunk(b"IEND", b""))
+    os.replace(tmp_path, filepath)
+
+
+def quantize_linear_pixels(linear_rgba, channels=3, bit_depth=16):
+    """
+    Blender RGBA float pixels (scene linear, row 0 at the bottom) -> (H, W,
+    channels) display-encoded integers, row 0 at the top ('Standard' view
+    transform, i.e. the plain sRGB curve). channels=1 stores the Rec.709 luma
+    of the display-encoded color, as Blender does when saving BW images.
+    """
+    pixels = np.asarray(linear_rgba, dtype=np.float32)[::-1]
+    encoded = np.array(pixels)
+    encoded[..., :3] = linear_to_srgb(pixels[..., :3])
+    if channels == 1:
+        encoded = (encoded[..., :3] @ _REC709_LUMA)[..., np.newaxis]
+    else:
+        encoded = encoded[..., :channels]
+    maximum = 65535 if bit_depth == 16 else 255
+    return np.round(np.clip(encoded, 0.0, 1.0) * maximum).astype(np.uint16 if bit_depth == 16 else np.uint8)
+
+
+def image_pixels(image):
+    """(H, W, 4) float32 pixels of a bpy image (e.g. the compositor's 'Viewer Node')"""
+    width, height = image.size
+    buffer = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(buffer)
+    return buffer.reshape(height, width, 4)
+
+
+def encode_job(job):
+    """Encodes one queued frame; the .npy is removed once the PNG is in place"""
+    pixels = np.load(job["pixels"])
+    encode_png(job["output"], quantize_linear_pixels(pixels, job["channels"], job["bit_depth"]),
+               job["bit_depth"], job["compression"])
+    os.remove(job["pixels"])
+
+
+class AsyncImageWriter:
+    """Bounded queue of frames encoded by helper processes"""
+
+    def __init__(self, queue_dir=None, workers=2, max_pending=8, python_executable=None):
+        self.queue_dir = tempfile.mkdtemp(prefix="async_write_", dir=queue_dir)
+        self.max_pending = max(1, int(max_pending))
+        self.written = 0
+        self.failed = 0
+        self._jobs = {}
+        self._callbacks = []
+        self._submitted = 0
+        self._workers = [subprocess.Popen([python_executable or sys.executable, _SCRIPT_PATH],
+                                          stdin=subprocess.PIPE)
+                         for _ in range(max(1, int(workers)))]
+
+    @property
+    def pending_count(self):
+        return len(self._jobs)
+
+    def submit(self, linear_rgba, output_path, channels=3, bit_depth=16, compression=15):
+        """Queues one frame (waits while max_pending frames are queued)"""
+        if os.path.abspath(output_path) in self._jobs:
+            # 同一文件的上一帧尚未写完，先等待，避免两个进程同时写
+            self.flush()
+        while len(self._jobs) >= self.max_pending:
+            self.poll()
+            if len(self._jobs) >= self.max_pending:
+                time.sleep(0.005)
+
+        worker_index = self._submitted % len(self._workers)
+        npy_path = os.path.join(self.queue_dir, f"{self._submitted}.npy")
+        self._submitted += 1
+        np.save(npy_path, np.asarray(linear_rgba, dtype=np.float32))
+        job = {"pixels": npy_path, "output": output_path, "channels": channels,
+               "bit_depth": int(bit_depth), "compression": int(compression)}
+        worker = self._workers[worker_index]
+        worker.stdin.write((json.dumps(job, ensure_ascii=False) + "\n").encode('utf-8'))
+        worker.stdin.flush()
+        self._jobs[os.path.abspath(output_path)] = (npy_path, worker_index)
+
+    def when_written(self, output_paths, callback):
+        """Runs callback now if no output is queued, otherwise once all of them are written"""
+        waiting = {os.path.abspath(path) for path in output_paths} & set(self._jobs)
+        if not waiting:
+            callback()
+        else:
+            self._callbacks.append((waiting, callback))
+
+    def poll(self):
+        """Collects finished frames and runs the callbacks that became ready"""
+        failed_paths = set()
+        for output_path, (npy_path, worker_index) in list(self._jobs.items()):
+            if os.path.exists(npy_path):
+                if self._workers[worker_index].poll() is None:
+                    continue
+                # 辅助进程已退出，队列中的帧不会再被处理
+                os.remove(npy_path)
+                failed_paths.add(output_path)
+            elif os.path.exists(npy_path + FAILED_SUFFIX):
+                os.remove(npy_path + FAILED_SUFFIX)
+                failed_paths.add(output_path)
+            else:
+                self.written += 1
+            del self._jobs[output_path]
+
+        for output_path in failed_paths:
+            self.failed += 1
+            print(f"   警告：后台编码失败: {output_path}")
+        ready = []
+        remaining = []
+        for waiting, callback in self._callbacks:
+            if waiting & failed_paths:
+                continue
+            waiting &= set(self._jobs)
+            (remaining if waiting else ready).append((waiting, callback))
+        self._callbacks = remaining
+        for _, callback in ready:
+            callback()
+
+    def flush(self):
+        """Waits until every queued frame is written"""
+        while self._jobs:
+            self.poll()
+            if self._jobs:
+                time.sleep(0.01)
+        self.poll()
+
+    def close(self):
+        self.flush()
+        for worker in self._workers:
+            worker.stdin.close()
+            worker.wait()
+        shutil.rmtree(self.queue_dir, ignore_errors=True)
+
+
+def main():
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        job = json.loads(line.decode('utf-8'))
+        try:
+            encode_job(job)
+        except Exception as e:
+            print(f"编码失败 {job.get('output')}: {e}", file=sys.stderr, flush=True)
+            if os.path.exists(job["pixels"]):
+                os.replace(job["pixels"], job["pixels"] + FAILED_SUFFIX)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Blender Autotune Module
+Benchmarks (workers, threads per worker, tile size, CPU affinity) combinations
+on this host and stores the fastest one for the orchestrator.
+
+Usage:
+    python blender_autotune.py <config.json> [--stl-sample 4] [--pattern-sample 3]
+        [--workers 1,2,4] [--threads 0] [--tiles 0,256,2048] [--affinity off,on]
+        [--max-rss-mb 0]
+
+Every combination renders the same sample of STLs and patterns into a
+temporary folder; images per minute and peak RSS of all Blender processes are
+recorded. RSS needs psutil or /proc; without either it is recorded as
+unmeasured (None) and a --max-rss-mb budget is refused instead of passing. The best profile is saved per host to PROFILE_STORE_PATH, and
+generate_dataset() uses it when advanced.workers is "auto".
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from blender_worker_pool import BlenderWorkerPool, default_threads_per_worker, list_stl_files
+
+PROFILE_STORE_PATH = os.path.join(os.path.expanduser("~"), ".blender_tool", "autotune_profiles.json")
+PATTERN_IMAGE_EXTENSIONS = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff")
+
+
+def host_key():
+    """Profiles are only valid for the machine (and core count) they were measured on"""
+    return f"{socket.gethostname()}-{os.cpu_count() or 1}cpu"
+
+
+def _load_store(path):
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_host_profile(path=PROFILE_STORE_PATH):
+    """Returns the best stored profile for this host, or None"""
+    return _load_store(path).get(host_key())
+
+
+def save_host_profile(profile, path=PROFILE_STORE_PATH):
+    store = _load_store(path)
+    store[host_key()] = profile
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def candidate_grid(worker_counts, thread_counts, tile_sizes, affinities):
+    """
+    Expands the grid into profile dicts. Thread count 0 means "share the cores
+    evenly"; combinations that resolve to the same profile are measured once.
+    """
+    grid = []
+    seen = set()
+    for workers, threads, tile_size, affinity in itertools.product(
+            worker_counts, thread_counts, tile_sizes, affinities):
+        profile = {
+            "workers": int(workers),
+            "threads_per_worker": int(threads) or default_threads_per_worker(int(workers)),
+            "tile_size": int(tile_size) or None,
+            "cpu_affinity": bool(affinity),
+        }
+        key = tuple(sorted(profile.items()))
+        if key not in seen:
+            seen.add(key)
+            grid.append(profile)
+    return grid
+
+
+def select_best_profile(results, max_rss_mb=0):
+    """Fastest successful result, optionally within a peak memory budget (unmeasured RSS never fits one)"""
+    candidates = [r for r in results if r.get("success")]
+    if max_rss_mb:
+        candidates = [r for r in candidates
+                      if r.get("peak_rss_mb") is not None and r["peak_rss_mb"] <= max_rss_mb]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda r: r["images_per_minute"])
+
+
+def _process_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _child_pids(pid):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _import_psutil():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+def rss_measurable():
+    """True if descendant_rss_bytes() can measure anything on this host (psutil or Linux /proc)"""
+    return _import_psutil() is not None or os.path.isfile(f"/proc/{os.getpid()}/status")
+
+
+def descendant_rss_bytes():
+    """Total RSS of all processes started by this one (psutil if installed, else /proc); None if unmeasurable"""
+    psutil = _import_psutil()
+    if psutil is not None:
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    if not rss_measurable():
+        return None
+
+    total = 0
+    pending = _child_pids(os.getpid())
+    while pending:
+        pid = pending.pop()
+        total += _process_rss_bytes(pid)
+        pending.extend(_child_pids(pid))
+    return total
+
+
+class PeakRssSampler:
+    """Polls the summed RSS of all child processes and keeps the peak (None when RSS is unmeasurable)"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_bytes = 0 if rss_measurable() else None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while self.peak_bytes is not None and not self._stop.is_set():
+            rss_bytes = descendant_rss_bytes()
+            if rss_bytes is None:
+                self.peak_bytes = None
+                break
+            self.peak_bytes = max(self.peak_bytes, rss_bytes)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def count_rendered_images(output_root):
+    return sum(len(glob.glob(os.path.join(root, "*.png"))) for root, _, _ in os.walk(output_root))
+
+
+def _copy_pattern_sample(pattern_folder, sample_size, destination):
+    pattern_files = []
+    for ext in PATTERN_IMAGE_EXTENSIONS:
+        pattern_files.extend(glob.glob(os.path.join(pattern_folder, ext)))
+    pattern_files.sort()
+    os.makedirs(destination, exist_ok=True)
+    for path in pattern_files[:sample_size]:
+        shutil.copy2(path, destination)
+    return destination
+
+
+def benchmark_profile(integration, mapped_config, stl_files, pattern_folder, profile):
+    """Renders the sample with one profile and returns the measurement dict"""
+    logger = logging.getLogger(__name__)
+    result = dict(profile)
+    with tempfile.TemporaryDirectory(prefix="blender_autotune_") as output_root:
+        config = json.loads(json.dumps(mapped_config))
+        config.setdefault("paths", {})["output_folder"] = output_root
+        config["paths"]["pattern_folder"] = pattern_folder
+
+        pool = BlenderWorkerPool(integration, profile["workers"], profile["threads_per_worker"],
+                                 tile_size=profile["tile_size"], cpu_affinity=profile["cpu_affinity"])
+        start_time = time.perf_counter()
+        try:
+            with PeakRssSampler() as sampler:
+                pool.run(config, stl_files=stl_files)
+            result["success"] = True
+        except Exception as e:
+            logger.error(f"配置 {profile} 执行失败: {e}")
+            result["success"] = False
+            result["error"] = str(e)
+        elapsed = time.perf_counter() - start_time
+
+        image_count = count_rendered_images(output_root)
+        result["seconds"] = round(elapsed, 2)
+        result["images"] = image_count
+        result["images_per_minute"] = round(image_count / elapsed * 60.0, 2) if elapsed > 0 else 0.0
+        result["peak_rss_mb"] = (round(sampler.peak_bytes / (1024 * 1024), 1)
+                                 if sampler.peak_bytes is not None else None)
+    logger.info(f"{profile} -> {result['images_per_minute']} 张/分钟, 峰值内存 "
+                f"{_format_rss(result['peak_rss_mb'])}")
+    return result
+
+
+def _format_rss(peak_rss_mb):
+    return "未测量" if peak_rss_mb is None else f"{peak_rss_mb} MB"
+
+
+def run_autotune(config, stl_sample=4, pattern_sample=3, worker_counts=(1, 2, 4), thread_counts=(0,),
+                 tile_sizes=(0,), affinities=(False,), max_rss_mb=0, store_path=PROFILE_STORE_PATH):
+    """
+    Benchmarks the grid and stores the best profile for this host.
+
+    Returns:
+        dict: {"best": profile or None, "results": [...]}
+    """
+    from blender_mcp_integration import BlenderMCPIntegration
+
+    logger = logging.getLogger(__name__)
+    if max_rss_mb and not rss_measurable():
+        raise RuntimeError("无法测量进程内存 (未安装psutil且没有/proc)，不能使用内存上限；"
+                           "请安装psutil (pip install psutil) 或去掉 --max-rss-mb")
+    advanced = config.get("advanced", {})
+    integration = BlenderMCPIntegration(advanced.get("blender_path", "blender"))
+    mapped_config = integration._map_config_keys(config)
+    mapped_config["workers"] = 1
+
+    stl_files = list_stl_files(config.get("paths", {}).get("stl_folder", ""))[:stl_sample]
+    if not stl_files:
+        raise FileNotFoundError("STL模型文件夹中没有找到STL文件，无法调优")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="blender_autotune_patterns_") as pattern_dir:
+        _copy_pattern_sample(config.get("paths", {}).get("pattern_folder", ""), pattern_sample, pattern_dir)
+        grid = candidate_grid(worker_counts, thread_counts, tile_sizes, affinities)
+        logger.info(f"自动调优: {len(stl_files)} 个STL, {pattern_sample} 个图案, {len(grid)} 种组合")
+        for profile in grid:
+            results.append(benchmark_profile(integration, mapped_config, stl_files, pattern_dir, profile))
+
+    best = select_best_profile(results, max_rss_mb)
+    if best:
+        best = dict(best, measured_at=time.strftime("%Y-%m-%d %H:%M:%S"), host=host_key())
+        best.pop("success", None)
+        save_host_profile(best, store_path)
+        logger.info(f"最佳配置已保存到 {store_path}: {best}")
+    else:
+        logger.error("没有成功的配置，未保存调优结果")
+    integration.shutdown()
+    return {"best": best, "results": results}
+
+
+def _int_list(text):
+    return [int(item) for item in text.split(",") if item.strip()]
+
+
+def _bool_list(text):
+    return [item.strip().lower() in ("1", "on", "true", "yes") for item in text.split(",") if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为本机自动选择 Blender 并行进程数/线程数/分块大小")
+    parser.add_argument("config", help="GUI 保存的配置文件 (JSON)")
+    parser.add_argument("--stl-sample", type=int, default=4)
+    parser.add_argument("--pattern-sample", type=int, default=3)
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--threads", type=_int_list, default=[0], help="0 = 平均分配CPU核心")
+    parser.add_argument("--tiles", type=_int_list, default=[0], help="0 = Blender默认分块")
+    parser.add_argument("--affinity", type=_bool_list, default=[False])
+    parser.add_argument("--max-rss-mb", type=float, default=0, help="峰值内存上限，0 = 不限制")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    outcome = run_autotune(config, args.stl_sample, args.pattern_sample, args.workers, args.threads,
+                           args.tiles, args.affinity, args.max_rss_mb)
+    for result in sorted(outcome["results"], key=lambda r: -r["images_per_minute"]):
+        print(f"{result['workers']:>3} 进程 x {result['threads_per_worker']:>3} 线程, "
+              f"分块 {result['tile_size'] or '默认':>6}, 亲和性 {'开' if result['cpu_affinity'] else '关'}: "
+              f"{result['images_per_minute']:>8.2f} 张/分钟, 峰值 {_format_rss(result['peak_rss_mb']):>11}"
+              f"{'' if result['success'] else '  (失败)'}")
+    return 0 if outcome["best"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,7 @@ import traceback
 import logging
 from pathlib import Path
 from blender_mcp_integration import BlenderMCPIntegration
+import render_profiles
 
 class BlenderDatasetGUI:
     def __init__(self, root):
@@ -49,6 +50,15 @@ class BlenderDatasetGUI:
         
         # Test Blender connection on startup
         self.test_blender_connection()
+        
+        # Stop the warm Blender process (if any) together with the GUI
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def on_close(self):
+        """Shut down the warm Blender worker before closing the window"""
+        if self.mcp_integration:
+            self.mcp_integration.shutdown()
+        self.root.destroy()
     
     def setup_logging(self):
         """设置日志记录"""
@@ -214,6 +224,42 @@ class BlenderDatasetGUI:
         ttk.Label(projector_frame, text="视场角 (度):").grid(row=4, column=0, sticky='w', padx=10, pady=5)
         self.fov_var = tk.StringVar(value="60")
         ttk.Entry(projector_frame, textvariable=self.fov_var, width=15).grid(row=4, column=1, padx=5, pady=5, sticky='w')
+        
+        # Pattern source: image folder or a built-in generator
+        ttk.Label(projector_frame, text="图案来源:").grid(row=5, column=0, sticky='w', padx=10, pady=5)
+        self.pattern_source_var = tk.StringVar(value="folder")
+        ttk.Combobox(projector_frame, textvariable=self.pattern_source_var,
+                     values=["folder", "phase_shift", "heterodyne", "gray_code", "binary"],
+                     width=15, state='readonly').grid(row=5, column=1, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(projector_frame, text="生成图案参数:").grid(row=6, column=0, sticky='w', padx=10, pady=5)
+        pattern_params_frame = ttk.Frame(projector_frame)
+        pattern_params_frame.grid(row=6, column=1, padx=5, pady=5, sticky='w')
+        
+        self.pattern_steps_var = tk.StringVar(value="4")
+        ttk.Label(pattern_params_frame, text="相移步数:").pack(side='left', padx=2)
+        ttk.Entry(pattern_params_frame, textvariable=self.pattern_steps_var, width=5).pack(side='left', padx=2)
+        
+        self.pattern_periods_var = tk.StringVar(value="32")
+        ttk.Label(pattern_params_frame, text="条纹周期 (像素, 逗号分隔):").pack(side='left', padx=2)
+        ttk.Entry(pattern_params_frame, textvariable=self.pattern_periods_var, width=12).pack(side='left', padx=2)
+        
+        ttk.Label(projector_frame, text="图案分辨率与方向:").grid(row=7, column=0, sticky='w', padx=10, pady=5)
+        pattern_size_frame = ttk.Frame(projector_frame)
+        pattern_size_frame.grid(row=7, column=1, padx=5, pady=5, sticky='w')
+        
+        self.pattern_width_var = tk.StringVar(value="1024")
+        self.pattern_height_var = tk.StringVar(value="768")
+        ttk.Entry(pattern_size_frame, textvariable=self.pattern_width_var, width=6).pack(side='left', padx=2)
+        ttk.Label(pattern_size_frame, text="x").pack(side='left', padx=2)
+        ttk.Entry(pattern_size_frame, textvariable=self.pattern_height_var, width=6).pack(side='left', padx=2)
+        
+        self.pattern_orientation_var = tk.StringVar(value="vertical")
+        ttk.Combobox(pattern_size_frame, textvariable=self.pattern_orientation_var, values=["vertical", "horizontal"],
+                     width=10, state='readonly').pack(side='left', padx=2)
+        
+        self.pattern_inverse_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(projector_frame, text="格雷码/二进制图案附加反码图案", variable=self.pattern_inverse_var).grid(row=8, column=1, padx=5, pady=5, sticky='w')
     
     def create_render_tab(self):
         render_frame = ttk.Frame(self.notebook)
@@ -257,6 +303,33 @@ class BlenderDatasetGUI:
         ttk.Entry(ambient_frame, textvariable=self.ambient_base_var, width=8).pack(side='left', padx=2)
         ttk.Label(ambient_frame, text="变化:").pack(side='left', padx=2)
         ttk.Entry(ambient_frame, textvariable=self.ambient_var_var, width=8).pack(side='left', padx=2)
+        
+        # Render all patterns of a view as one animation
+        self.pattern_animation_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(render_frame, text="每个视角的图案作为一次动画渲染", variable=self.pattern_animation_var).grid(row=5, column=1, padx=5, pady=5, sticky='w')
+        
+        # One projector pass per view, patterns synthesized offline
+        self.pattern_synthesis_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(render_frame, text="投影坐标AOV + 离线图案合成 (每视角仅渲染一次)", variable=self.pattern_synthesis_var).grid(row=6, column=1, padx=5, pady=5, sticky='w')
+        
+        # Ambient image from the world light group instead of a separate render
+        self.light_groups_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(render_frame, text="使用光照组输出环境光 (省去单独的环境光渲染)", variable=self.light_groups_var).grid(row=7, column=1, padx=5, pady=5, sticky='w')
+        
+        # Keep Cycles scene data between renders of the same view
+        self.persistent_data_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(render_frame, text="持久渲染数据 (同一视角内复用场景同步/BVH)", variable=self.persistent_data_var).grid(row=8, column=1, padx=5, pady=5, sticky='w')
+        
+        # Named quality profile (draft/preview for validating inputs quickly)
+        ttk.Label(render_frame, text="渲染质量档位:").grid(row=9, column=0, sticky='w', padx=10, pady=5)
+        self.quality_profile_var = tk.StringVar()
+        quality_combo = ttk.Combobox(render_frame, textvariable=self.quality_profile_var,
+                                     values=render_profiles.profile_names(), width=15, state='readonly')
+        quality_combo.grid(row=9, column=1, padx=5, pady=5, sticky='w')
+        
+        # Encode PNGs in helper processes while the next frame renders
+        self.async_write_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(render_frame, text="后台异步编码图像 (渲染不等待PNG压缩)", variable=self.async_write_var).grid(row=10, column=1, padx=5, pady=5, sticky='w')
     
     def create_advanced_tab(self):
         advanced_frame = ttk.Frame(self.notebook)
@@ -282,9 +355,76 @@ class BlenderDatasetGUI:
         
         # Script path
         ttk.Label(advanced_frame, text="Blender脚本路径:").grid(row=4, column=0, sticky='w', padx=10, pady=5)
-        self.script_path_var = tk.StringVar(value="深度图数据集_v6.py")
+        self.script_path_var = tk.StringVar(value="深度图数据集_v7.py")
         ttk.Entry(advanced_frame, textvariable=self.script_path_var, width=40).grid(row=4, column=1, padx=5, pady=5)
         ttk.Button(advanced_frame, text="浏览", command=lambda: self.browse_file(self.script_path_var, "Python脚本", "*.py")).grid(row=4, column=2, padx=5, pady=5)
+        
+        # Parallel Blender workers
+        ttk.Label(advanced_frame, text="并行Blender进程数 (auto=自动调优):").grid(row=5, column=0, sticky='w', padx=10, pady=5)
+        self.workers_var = tk.StringVar(value="1")
+        ttk.Entry(advanced_frame, textvariable=self.workers_var, width=15).grid(row=5, column=1, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(advanced_frame, text="每进程线程数 (0=自动):").grid(row=6, column=0, sticky='w', padx=10, pady=5)
+        self.threads_per_worker_var = tk.StringVar(value="0")
+        ttk.Entry(advanced_frame, textvariable=self.threads_per_worker_var, width=15).grid(row=6, column=1, padx=5, pady=5, sticky='w')
+        
+        # Warm Blender process reused between runs
+        self.persistent_worker_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(advanced_frame, text="保持Blender常驻 (复用已加载的场景)", variable=self.persistent_worker_var).grid(row=7, column=1, padx=5, pady=5, sticky='w')
+        
+        # Resume an interrupted run from its completion manifest
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(advanced_frame, text="断点续跑 (跳过清单中已完成的渲染)", variable=self.resume_var).grid(row=8, column=1, padx=5, pady=5, sticky='w')
+        
+        # Content-addressed render cache
+        self.render_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(advanced_frame, text="渲染缓存 (复用未变化的渲染结果)", variable=self.render_cache_var).grid(row=9, column=1, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(advanced_frame, text="渲染缓存上限 (GB):").grid(row=10, column=0, sticky='w', padx=10, pady=5)
+        self.render_cache_max_gb_var = tk.StringVar(value="20")
+        ttk.Entry(advanced_frame, textvariable=self.render_cache_max_gb_var, width=15).grid(row=10, column=1, padx=5, pady=5, sticky='w')
+        
+        # Normalized mesh cache (skips stl_import on later runs)
+        self.mesh_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(advanced_frame, text="网格缓存 (缓存归一化后的STL几何)", variable=self.mesh_cache_var).grid(row=11, column=1, padx=5, pady=5, sticky='w')
+        
+        # STL parser backend
+        ttk.Label(advanced_frame, text="STL读取方式:").grid(row=12, column=0, sticky='w', padx=10, pady=5)
+        self.stl_reader_var = tk.StringVar(value="operator")
+        ttk.Combobox(advanced_frame, textvariable=self.stl_reader_var, values=["operator", "numpy"],
+                     width=15, state='readonly').grid(row=12, column=1, padx=5, pady=5, sticky='w')
+        
+        # Pixel-budget decimation of oversized models
+        ttk.Label(advanced_frame, text="网格简化误差 (像素, 0=关闭):").grid(row=13, column=0, sticky='w', padx=10, pady=5)
+        self.decimation_error_px_var = tk.StringVar(value="0")
+        ttk.Entry(advanced_frame, textvariable=self.decimation_error_px_var, width=15).grid(row=13, column=1, padx=5, pady=5, sticky='w')
+        
+        # Parse upcoming STL files in helper processes while rendering
+        ttk.Label(advanced_frame, text="STL预取数量 (0=关闭, 仅numpy读取):").grid(row=14, column=0, sticky='w', padx=10, pady=5)
+        self.stl_prefetch_var = tk.StringVar(value="2")
+        ttk.Entry(advanced_frame, textvariable=self.stl_prefetch_var, width=15).grid(row=14, column=1, padx=5, pady=5, sticky='w')
+        
+        # Loose files or tar shards with one sample per (STL, view)
+        ttk.Label(advanced_frame, text="输出格式:").grid(row=15, column=0, sticky='w', padx=10, pady=5)
+        self.output_format_var = tk.StringVar(value="files")
+        ttk.Combobox(advanced_frame, textvariable=self.output_format_var, values=["files", "tar"],
+                     width=15, state='readonly').grid(row=15, column=1, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(advanced_frame, text="每个分片的样本数:").grid(row=16, column=0, sticky='w', padx=10, pady=5)
+        self.samples_per_shard_var = tk.StringVar(value="1000")
+        ttk.Entry(advanced_frame, textvariable=self.samples_per_shard_var, width=15).grid(row=16, column=1, padx=5, pady=5, sticky='w')
+        
+        # Continue the numbering of an existing dataset instead of starting at 1
+        self.append_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(advanced_frame, text="追加到已有数据集 (接着已有编号继续)", variable=self.append_var).grid(row=17, column=1, padx=5, pady=5, sticky='w')
+        
+        # SQLite index linking every output to its generating parameters
+        self.sample_index_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(advanced_frame, text="样本索引数据库 (samples.sqlite，记录文件与随机参数)", variable=self.sample_index_var).grid(row=18, column=1, padx=5, pady=5, sticky='w')
+        
+        # Per-view randomized values and object pose as JSONL
+        self.metadata_stream_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(advanced_frame, text="逐视角记录随机参数与物体位姿 (JSONL)", variable=self.metadata_stream_var).grid(row=19, column=1, padx=5, pady=5, sticky='w')
     
     def create_control_frame(self):
         control_frame = ttk.Frame(self.root)
@@ -334,10 +474,31 @@ class BlenderDatasetGUI:
         self.samples_var.set("512")
         self.ambient_base_var.set("0.5")
         self.ambient_var_var.set("0.1")
+        self.pattern_animation_var.set(False)
+        self.pattern_synthesis_var.set(False)
+        self.light_groups_var.set(True)
+        self.persistent_data_var.set(True)
+        self.async_write_var.set(False)
+        self.quality_profile_var.set(render_profiles.DEFAULT_PROFILE_NAME)
         
         # Other default values
         self.stl_max_size_var.set("150.0")
         self.rotation_angles_var.set("0,45,90,135,180,225,270,315")
+        self.workers_var.set("1")
+        self.threads_per_worker_var.set("0")
+        self.persistent_worker_var.set(False)
+        self.resume_var.set(False)
+        self.render_cache_var.set(False)
+        self.render_cache_max_gb_var.set("20")
+        self.mesh_cache_var.set(True)
+        self.stl_reader_var.set("operator")
+        self.decimation_error_px_var.set("0")
+        self.stl_prefetch_var.set("2")
+        self.output_format_var.set("files")
+        self.samples_per_shard_var.set("1000")
+        self.append_var.set(False)
+        self.sample_index_var.set(True)
+        self.metadata_stream_var.set(True)
     
     def load_default_config(self):
         """Load default configuration from 配置.json if it exists"""
@@ -354,6 +515,23 @@ class BlenderDatasetGUI:
             print(f"加载默认配置失败: {e}")
             messagebox.showwarning("警告", f"加载默认配置失败: {e}\n使用内置默认值")
     
+    @staticmethod
+    def _parse_workers(value):
+        """Worker count as int, or "auto" to use the host's autotuned profile"""
+        value = str(value).strip()
+        return "auto" if value.lower() == "auto" else int(value)
+    
+    def _pattern_params(self):
+        """Parameters of the built-in pattern generator from the projector tab"""
+        return {
+            "width": int(self.pattern_width_var.get()),
+            "height": int(self.pattern_height_var.get()),
+            "steps": int(self.pattern_steps_var.get()),
+            "periods": [float(p) for p in self.pattern_periods_var.get().replace("，", ",").split(",") if p.strip()],
+            "orientation": self.pattern_orientation_var.get(),
+            "inverse": self.pattern_inverse_var.get()
+        }
+    
     def get_config_dict(self):
         """Get all configuration parameters as a dictionary"""
         # Parse rotation angles, handling potential errors
@@ -383,20 +561,43 @@ class BlenderDatasetGUI:
                 "power": float(self.proj_power_var.get()),
                 "power_drift": float(self.proj_power_drift_var.get()),
                 "use_discrete_power": self.use_discrete_power_var.get(),
-                "fov": float(self.fov_var.get())
+                "fov": float(self.fov_var.get()),
+                "pattern_source": self.pattern_source_var.get(),
+                "pattern_params": self._pattern_params()
             },
             "render": {
                 "resolution": [int(self.render_width_var.get()), int(self.render_height_var.get())],
                 "engine": self.render_engine_var.get(),
                 "samples": int(self.samples_var.get()),
                 "ambient_base": float(self.ambient_base_var.get()),
-                "ambient_variation": float(self.ambient_var_var.get())
+                "ambient_variation": float(self.ambient_var_var.get()),
+                "pattern_animation": self.pattern_animation_var.get(),
+                "pattern_synthesis": self.pattern_synthesis_var.get(),
+                "light_groups": self.light_groups_var.get(),
+                "persistent_data": self.persistent_data_var.get(),
+                "async_write": self.async_write_var.get(),
+                "quality_profile": self.quality_profile_var.get()
             },
             "advanced": {
                 "stl_max_size": float(self.stl_max_size_var.get()),
                 "rotation_angles": rotation_angles,
                 "blender_path": self.blender_path_var.get(),
-                "script_path": self.script_path_var.get()
+                "script_path": self.script_path_var.get(),
+                "workers": self._parse_workers(self.workers_var.get()),
+                "threads_per_worker": int(self.threads_per_worker_var.get()),
+                "persistent_worker": self.persistent_worker_var.get(),
+                "resume": self.resume_var.get(),
+                "render_cache": self.render_cache_var.get(),
+                "render_cache_max_gb": float(self.render_cache_max_gb_var.get()),
+                "mesh_cache": self.mesh_cache_var.get(),
+                "stl_reader": self.stl_reader_var.get(),
+                "decimation_error_px": float(self.decimation_error_px_var.get()),
+                "stl_prefetch": int(self.stl_prefetch_var.get()),
+                "output_format": self.output_format_var.get(),
+                "samples_per_shard": int(self.samples_per_shard_var.get()),
+                "append": self.append_var.get(),
+                "sample_index": self.sample_index_var.get(),
+                "metadata_stream": self.metadata_stream_var.get()
             }
         }
     
@@ -469,6 +670,21 @@ class BlenderDatasetGUI:
                 self.use_discrete_power_var.set(bool(projector["use_discrete_power"]))
             if "fov" in projector:
                 self.fov_var.set(str(projector["fov"]))
+            if projector.get("pattern_source"):
+                self.pattern_source_var.set(projector["pattern_source"])
+            pattern_params = projector.get("pattern_params", {})
+            if "steps" in pattern_params:
+                self.pattern_steps_var.set(str(pattern_params["steps"]))
+            if "periods" in pattern_params:
+                self.pattern_periods_var.set(", ".join(f"{period:g}" for period in pattern_params["periods"]))
+            if "width" in pattern_params:
+                self.pattern_width_var.set(str(pattern_params["width"]))
+            if "height" in pattern_params:
+                self.pattern_height_var.set(str(pattern_params["height"]))
+            if pattern_params.get("orientation") in ("vertical", "horizontal"):
+                self.pattern_orientation_var.set(pattern_params["orientation"])
+            if "inverse" in pattern_params:
+                self.pattern_inverse_var.set(bool(pattern_params["inverse"]))
             
             # Apply render settings
             render = config.get("render", {})
@@ -483,6 +699,18 @@ class BlenderDatasetGUI:
                 self.ambient_base_var.set(str(render["ambient_base"]))
             if "ambient_variation" in render:
                 self.ambient_var_var.set(str(render["ambient_variation"]))
+            if "pattern_animation" in render:
+                self.pattern_animation_var.set(bool(render["pattern_animation"]))
+            if "pattern_synthesis" in render:
+                self.pattern_synthesis_var.set(bool(render["pattern_synthesis"]))
+            if "light_groups" in render:
+                self.light_groups_var.set(bool(render["light_groups"]))
+            if "persistent_data" in render:
+                self.persistent_data_var.set(bool(render["persistent_data"]))
+            if "async_write" in render:
+                self.async_write_var.set(bool(render["async_write"]))
+            if "quality_profile" in render:
+                self.quality_profile_var.set(render["quality_profile"])
             
             # Apply advanced settings
             advanced = config.get("advanced", {})
@@ -496,6 +724,36 @@ class BlenderDatasetGUI:
                 self.blender_path_var.set(advanced["blender_path"])
             if "script_path" in advanced:
                 self.script_path_var.set(advanced["script_path"])
+            if "workers" in advanced:
+                self.workers_var.set(str(advanced["workers"]))
+            if "threads_per_worker" in advanced:
+                self.threads_per_worker_var.set(str(advanced["threads_per_worker"]))
+            if "persistent_worker" in advanced:
+                self.persistent_worker_var.set(bool(advanced["persistent_worker"]))
+            if "resume" in advanced:
+                self.resume_var.set(bool(advanced["resume"]))
+            if "render_cache" in advanced:
+                self.render_cache_var.set(bool(advanced["render_cache"]))
+            if "render_cache_max_gb" in advanced:
+                self.render_cache_max_gb_var.set(str(advanced["render_cache_max_gb"]))
+            if "mesh_cache" in advanced:
+                self.mesh_cache_var.set(bool(advanced["mesh_cache"]))
+            if advanced.get("stl_reader") in ("numpy", "operator"):
+                self.stl_reader_var.set(advanced["stl_reader"])
+            if "decimation_error_px" in advanced:
+                self.decimation_error_px_var.set(str(advanced["decimation_error_px"]))
+            if "stl_prefetch" in advanced:
+                self.stl_prefetch_var.set(str(advanced["stl_prefetch"]))
+            if advanced.get("output_format") in ("files", "tar"):
+                self.output_format_var.set(advanced["output_format"])
+            if "samples_per_shard" in advanced:
+                self.samples_per_shard_var.set(str(advanced["samples_per_shard"]))
+            if "append" in advanced:
+                self.append_var.set(bool(advanced["append"]))
+            if "sample_index" in advanced:
+                self.sample_index_var.set(bool(advanced["sample_index"]))
+            if "metadata_stream" in advanced:
+                self.metadata_stream_var.set(bool(advanced["metadata_stream"]))
                 
         except Exception as e:
             print(f"应用配置失败: {e}")
@@ -616,31 +874,34 @@ class BlenderDatasetGUI:
             messagebox.showerror("错误", f"检查STL文件时出错: {e}")
             return False
         
-        # 检查图案文件夹
-        pattern_folder = self.pattern_folder_var.get()
-        self.logger.info(f"图案文件夹路径: {pattern_folder}")
+        # 检查图案文件夹：使用内置图案生成器时不需要图案文件
+        if self.pattern_source_var.get() != "folder":
+            self.logger.info(f"使用内置图案生成器: {self.pattern_source_var.get()}")
+        else:
+            pattern_folder = self.pattern_folder_var.get()
+            self.logger.info(f"图案文件夹路径: {pattern_folder}")
         
-        if not pattern_folder:
-            self.logger.error("图案图像文件夹路径为空")
-            messagebox.showerror("错误", "图案图像文件夹路径不能为空")
-            return False
+            if not pattern_folder:
+                self.logger.error("图案图像文件夹路径为空")
+                messagebox.showerror("错误", "图案图像文件夹路径不能为空")
+                return False
         
-        if not os.path.exists(pattern_folder):
-            self.logger.error(f"图案图像文件夹不存在: {pattern_folder}")
-            messagebox.showerror("错误", f"图案图像文件夹路径无效:\n{pattern_folder}\n\n请检查路径是否存在")
-            return False
+            if not os.path.exists(pattern_folder):
+                self.logger.error(f"图案图像文件夹不存在: {pattern_folder}")
+                messagebox.showerror("错误", f"图案图像文件夹路径无效:\n{pattern_folder}\n\n请检查路径是否存在")
+                return False
         
-        # 检查图案文件
-        try:
-            pattern_files = [f for f in os.listdir(pattern_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff'))]
-            self.logger.info(f"在图案文件夹中找到 {len(pattern_files)} 个图像文件")
-            if len(pattern_files) == 0:
-                self.logger.warning(f"图案文件夹中没有找到图像文件: {pattern_folder}")
-                messagebox.showwarning("警告", f"图案文件夹中没有找到图像文件:\n{pattern_folder}\n\n支持的格式: PNG, JPG, JPEG, BMP, TIFF")
-        except Exception as e:
-            self.logger.error(f"检查图案文件时出错: {e}")
-            messagebox.showerror("错误", f"检查图案文件时出错: {e}")
-            return False
+            # 检查图案文件
+            try:
+                pattern_files = [f for f in os.listdir(pattern_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff'))]
+                self.logger.info(f"在图案文件夹中找到 {len(pattern_files)} 个图像文件")
+                if len(pattern_files) == 0:
+                    self.logger.warning(f"图案文件夹中没有找到图像文件: {pattern_folder}")
+                    messagebox.showwarning("警告", f"图案文件夹中没有找到图像文件:\n{pattern_folder}\n\n支持的格式: PNG, JPG, JPEG, BMP, TIFF")
+            except Exception as e:
+                self.logger.error(f"检查图案文件时出错: {e}")
+                messagebox.showerror("错误", f"检查图案文件时出错: {e}")
+                return False
         
         # 检查输出文件夹
         output_folder = self.output_folder_var.get()
@@ -668,6 +929,22 @@ class BlenderDatasetGUI:
             float(self.focal_length_var.get())
             float(self.proj_power_var.get())
             int(self.samples_var.get())
+            render_profiles.get_render_profile(self.quality_profile_var.get())
+            workers = self._parse_workers(self.workers_var.get())
+            if (workers != "auto" and workers < 1) or int(self.threads_per_worker_var.get()) < 0:
+                raise ValueError("并行进程数必须 >= 1 或为 auto，线程数必须 >= 0")
+            if float(self.render_cache_max_gb_var.get()) <= 0:
+                raise ValueError("渲染缓存上限必须 > 0")
+            if float(self.decimation_error_px_var.get()) < 0:
+                raise ValueError("网格简化误差必须 >= 0")
+            if int(self.stl_prefetch_var.get()) < 0:
+                raise ValueError("STL预取数量必须 >= 0")
+            if int(self.samples_per_shard_var.get()) < 1:
+                raise ValueError("每个分片的样本数必须 >= 1")
+            pattern_params = self._pattern_params()
+            if (pattern_params["width"] < 1 or pattern_params["height"] < 1 or pattern_params["steps"] < 3 or
+                    not pattern_params["periods"] or min(pattern_params["periods"]) <= 0):
+                raise ValueError("生成图案需要分辨率 >= 1、相移步数 >= 3 且条纹周期 > 0")
             self.logger.info("数值输入验证通过")
         except ValueError as e:
             self.logger.error(f"数值输入无效: {e}")
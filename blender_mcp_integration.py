@@ -6,11 +6,16 @@ Handles communication between GUI and Blender MCP tools
 import subprocess
 import json
 import os
+import socket
 import tempfile
+import threading
 import time
 import traceback
 from pathlib import Path
 
+from blender_autotune import load_host_profile
+from blender_worker_pool import DEFAULT_SCRIPT_PATH, BlenderWorkerPool, resolve_script_path
+
 
 class BlenderMCPIntegration:
     """Handles integration with Blender MCP tools"""
@@ -18,9 +23,19 @@ class BlenderMCPIntegration:
     def __init__(self, blender_path="blender"):
         self.blender_path = blender_path
         self.temp_config_file = None
+        self.warm_worker = None
+        self._verified_blender_path = None
     
     def _check_blender_executable(self):
         """Check if Blender executable exists and is accessible"""
+        if self._verified_blender_path == self.blender_path:
+            return True
+        if self._probe_blender_executable():
+            self._verified_blender_path = self.blender_path
+            return True
+        return False
+    
+    def _probe_blender_executable(self):
         try:
             # Check if it's a full path
             if os.path.isabs(self.blender_path):
@@ -61,6 +76,57 @@ class BlenderMCPIntegration:
             mapped_config = self._map_config_keys(config)
             logger.info(f"映射后配置参数: {json.dumps(mapped_config, ensure_ascii=False, indent=2)}")
             
+            if progress_callback:
+                progress_callback(10, "正在准备Blender环境...")
+            
+            tuned_profile = None
+            if str(mapped_config.get("workers", 1)).strip().lower() == "auto":
+                tuned_profile = load_host_profile()
+                if tuned_profile:
+                    logger.info(f"使用本机自动调优结果: {tuned_profile}")
+                else:
+                    logger.warning("未找到本机的自动调优结果 (运行 python blender_autotune.py 生成)，使用单进程。")
+                worker_count = int(tuned_profile["workers"]) if tuned_profile else 1
+            else:
+                worker_count = int(mapped_config.get("workers", 1) or 1)
+            if worker_count > 1 or tuned_profile:
+                logger.info(f"使用 {worker_count} 个并行Blender进程生成数据集...")
+                if progress_callback:
+                    progress_callback(20, f"正在启动 {worker_count} 个Blender进程...")
+                if tuned_profile:
+                    pool = BlenderWorkerPool(self, worker_count, tuned_profile.get("threads_per_worker"),
+                                             tile_size=tuned_profile.get("tile_size"),
+                                             cpu_affinity=tuned_profile.get("cpu_affinity", False))
+                else:
+                    pool = BlenderWorkerPool(self, worker_count, mapped_config.get("threads_per_worker"))
+                result = pool.run(mapped_config, progress_callback)
+                logger.info(f"并行执行结果: {len(result.get('output_files', []))} 个输出文件")
+                return {
+                    "success": True,
+                    "message": "数据集生成完成",
+                    "output_files": result.get("output_files", []),
+                    "parameters_file": result.get("parameters_file", "")
+                }
+            
+            if mapped_config.get("persistent_worker"):
+                if progress_callback:
+                    progress_callback(20, "正在使用常驻Blender进程...")
+                worker = self._get_warm_worker(mapped_config.get("advanced", {}).get("script_path", DEFAULT_SCRIPT_PATH))
+                job_started = time.time()
+                reply = worker.run_job(mapped_config)
+                logger.info(f"常驻进程执行结果: {reply}")
+                if progress_callback:
+                    progress_callback(95, "正在完成...")
+                # 常驻进程不打印输出目录，直接扫描本次任务写出的文件
+                output_files = collect_output_files(mapped_config.get("paths", {}).get("output_folder", ""),
+                                                    since=job_started)
+                return {
+                    "success": True,
+                    "message": "数据集生成完成",
+                    "output_files": output_files,
+                    "parameters_file": reply.get("parameters_file", "")
+                }
+            
             # Create temporary config file with UTF-8 encoding
             logger.info("创建临时配置文件...")
             self.temp_config_file = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8')
@@ -68,9 +134,6 @@ class BlenderMCPIntegration:
             self.temp_config_file.close()
             logger.info(f"临时配置文件已创建: {self.temp_config_file.name}")
             
-            if progress_callback:
-                progress_callback(10, "正在准备Blender环境...")
-            
             # Prepare Blender script that uses MCP tools
             logger.info("生成Blender脚本...")
             blender_script = self._create_blender_script(self.temp_config_file.name)
@@ -204,6 +267,12 @@ class BlenderMCPIntegration:
                 mapped_config["blender_path"] = advanced["blender_path"]
             if "script_path" in advanced:
                 mapped_config["script_path"] = advanced["script_path"]
+            if "workers" in advanced:
+                mapped_config["workers"] = advanced["workers"]
+            if "threads_per_worker" in advanced:
+                mapped_config["threads_per_worker"] = advanced["threads_per_worker"]
+            if "persistent_worker" in advanced:
+                mapped_config["persistent_worker"] = advanced["persistent_worker"]
         
         logger.info("所有参数键名映射完成")
         return mapped_config
@@ -215,7 +284,7 @@ class BlenderMCPIntegration:
         with open(config_file_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
         
-        user_script_path_str = config.get("advanced", {}).get("script_path", "深度图数据集_v6.py")
+        user_script_path_str = config.get("advanced", {}).get("script_path", DEFAULT_SCRIPT_PATH)
         
         # Step 2: Use pathlib to safely extract the script's directory and module name.
         user_script_path = Path(user_script_path_str)
@@ -312,7 +381,7 @@ except ImportError as e:
     sys.exit(1)
 except AttributeError as e:
     print(f"FATAL ERROR: A function was not found in the module '{{{{module_name}}}}'. {{{{e}}}}")
-    print("Please ensure your script '深度图数据集_v6.py' contains all required functions.")
+    print(f"Please ensure your script '{{{{module_name}}}}.py' contains all required functions.")
 except Exception as e:
     print(f"Error during dataset generation: {{{{str(e)}}}}")
     import traceback
@@ -322,8 +391,17 @@ except Exception as e:
 '''
         return script_content
     
-    def _execute_blender_script(self, script_content, progress_callback=None):
-        """Execute Blender with the given script with detailed logging"""
+    def _execute_blender_script(self, script_content, progress_callback=None, extra_args=None, cpu_affinity=None):
+        """Execute Blender with the given script with detailed logging
+
+        Args:
+            script_content: Python source to run inside Blender
+            progress_callback: Function to call with progress updates
+            extra_args: Additional Blender command line options (e.g. ["--threads", "8"]),
+                inserted before --python so they apply to the render
+            cpu_affinity: Optional set of CPU indices to pin the Blender process to
+                (ignored where os.sched_setaffinity is unavailable)
+        """
         import logging
         logger = logging.getLogger(__name__)
         
@@ -342,22 +420,11 @@ except Exception as e:
                 raise FileNotFoundError(f"Blender executable not found: {self.blender_path}")
             logger.info("Blender可执行文件检查通过")
             
-            # Test if Blender can be executed
-            try:
-                test_process = subprocess.run([self.blender_path, "--version"], 
-                                            capture_output=True, text=True, timeout=10)
-                if test_process.returncode != 0:
-                    logger.warning(f"Blender版本检查返回非零代码: {test_process.returncode}")
-                    logger.warning(f"stderr输出: {test_process.stderr}")
-            except subprocess.TimeoutExpired:
-                logger.warning("Blender版本检查超时")
-            except Exception as test_e:
-                logger.warning(f"Blender版本检查失败: {test_e}")
-            
             # Prepare command
             cmd = [
                 self.blender_path,
                 "--background",  # Run in background mode
+                *(extra_args or []),
                 "--python", script_path
                 # Removed --factory-startup to allow loading of user addons
             ]
@@ -378,6 +445,10 @@ except Exception as e:
                 bufsize=1,
                 creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
+            # 工作池从多个线程启动进程，preexec_fn 在多线程进程中不安全；改为启动后立即设置亲和性
+            if cpu_affinity and hasattr(os, 'sched_setaffinity'):
+                logger.info(f"Blender进程CPU亲和性: {sorted(cpu_affinity)}")
+                _pin_process(process.pid, cpu_affinity)
             
             # Monitor progress
             output_files = []
@@ -407,13 +478,9 @@ except Exception as e:
                         output_dir = output_line.split("Output files saved to:")[1].strip()
                         logger.info(f"检测到输出目录: {output_dir}")
                         # Collect generated files
-                        if os.path.exists(output_dir):
-                            for root, dirs, files in os.walk(output_dir):
-                                for file in files:
-                                    if file.endswith(('.png', '.exr', '.json')):
-                                        full_path = os.path.join(root, file)
-                                        output_files.append(full_path)
-                                        logger.info(f"发现输出文件: {full_path}")
+                        for full_path in collect_output_files(output_dir):
+                            output_files.append(full_path)
+                            logger.info(f"发现输出文件: {full_path}")
                     
                     elif "Parameters saved to:" in output_line:
                         parameters_file = output_line.split("Parameters saved to:")[1].strip()
@@ -501,6 +568,27 @@ except Exception as e:
                 except Exception as e:
                     logger.warning(f"清理临时脚本文件失败: {e}")
     
+    def _get_warm_worker(self, script_path):
+        """Return a running WarmBlenderWorker for script_path, starting one if needed"""
+        script_path = resolve_script_path(script_path)
+        worker = self.warm_worker
+        if worker and (worker.blender_path != self.blender_path or worker.script_path != script_path or not worker.is_alive()):
+            worker.shutdown()
+            worker = None
+        if worker is None:
+            if not self._check_blender_executable():
+                raise FileNotFoundError(f"Blender executable not found: {self.blender_path}")
+            worker = WarmBlenderWorker(self.blender_path, script_path)
+            worker.start()
+            self.warm_worker = worker
+        return worker
+    
+    def shutdown(self):
+        """Stop the warm Blender worker, if one is running"""
+        if self.warm_worker:
+            self.warm_worker.shutdown()
+            self.warm_worker = None
+    
     def test_blender_connection(self):
         """Test if Blender is accessible and working"""
         script_path = '' # Initialize to ensure it exists for the 'finally' block
@@ -542,6 +630,174 @@ print("Connection test successful")
             if script_path and os.path.exists(script_path):
                 os.unlink(script_path)
 
+def collect_output_files(output_dir, since=None):
+    """
+    .png/.exr/.json files under output_dir; with since (a time.time() value)
+    only those modified at or after it, i.e. written by the current job.
+    """
+    output_files = []
+    if not output_dir or not os.path.exists(output_dir):
+        return output_files
+    for root, dirs, files in os.walk(output_dir):
+        for file in files:
+            if file.endswith(('.png', '.exr', '.json')):
+                full_path = os.path.join(root, file)
+                if since is None or os.path.getmtime(full_path) >= since:
+                    output_files.append(full_path)
+    return output_files
+
+
+def _pin_process(pid, cpu_set):
+    """
+    Restricts a running process to cpu_set. Right after Popen returns Blender
+    has only just exec'd; its main thread and any threads already started are
+    pinned, and threads it creates later inherit the main thread's CPU set.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    try:
+        thread_ids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        thread_ids = [pid]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, cpu_set)
+        except OSError as e:
+            # 进程或线程已退出
+            logger.warning(f"设置CPU亲和性失败 (pid {pid}, tid {thread_id}): {e}")
+
+
+class WarmBlenderWorker:
+    """Keeps one Blender process alive with the scene loaded (see blender_render_server.py)"""
+    
+    SERVER_SCRIPT = Path(__file__).with_name("blender_render_server.py")
+    
+    def __init__(self, blender_path, script_path, startup_timeout=300):
+        self.blender_path = blender_path
+        self.script_path = script_path
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self._conn = None
+        self._reader = None
+        self._writer = None
+        self._lock = threading.Lock()
+    
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None and self._conn is not None
+    
+    def start(self):
+        """Launch Blender with the render server and wait until it connects back"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        listener.settimeout(1.0)
+        port = listener.getsockname()[1]
+        
+        cmd = [self.blender_path, "--background", "--python", str(self.SERVER_SCRIPT),
+               "--", str(port), self.script_path]
+        logger.info(f"启动常驻Blender进程: {' '.join(cmd)}")
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        threading.Thread(target=self._pump_output, daemon=True).start()
+        
+        try:
+            deadline = time.time() + self.startup_timeout
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                    break
+                except socket.timeout:
+                    if self.process.poll() is not None:
+                        raise Exception(f"常驻Blender进程启动失败，返回码 {self.process.returncode}")
+                    if time.time() > deadline:
+                        raise TimeoutError("等待常驻Blender进程连接超时")
+        except Exception:
+            self.shutdown()
+            raise
+        finally:
+            listener.close()
+        
+        conn.settimeout(None)
+        self._conn = conn
+        self._reader = conn.makefile('r', encoding='utf-8')
+        self._writer = conn.makefile('w', encoding='utf-8')
+        ready = self._read_message()
+        if ready.get("type") != "ready":
+            self.shutdown()
+            raise Exception(f"常驻Blender进程返回了意外的握手消息: {ready}")
+        logger.info("常驻Blender进程已就绪")
+    
+    def _pump_output(self):
+        import logging
+        logger = logging.getLogger(__name__)
+        for line in self.process.stdout:
+            line = line.strip()
+            if line:
+                logger.info(f"Blender常驻进程输出: {line}")
+    
+    def _send(self, message):
+        self._writer.write(json.dumps(message, ensure_ascii=False) + "\n")
+        self._writer.flush()
+    
+    def _read_message(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("常驻Blender进程连接已断开")
+        return json.loads(line)
+    
+    def run_job(self, config, stl_files=None, stl_index_offset=0):
+        """
+        Render config (optionally restricted to stl_files) in the warm process
+        
+        Returns:
+            dict: the server's "done" message
+        """
+        with self._lock:
+            if not self.is_alive():
+                self.start()
+            self._send({
+                "type": "job",
+                "config": config,
+                "stl_files": stl_files,
+                "stl_index_offset": stl_index_offset
+            })
+            reply = self._read_message()
+        if not reply.get("success"):
+            raise Exception(f"常驻Blender进程执行任务失败: {reply.get('message')}")
+        return reply
+    
+    def shutdown(self):
+        """Ask the server to exit, then make sure the process is gone"""
+        if self._writer:
+            try:
+                self._send({"type": "shutdown"})
+            except Exception:
+                pass
+        for stream in (self._reader, self._writer, self._conn):
+            if stream:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+        self._conn = self._reader = self._writer = None
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
 # Example usage function
 def create_sample_dataset():
     """Example function to demonstrate usage"""
@@ -579,7 +835,7 @@ def create_sample_dataset():
             "stl_max_size": 150.0,
             "rotation_angles": [0, 45, 90, 135, 180, 225, 270, 315],
             "blender_path": "blender",
-            "script_path": "深度图数据集_v6.py"
+            "script_path": DEFAULT_SCRIPT_PATH
         }
     }
     
@@ -598,5 +854,29 @@ def create_sample_dataset():
         result = integration.generate_dataset(config, progress_callback)
         print(f"Dataset generation result: {result}")
     
+def run_configs_with_warm_worker(config_paths):
+    """Generate one dataset per config file, reusing a single warm Blender process"""
+    def progress_callback(progress, message):
+        print(f"Progress: {progress:.1f}% - {message}")
+    
+    integration = None
+    try:
+        for config_path in config_paths:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            config.setdefault("advanced", {})["persistent_worker"] = True
+            if integration is None:
+                integration = BlenderMCPIntegration(config["advanced"].get("blender_path", "blender"))
+            result = integration.generate_dataset(config, progress_callback)
+            print(f"{config_path}: {result.get('message')}")
+    finally:
+        if integration:
+            integration.shutdown()
+
 if __name__ == "__main__":
-    create_sample_dataset()
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1:
+        # python blender_mcp_integration.py config1.json [config2.json ...]
+        run_configs_with_warm_worker(sys.argv[1:])
+    else:
+        create_sample_dataset()
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Blender Render Server
+Runs inside a long-lived Blender process. The scene (camera, projector light,
+compositor, reference plane) is built once and reused by every job received
+over a local TCP connection, so repeated jobs skip Blender startup and scene
+construction.
+
+Usage (started by WarmBlenderWorker in blender_mcp_integration.py):
+    blender --background --python blender_render_server.py -- <port> <script_path>
+
+Protocol: one JSON object per line in both directions.
+    client -> server  {"type": "job", "config": {...}, "stl_files": [...], "stl_index_offset": 0}
+                      {"type": "shutdown"}
+    server -> client  {"type": "ready"}
+                      {"type": "done", "success": true, "scene_reused": bool, "parameters_file": "..."}
+                      {"type": "done", "success": false, "message": "..."}
+"""
+
+import importlib.util
+import json
+import socket
+import sys
+import traceback
+from pathlib import Path
+
+
+def _parse_args(argv):
+    args = argv[argv.index("--") + 1:] if "--" in argv else []
+    if len(args) < 2:
+        raise SystemExit("用法: blender --background --python blender_render_server.py -- <port> <script_path>")
+    return int(args[0]), args[1]
+
+
+def _load_script_module(script_path):
+    script_path = Path(script_path)
+    if str(script_path.parent) not in sys.path:
+        sys.path.insert(0, str(script_path.parent))
+    spec = importlib.util.spec_from_file_location(script_path.stem, str(script_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _scene_key(config):
+    """Everything except the STL subset can influence the prepared scene."""
+    scene_config = {key: value for key, value in config.items() if key != "worker"}
+    scene_config["paths"] = {key: value for key, value in config.get("paths", {}).items() if key != "stl_folder"}
+    return json.dumps(scene_config, sort_keys=True, ensure_ascii=False)
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message, ensure_ascii=False) + "\n")
+    stream.flush()
+
+
+def handle_job(module, state, message):
+    if not hasattr(module, "prepare_scene"):
+        return {"type": "done", "success": False,
+                "message": f"脚本 '{module.__name__}' 不支持常驻模式 (缺少 prepare_scene/render_stl_files)"}
+
+    config = dict(message.get("config", {}))
+    stl_files = message.get("stl_files")
+    config["worker"] = {
+        "shard_index": 0,
+        "shard_count": 1,
+        "stl_files": stl_files,
+        "stl_index_offset": int(message.get("stl_index_offset", 0)),
+    }
+    module.apply_config_overrides(config)
+
+    if stl_files is None:
+        stl_files = module.get_stl_files_from_folder(module.stl_model_folder)
+    if not stl_files:
+        return {"type": "done", "success": False, "message": "没有找到STL模型"}
+
+    scene_key = _scene_key(config)
+    scene_reused = state.get("scene_key") == scene_key and state.get("scene_ctx") is not None
+    if scene_reused:
+        print("场景配置未变化，复用已构建的场景。", flush=True)
+    else:
+        state["scene_ctx"] = module.prepare_scene()
+        state["scene_key"] = scene_key if state["scene_ctx"] else None
+        if not state["scene_ctx"]:
+            return {"type": "done", "success": False, "message": "场景准备失败"}
+
+    module.render_stl_files(state["scene_ctx"], stl_files, module.WORKER_STL_INDEX_OFFSET)
+    module.finalize_outputs(state["scene_ctx"])
+    return {
+        "type": "done",
+        "success": True,
+        "scene_reused": scene_reused,
+        "parameters_file": module.PARAMS_OUTPUT_FILE,
+    }
+
+
+def serve(port, script_path):
+    module = _load_script_module(script_path)
+    state = {}
+    with socket.create_connection(("127.0.0.1", port)) as conn:
+        reader = conn.makefile('r', encoding='utf-8')
+        writer = conn.makefile('w', encoding='utf-8')
+        _send(writer, {"type": "ready"})
+        print(f"渲染服务已就绪 (端口 {port})", flush=True)
+
+        for line in reader:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if message.get("type") == "shutdown":
+                print("收到关闭指令，渲染服务退出。", flush=True)
+                break
+            if message.get("type") != "job":
+                _send(writer, {"type": "done", "success": False, "message": f"未知消息类型: {message.get('type')}"})
+                continue
+            try:
+                reply = handle_job(module, state, message)
+            except Exception as e:
+                traceback.print_exc()
+                state["scene_ctx"] = None
+                reply = {"type": "done", "success": False, "message": str(e)}
+            _send(writer, reply)
+
+
+if __name__ == "__main__":
+    serve(*_parse_args(sys.argv))
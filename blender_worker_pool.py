@@ -0,0 +1,181 @@
+"""
+Blender Worker Pool Module
+Splits the STL list into shards and runs one headless Blender process per shard
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import output_naming
+
+DEFAULT_SCRIPT_PATH = "深度图数据集_v7.py"
+# 支持 "worker" 配置段的脚本在模块顶层声明此标记
+_SHARD_SUPPORT_MARKER = re.compile(r"^SUPPORTS_WORKER_SHARDS\s*=\s*True\b", re.MULTILINE)
+
+
+def resolve_script_path(script_path):
+    """Resolve a relative Blender script path against the CWD, then this module's folder"""
+    path = Path(script_path)
+    if not path.is_absolute():
+        for base in (Path.cwd(), Path(__file__).parent):
+            if (base / path).exists():
+                return str((base / path).resolve())
+    return str(path)
+
+
+def script_supports_shards(script_path):
+    """True if the Blender script honours the "worker" config section (reads its source; no bpy needed)"""
+    try:
+        with open(resolve_script_path(script_path), 'r', encoding='utf-8') as f:
+            return bool(_SHARD_SUPPORT_MARKER.search(f.read()))
+    except OSError:
+        return False
+
+
+def list_stl_files(folder_path):
+    """List STL files exactly the way the Blender script does (sorted *.stl glob)"""
+    if not folder_path or not os.path.isdir(folder_path):
+        return []
+    stl_files = glob.glob(os.path.join(folder_path, "*.stl"))
+    stl_files.sort()
+    return stl_files
+
+
+def split_into_shards(items, shard_count):
+    """
+    Split items into at most shard_count contiguous shards.
+
+    Returns:
+        list of (global_index_offset, shard_items) tuples; empty shards are dropped
+    """
+    shard_count = max(1, int(shard_count))
+    base_size, remainder = divmod(len(items), shard_count)
+    shards = []
+    offset = 0
+    for shard_idx in range(shard_count):
+        size = base_size + (1 if shard_idx < remainder else 0)
+        if size:
+            shards.append((offset, items[offset:offset + size]))
+        offset += size
+    return shards
+
+
+def default_threads_per_worker(worker_count):
+    """Divide the host's cores evenly between the workers"""
+    return max(1, (os.cpu_count() or 1) // max(1, worker_count))
+
+
+def shard_cpu_set(shard_index, threads_per_worker):
+    """Disjoint block of cores for one shard (wraps around when oversubscribed)"""
+    cpu_count = os.cpu_count() or 1
+    start = shard_index * threads_per_worker
+    return {(start + i) % cpu_count for i in range(max(1, threads_per_worker))}
+
+
+class BlenderWorkerPool:
+    """Runs a dataset generation as N concurrent headless Blender workers"""
+
+    def __init__(self, integration, worker_count, threads_per_worker=None, tile_size=None, cpu_affinity=False):
+        self.integration = integration
+        self.worker_count = max(1, int(worker_count))
+        self.threads_per_worker = int(threads_per_worker or 0) or default_threads_per_worker(self.worker_count)
+        self.tile_size = int(tile_size or 0) or None
+        self.cpu_affinity = bool(cpu_affinity)
+
+    def _write_shard_config(self, mapped_config, shard_index, shard_count, offset, stl_files, run_id, stl_count):
+        shard_config = dict(mapped_config)
+        shard_config["worker"] = {
+            "shard_index": shard_index,
+            "shard_count": shard_count,
+            "stl_index_offset": offset,
+            "stl_files": stl_files,
+            "run_id": run_id,
+            "stl_count": stl_count,
+            "threads": self.threads_per_worker,
+            "tile_size": self.tile_size
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix=f'_shard{shard_index}.json',
+                                         delete=False, encoding='utf-8') as f:
+            json.dump(shard_config, f, indent=2, ensure_ascii=False)
+            return f.name
+
+    def _run_shard(self, shard_config_path, shard_index):
+        script = self.integration._create_blender_script(shard_config_path)
+        cpu_set = shard_cpu_set(shard_index, self.threads_per_worker) if self.cpu_affinity else None
+        return self.integration._execute_blender_script(
+            script, extra_args=["--threads", str(self.threads_per_worker)], cpu_affinity=cpu_set)
+
+    def run(self, mapped_config, progress_callback=None, stl_files=None):
+        """
+        Render the dataset described by mapped_config across the worker pool
+
+        Args:
+            mapped_config: Config as produced by BlenderMCPIntegration._map_config_keys
+            progress_callback: Function to call with progress updates
+            stl_files: Explicit STL list; defaults to every STL in paths.stl_folder
+
+        Returns:
+            dict: output_files and parameters_file collected from all shards
+        """
+        logger = logging.getLogger(__name__)
+
+        if stl_files is None:
+            stl_files = list_stl_files(mapped_config.get("paths", {}).get("stl_folder", ""))
+        if not stl_files:
+            raise FileNotFoundError("STL模型文件夹中没有找到STL文件，无法分片")
+
+        shards = split_into_shards(stl_files, self.worker_count)
+        script_path = mapped_config.get("advanced", {}).get("script_path", DEFAULT_SCRIPT_PATH)
+        if len(shards) > 1 and not script_supports_shards(script_path):
+            # 不读取 "worker" 段的脚本会让每个进程渲染全部STL并互相覆盖输出
+            raise ValueError(f"Blender脚本 '{script_path}' 不支持多进程分片 (缺少 SUPPORTS_WORKER_SHARDS 标记)，"
+                             f"请使用 {DEFAULT_SCRIPT_PATH} 或将进程数设为1")
+        logger.info(f"将 {len(stl_files)} 个STL分为 {len(shards)} 个分片，"
+                    f"每个Blender进程 {self.threads_per_worker} 线程")
+
+        # 所有分片共用一个运行编号，各自据此算出相同的文件编号区间
+        run_id = output_naming.new_run_id()
+        shard_config_paths = [
+            self._write_shard_config(mapped_config, shard_idx, len(shards), offset, shard_files,
+                                     run_id, len(stl_files))
+            for shard_idx, (offset, shard_files) in enumerate(shards)
+        ]
+
+        output_files = []
+        parameters_file = ""
+        failed_shards = []
+        try:
+            with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+                futures = {executor.submit(self._run_shard, path, shard_idx): shard_idx
+                           for shard_idx, path in enumerate(shard_config_paths)}
+                for finished_count, future in enumerate(as_completed(futures), start=1):
+                    shard_idx = futures[future]
+                    try:
+                        result = future.result()
+                        output_files.extend(result.get("output_files", []))
+                        parameters_file = parameters_file or result.get("parameters_file", "")
+                        logger.info(f"分片 {shard_idx} 完成")
+                    except Exception as e:
+                        failed_shards.append(shard_idx)
+                        logger.error(f"分片 {shard_idx} 失败: {e}")
+                    if progress_callback:
+                        progress_callback(30 + 65 * finished_count / len(shards),
+                                          f"已完成 {finished_count}/{len(shards)} 个分片")
+        finally:
+            for path in shard_config_paths:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+        if failed_shards:
+            raise Exception(f"{len(failed_shards)}/{len(shards)} 个分片执行失败: {sorted(failed_shards)}")
+
+        return {
+            "output_files": output_files,
+            "parameters_file": parameters_file
+        }
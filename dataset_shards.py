@@ -0,0 +1,200 @@
+"""
+Dataset Shards Module
+Packs the outputs of each (STL, view) sample into fixed-size tar shards.
+
+A sample groups everything rendered for one view: the pattern images, the
+ambient image, depth (and the projector pass EXRs in synthesis mode) plus a
+JSON member with the sample's metadata. Members are named
+'{key}.{component}{ext}' (e.g. '000012.pattern_003.png', '000012.json'), the
+layout WebDataset-style loaders read sequentially. Shards are plain tar files:
+PNG and EXR are already compressed.
+
+Blender still writes each output as a file; ShardWriter appends a finished
+sample to the open shard and deletes the loose files only after that shard
+has been closed, fsynced and recorded in the index. A crash therefore never
+loses a sample: samples of the torn shard still exist as loose files and are
+packed again on resume (packed_keys tells which keys are already in a shard).
+
+Every worker shard of a run writes its own samples_w###_######.tar files and
+its own shard_index_w###.jsonl (one line per closed shard), so workers never
+share a file.
+"""
+
+import glob
+import io
+import json
+import os
+import re
+import tarfile
+import time
+
+SHARD_INDEX_FILE_PATTERN = "shard_index_w*.jsonl"
+_WORKER_FILE_PATTERN = re.compile(r"(?:samples|shard_index)_w(\d+)[_.]")
+DEFAULT_SAMPLES_PER_SHARD = 1000
+
+
+def shard_file_name(worker_index, shard_number):
+    return f"samples_w{worker_index:03d}_{shard_number:06d}.tar"
+
+
+def member_name(key, component, filepath):
+    """Tar member of one output: '{key}.{component}{ext}'"""
+    return f"{key}.{component}{os.path.splitext(filepath)[1]}"
+
+
+def shard_index_path(shard_dir, worker_index=0):
+    return os.path.join(shard_dir, f"shard_index_w{worker_index:03d}.jsonl")
+
+
+def remove_worker_shards(shard_dir, worker_index=None, min_worker_index=None):
+    """Deletes the shards and index of one worker, or of every worker >= min_worker_index"""
+    for filepath in glob.glob(os.path.join(shard_dir, "*_w*")):
+        match = _WORKER_FILE_PATTERN.match(os.path.basename(filepath))
+        if not match:
+            continue
+        index = int(match.group(1))
+        if index == worker_index or (min_worker_index is not None and index >= min_worker_index):
+            os.remove(filepath)
+
+
+def read_shard_index(shard_dir):
+    """Yields the records of every worker's shard index; a torn last line is ignored"""
+    for filepath in sorted(glob.glob(os.path.join(shard_dir, SHARD_INDEX_FILE_PATTERN))):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def load_shard_index(shard_dir):
+    """{sample key: shard file name} of every closed shard in shard_dir"""
+    return {key: record["shard"] for record in read_shard_index(shard_dir) for key in record["samples"]}
+
+
+def split_member_name(member_name):
+    """'000012.pattern_003.png' -> ('000012', 'pattern_003.png')"""
+    key, _, suffix = os.path.basename(member_name).partition(".")
+    return key, suffix
+
+
+def iter_samples(shard_path):
+    """Yields (key, {suffix: bytes}) for the samples of one shard, in write order"""
+    current_key, current = None, {}
+    with tarfile.open(shard_path, 'r') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            key, suffix = split_member_name(member.name)
+            if key != current_key and current:
+                yield current_key, current
+                current = {}
+            current_key = key
+            current[suffix] = tar.extractfile(member).read()
+    if current:
+        yield current_key, current
+
+
+def read_sample(shard_dir, key, index=None):
+    """{suffix: bytes} of one sample, located through the shard index"""
+    index = index if index is not None else load_shard_index(shard_dir)
+    if key not in index:
+        raise KeyError(f"样本 {key} 不在任何分片中")
+    with tarfile.open(os.path.join(shard_dir, index[key]), 'r') as tar:
+        return {split_member_name(member.name)[1]: tar.extractfile(member).read()
+                for member in tar.getmembers() if member.isfile() and split_member_name(member.name)[0] == key}
+
+
+class ShardWriter:
+    """Appends samples to samples_per_shard-sized tar shards of one worker"""
+
+    def __init__(self, shard_dir, samples_per_shard=DEFAULT_SAMPLES_PER_SHARD, worker_index=0, worker_count=1,
+                 resume=False, shard_closed_callback=None):
+        """shard_closed_callback(shard_name, keys) runs once a shard is durable and indexed"""
+        self.shard_dir = shard_dir
+        self.samples_per_shard = max(1, int(samples_per_shard))
+        self.worker_index = worker_index
+        self.index_path = shard_index_path(shard_dir, worker_index)
+        os.makedirs(shard_dir, exist_ok=True)
+        if not resume:
+            # 新运行：本进程的旧分片作废；多出来的工作进程的分片由主分片删除
+            remove_worker_shards(shard_dir, worker_index, worker_count if worker_index == 0 else None)
+
+        records = list(read_shard_index(shard_dir))
+        self.packed_keys = {key for record in records for key in record["samples"]}
+        own_numbers = [record["number"] for record in records if record.get("worker") == worker_index]
+        # 未记录在索引中的分片是崩溃时未写完的，从其编号开始覆盖重写
+        self._next_number = max(own_numbers) + 1 if own_numbers else 0
+        self.shards_written = 0
+        self.shard_closed_callback = shard_closed_callback
+        self._tar = None
+        self._tar_path = None
+        self._keys = []
+        self._sources = []
+
+    def add_sample(self, key, files, metadata=None):
+        """
+        Appends one sample.
+
+        Args:
+            key: sample key without dots, e.g. '000012'
+            files: [(component, filepath)]; the member is '{key}.{component}{ext}'
+            metadata: JSON-serializable dict stored as '{key}.json'
+        """
+        if key in self.packed_keys or key in self._keys:
+            return
+        if self._tar is None:
+            self._tar_path = os.path.join(self.shard_dir, shard_file_name(self.worker_index, self._next_number))
+            self._tar = tarfile.open(self._tar_path, 'w', format=tarfile.PAX_FORMAT)
+
+        for component, filepath in files:
+            self._tar.add(filepath, arcname=member_name(key, component, filepath), recursive=False)
+        if metadata is not None:
+            payload = json.dumps(metadata, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            info = tarfile.TarInfo(f"{key}.json")
+            info.size = len(payload)
+            info.mtime = time.time()
+            self._tar.addfile(info, io.BytesIO(payload))
+        self._keys.append(key)
+        self._sources.extend(filepath for _, filepath in files)
+        if len(self._keys) >= self.samples_per_shard:
+            self._close_shard()
+
+    def _close_shard(self):
+        self._tar.close()
+        with open(self._tar_path, 'rb') as f:
+            os.fsync(f.fileno())
+        record = {"shard": os.path.basename(self._tar_path), "worker": self.worker_index,
+                  "number": self._next_number, "samples": self._keys,
+                  "bytes": os.path.getsize(self._tar_path), "time": time.time()}
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self.shard_closed_callback is not None:
+            self.shard_closed_callback(record["shard"], list(self._keys))
+
+        # 分片已落盘并记入索引后才删除零散文件
+        for filepath in self._sources:
+            try:
+                os.remove(filepath)
+            except OSError as e:
+                print(f"   警告：删除已打包文件 '{filepath}' 失败: {e}")
+        self.packed_keys.update(self._keys)
+        self.shards_written += 1
+        self._next_number += 1
+        self._tar = None
+        self._tar_path = None
+        self._keys = []
+        self._sources = []
+
+    @property
+    def pending_count(self):
+        """Samples in the shard that is still open"""
+        return len(self._keys)
+
+    def close(self):
+        if self._tar is not None:
+            self._close_shard()
+
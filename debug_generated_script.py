@@ -10,7 +10,7 @@ print(f"Python version: {{sys.version}}")
 print(f"Blender version: {{bpy.app.version_string}}")
 
 # Load configuration
-config_path = r"C:\Users\sua\AppData\Local\Temp\tmpytgtxofd.json"
+config_path = r"/tmp/tmpj411ez2w.json"
 try:
     with open(config_path, 'r', encoding='utf-8') as f:
         config = json.load(f)
@@ -24,7 +24,7 @@ this_script_dir = Path(__file__).parent
 print(f"This script directory: {{this_script_dir}}")
 
 # Handle script path from config
-user_script_relative = r"D:\blender-tool\深度图数据集_v6.py"
+user_script_relative = r"深度图数据集_v6.py"
 user_script_path_obj = Path(user_script_relative)
 
 if user_script_path_obj.is_absolute():
@@ -79,7 +79,7 @@ except ImportError as e:
     sys.exit(1)
 except AttributeError as e:
     print(f"FATAL ERROR: A function was not found in the module '{{module_name}}'. {{e}}")
-    print("Please ensure your script '深度图数据集_v6.py' contains all required functions.")
+    print(f"Please ensure your script '{{module_name}}.py' contains all required functions.")
 except Exception as e:
     print(f"Error during dataset generation: {{str(e)}}")
     import traceback
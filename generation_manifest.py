@@ -0,0 +1,125 @@
+"""
+Generation Manifest Module
+Append-only JSONL record of completed render units, used to resume crashed runs.
+
+Every worker shard appends to its own manifest_shard###.jsonl in the output
+root, so concurrent shards never share a file. A unit is one output written
+by one render: (kind, id) with kind in UNIT_KINDS and id the deterministic
+render id from compute_render_ids() (output_naming). A unit is recorded only after its render
+returned and its output files exist (mark_done_if_written), and each record
+is fsynced, so a crash loses at most the unit that was being rendered and a
+failed render is retried on resume. On resume, a unit counts as done only if it was recorded
+for the same STL file and under the same numbering layout.
+"""
+
+import glob
+import json
+import os
+import re
+import time
+
+UNIT_KINDS = ("depth", "pattern", "ambient", "projector_pass", "synthesis")
+MANIFEST_FILE_PATTERN = "manifest_shard*.jsonl"
+_SHARD_INDEX_PATTERN = re.compile(r"manifest_shard(\d+)\.jsonl$")
+
+
+def manifest_path(manifest_dir, shard_index=0):
+    return os.path.join(manifest_dir, f"manifest_shard{shard_index:03d}.jsonl")
+
+
+def remove_stale_manifests(manifest_dir, shard_count):
+    """Deletes manifests of shards that do not exist in a run with shard_count workers"""
+    for filepath in glob.glob(os.path.join(manifest_dir, MANIFEST_FILE_PATTERN)):
+        match = _SHARD_INDEX_PATTERN.search(os.path.basename(filepath))
+        if match and int(match.group(1)) >= shard_count:
+            os.remove(filepath)
+
+
+def read_manifest_records(filepath):
+    """Yields the records of one manifest; a torn last line from a crash is ignored"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_completed_units(manifest_dir, layout):
+    """
+    Collects {(kind, id): stl_name} from every shard manifest in manifest_dir.
+
+    Records written under a different numbering layout (pattern count, views
+    per STL) are ignored, since their ids would mean different outputs.
+    """
+    completed = {}
+    for filepath in sorted(glob.glob(os.path.join(manifest_dir, MANIFEST_FILE_PATTERN))):
+        current_layout = None
+        for record in read_manifest_records(filepath):
+            if record.get("type") == "run":
+                current_layout = record.get("layout")
+            elif record.get("type") == "unit" and current_layout == layout:
+                completed[(record["kind"], int(record["id"]))] = record.get("stl")
+    return completed
+
+
+class GenerationManifest:
+    """Durable per-shard record of completed (kind, id) render units"""
+
+    def __init__(self, manifest_dir, layout, shard_index=0, shard_count=1, resume=False):
+        self.layout = dict(layout)
+        self.path = manifest_path(manifest_dir, shard_index)
+        os.makedirs(manifest_dir, exist_ok=True)
+        if resume:
+            self.completed = load_completed_units(manifest_dir, self.layout)
+        else:
+            self.completed = {}
+            # 新运行：旧运行中多出来的分片清单不再对应任何进程，由主分片删除
+            if shard_index == 0:
+                remove_stale_manifests(manifest_dir, shard_count)
+        # 非续跑时本分片从新清单开始；续跑时在原清单后追加
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        self._append({"type": "run", "layout": self.layout, "resume": bool(resume), "time": time.time()})
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, kind, unit_id, stl_name):
+        return self.completed.get((kind, int(unit_id)), None) == stl_name
+
+    def all_done(self, units, stl_name):
+        return all(self.is_done(kind, unit_id, stl_name) for kind, unit_id in units)
+
+    def mark_done(self, kind, unit_id, stl_name):
+        if kind not in UNIT_KINDS:
+            raise ValueError(f"未知的渲染单元类型: {kind}")
+        self._append({"type": "unit", "kind": kind, "id": int(unit_id), "stl": stl_name, "time": time.time()})
+        self.completed[(kind, int(unit_id))] = stl_name
+
+    def mark_done_if_written(self, kind, unit_id, stl_name, output_paths, before_mark=None):
+        """
+        Records the unit only if every output file exists and is non-empty;
+        returns whether it did. before_mark() runs right before the record is
+        written (e.g. to make the view's metadata durable first).
+        """
+        missing = [path for path in output_paths if not (os.path.isfile(path) and os.path.getsize(path) > 0)]
+        if missing:
+            print(f"   警告：{kind} {unit_id} 的输出文件缺失，不记为完成: {missing}")
+            return False
+        if before_mark is not None:
+            before_mark()
+        self.mark_done(kind, unit_id, stl_name)
+        return True
+
+    @property
+    def completed_count(self):
+        return len(self.completed)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,174 @@
+"""
+Mesh Cache Module
+Stores the normalized geometry of imported STL models as compact .npz files.
+
+import_and_prepare_stl() in the v7 script imports every STL through
+bpy.ops.wm.stl_import, centers the parts and scales the model to the target
+size, which is identical work on every run. The
+result is saved here once: per part the vertex positions in the model root's
+space plus the polygon index arrays, and the root's scale factor. Later runs
+build the meshes directly with foreach_set.
+
+Entries are keyed by the STL file hash, the target size and the STL reader
+("operator" = stl_import, "numpy" = stl_reader), since the two importers do
+not produce identical geometry (stl_reader welds and drops degenerate faces).
+
+Usage (inside Blender, prebuilds the cache for a folder):
+    blender --background --python mesh_cache.py -- <stl_folder> <target_largest_dimension> [cache_dir]
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from render_cache import file_digest
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".blender_tool", "mesh_cache")
+# 归一化步骤改变时递增，使旧缓存失效
+MESH_CACHE_VERSION = 3
+
+
+def mesh_cache_path(stl_filepath, target_largest_dimension, cache_dir=DEFAULT_CACHE_DIR, variant="",
+                    reader="operator"):
+    """
+    reader is the STL backend that produced the geometry; variant distinguishes
+    derived geometry of the same model, e.g. decimated versions
+    """
+    key_text = (f"{MESH_CACHE_VERSION}:{file_digest(stl_filepath)}:{float(target_largest_dimension)!r}:"
+                f"{reader}:{variant}")
+    key = hashlib.sha256(key_text.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{key}.npz")
+
+
+def save_normalized_mesh(cache_path, parts, scale_factor):
+    """
+    Args:
+        parts: list of dicts with 'vertices' (N, 3) float32 in root space,
+            'loop_starts' / 'loop_totals' (P,) int32 and 'loop_vertices' (L,) int32
+        scale_factor: uniform scale of the model root
+    """
+    arrays = {"scale_factor": np.float64(scale_factor), "part_count": np.int32(len(parts))}
+    for part_idx, part in enumerate(parts):
+        arrays[f"vertices_{part_idx}"] = np.asarray(part["vertices"], dtype=np.float32)
+        arrays[f"loop_starts_{part_idx}"] = np.asarray(part["loop_starts"], dtype=np.int32)
+        arrays[f"loop_totals_{part_idx}"] = np.asarray(part["loop_totals"], dtype=np.int32)
+        arrays[f"loop_vertices_{part_idx}"] = np.asarray(part["loop_vertices"], dtype=np.int32)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def load_normalized_mesh(cache_path):
+    """Returns (parts, scale_factor) or None if there is no usable entry"""
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as data:
+            parts = []
+            for part_idx in range(int(data["part_count"])):
+                parts.append({
+                    "vertices": data[f"vertices_{part_idx}"],
+                    "loop_starts": data[f"loop_starts_{part_idx}"],
+                    "loop_totals": data[f"loop_totals_{part_idx}"],
+                    "loop_vertices": data[f"loop_vertices_{part_idx}"],
+                })
+            return parts, float(data["scale_factor"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def extract_normalized_parts(root_obj):
+    """Reads the mesh children of a prepared model root into cacheable part arrays"""
+    parts = []
+    for mesh_obj in root_obj.children:
+        if mesh_obj.type != 'MESH' or not mesh_obj.data:
+            continue
+        mesh = mesh_obj.data
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", vertices)
+        vertices = vertices.reshape(-1, 3)
+        # 子对象只有平移 (位于根对象空间)，直接烘焙进顶点
+        vertices += np.asarray(mesh_obj.location, dtype=np.float32)
+
+        loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+        loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        parts.append({"vertices": vertices, "loop_starts": loop_starts,
+                      "loop_totals": loop_totals, "loop_vertices": loop_vertices})
+    return parts
+
+
+def build_mesh_data(name, part):
+    """Creates a bpy mesh datablock from cached part arrays with foreach_set"""
+    import bpy
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(part["vertices"]))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(part["vertices"], dtype=np.float32).ravel())
+    mesh.loops.add(len(part["loop_vertices"]))
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(part["loop_vertices"], dtype=np.int32))
+    mesh.polygons.add(len(part["loop_starts"]))
+    mesh.polygons.foreach_set("loop_start", np.ascontiguousarray(part["loop_starts"], dtype=np.int32))
+    try:
+        # Blender 4.0 之前还需要写入 loop_total
+        mesh.polygons.foreach_set("loop_total", np.ascontiguousarray(part["loop_totals"], dtype=np.int32))
+    except (AttributeError, RuntimeError, TypeError):
+        pass
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def instantiate_normalized_mesh(parts, scale_factor, root_name, part_name_base, collection):
+    """Builds the model root empty and its part objects; returns the root"""
+    import bpy
+
+    root_obj = bpy.data.objects.new(root_name, None)
+    collection.objects.link(root_obj)
+    for part_idx, part in enumerate(parts):
+        part_name = f"{part_name_base}_part{part_idx}"
+        mesh_obj = bpy.data.objects.new(part_name, build_mesh_data(part_name, part))
+        collection.objects.link(mesh_obj)
+        mesh_obj.parent = root_obj
+    root_obj.scale = (scale_factor, scale_factor, scale_factor)
+    return root_obj
+
+
+def prebuild_folder(stl_folder, target_largest_dimension, cache_dir=DEFAULT_CACHE_DIR):
+    """Imports and normalizes every STL of a folder that is not cached yet (inside Blender)"""
+    import importlib.util
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location("dataset_script", os.path.join(script_dir, "深度图数据集_v7.py"))
+    dataset_script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dataset_script)
+    dataset_script.USE_MESH_CACHE = True
+    dataset_script.MESH_CACHE_DIR = cache_dir
+
+    stl_files = dataset_script.get_stl_files_from_folder(stl_folder)
+    built = 0
+    for stl_filepath in stl_files:
+        if os.path.isfile(mesh_cache_path(stl_filepath, target_largest_dimension, cache_dir,
+                                          reader=dataset_script.STL_READER_BACKEND)):
+            continue
+        root_obj = dataset_script.import_and_prepare_stl(
+            stl_filepath, dataset_script.CURRENT_STL_TARGET_NAME, (0.0, 0.0, 0.0), target_largest_dimension)
+        if root_obj:
+            built += 1
+            dataset_script.clear_object_hierarchy(root_obj.name)
+    print(f"网格缓存预处理完成: 新建 {built} 个, 共 {len(stl_files)} 个STL, 缓存目录 {cache_dir}")
+    return built
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if len(args) < 2:
+        raise SystemExit("用法: blender --background --python mesh_cache.py -- <stl_folder> <target_largest_dimension> [cache_dir]")
+    prebuild_folder(args[0], float(args[1]), args[2] if len(args) > 2 else DEFAULT_CACHE_DIR)
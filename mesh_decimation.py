@@ -0,0 +1,97 @@
+"""
+Mesh Decimation Module
+Pixel-budget vertex-clustering decimation of oversized STL models.
+
+After scaling to STL_TARGET_LARGEST_DIMENSION and viewing from the scanner
+camera, a model's nearest point is still far enough that one pixel covers
+world_units_per_pixel() centimeters. Vertices closer together than
+error_px such pixels cannot be told apart in any render, so they are merged
+into one per grid cell: the geometric error of the result is bounded by one
+cell diagonal, i.e. by roughly error_px pixels on screen. Meshes whose
+triangles are already larger than a cell are returned unchanged.
+
+Pure NumPy, no bpy: the v7 script applies it to the cached part arrays of
+mesh_cache and stores the decimated parts as a separate cache variant.
+"""
+
+import math
+
+import numpy as np
+
+from stl_reader import mesh_part_arrays
+
+
+def world_units_per_pixel(camera_location, target_location, target_largest_dimension, focal_length_px):
+    """Size of one pixel at the model's nearest possible point (bounding sphere of the scaled model)"""
+    distance = math.dist(camera_location, target_location)
+    nearest_distance = max(distance - target_largest_dimension * math.sqrt(3.0) / 2.0, 1e-6)
+    return nearest_distance / focal_length_px
+
+
+def decimation_cell_size(error_px, units_per_pixel, scale_factor):
+    """Grid cell edge in the model's unscaled root space; the cell diagonal spans error_px pixels"""
+    return error_px * units_per_pixel / math.sqrt(3.0) / scale_factor
+
+
+def cluster_decimate(vertices, faces, cell_size):
+    """
+    Merges all vertices inside each cell_size grid cell into their mean and
+    drops the triangles that collapse.
+
+    Returns:
+        tuple: (vertices (M, 3) float32, faces (G, 3) int32)
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    if cell_size <= 0 or len(faces) == 0:
+        return vertices.astype(np.float32), faces.astype(np.int32)
+
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster_of_vertex = np.unique(cells, axis=0, return_inverse=True)
+    cluster_of_vertex = cluster_of_vertex.ravel()
+    cluster_count = int(cluster_of_vertex.max()) + 1
+    counts = np.bincount(cluster_of_vertex, minlength=cluster_count)[:, np.newaxis]
+    cluster_positions = np.stack([np.bincount(cluster_of_vertex, weights=vertices[:, axis], minlength=cluster_count)
+                                  for axis in range(3)], axis=1) / counts
+
+    clustered_faces = cluster_of_vertex[faces]
+    keep = ((clustered_faces[:, 0] != clustered_faces[:, 1]) &
+            (clustered_faces[:, 1] != clustered_faces[:, 2]) &
+            (clustered_faces[:, 0] != clustered_faces[:, 2]))
+    clustered_faces = clustered_faces[keep]
+    # 合并后重复的三角形只保留一个 (保持原有的绕序)
+    _, unique_rows = np.unique(np.sort(clustered_faces, axis=1), axis=0, return_index=True)
+    clustered_faces = clustered_faces[np.sort(unique_rows)]
+
+    used_clusters, compact_faces = np.unique(clustered_faces, return_inverse=True)
+    return (cluster_positions[used_clusters].astype(np.float32),
+            compact_faces.reshape(-1, 3).astype(np.int32))
+
+
+def part_triangle_faces(part):
+    """(F, 3) faces of a mesh_cache part, or None if it is not a pure triangle mesh"""
+    if not np.all(part["loop_totals"] == 3):
+        return None
+    return np.asarray(part["loop_vertices"], dtype=np.int64).reshape(-1, 3)
+
+
+def decimate_parts(parts, cell_size, min_triangles=0):
+    """
+    Decimates every triangle part of a model with more than min_triangles triangles.
+
+    Returns:
+        tuple: (new parts, triangles before, triangles after)
+    """
+    triangles_before = sum(len(part["loop_totals"]) for part in parts)
+    if triangles_before <= min_triangles:
+        return parts, triangles_before, triangles_before
+
+    decimated = []
+    for part in parts:
+        faces = part_triangle_faces(part)
+        if faces is None:
+            decimated.append(part)
+            continue
+        decimated.append(mesh_part_arrays(*cluster_decimate(part["vertices"], faces, cell_size)))
+    triangles_after = sum(len(part["loop_totals"]) for part in decimated)
+    return decimated, triangles_before, triangles_after
@@ -0,0 +1,103 @@
+"""
+Mesh Utilities Module
+Vectorized mesh bounds, centering and plane contact for the v7 script.
+
+Vertex coordinates are read once with mesh.vertices.foreach_get into NumPy,
+so bounds are exact (not the loose eight bound_box corners of a rotated
+object) and a 1M-triangle model costs one array pass instead of per-corner
+Vector arithmetic. All parts of a multi-part import are handled together in
+the model root's space, which keeps their relative positions.
+"""
+
+import hashlib
+
+import numpy as np
+
+
+def matrix_to_numpy(matrix):
+    """mathutils 4x4 Matrix (or nested rows) -> (4, 4) float64 array"""
+    return np.array([list(row) for row in matrix], dtype=np.float64)
+
+
+def transform_points(points, matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def mesh_vertex_coordinates(mesh):
+    """(N, 3) float64 vertex coordinates of a bpy mesh"""
+    coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", coordinates)
+    return coordinates.reshape(-1, 3)
+
+
+def mesh_children(root_obj):
+    return [child for child in root_obj.children if child.type == 'MESH' and child.data and child.data.vertices]
+
+
+def root_space_vertices(root_obj):
+    """All vertices of the mesh children of root_obj in the root's space, (N, 3)"""
+    parts = [transform_points(mesh_vertex_coordinates(child.data), matrix_to_numpy(child.matrix_local))
+             for child in mesh_children(root_obj)]
+    if not parts:
+        return np.empty((0, 3), dtype=np.float64)
+    return np.concatenate(parts)
+
+
+def mesh_loop_vertex_indices(mesh):
+    """(vertex indices of every loop, loop count of every polygon) of a bpy mesh"""
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    return loop_vertices, loop_totals
+
+
+def root_mesh_digest(root_obj):
+    """
+    SHA-256 of the final mesh children of root_obj (vertices, faces and
+    placement in the root's space). Unlike the STL file digest it changes
+    with everything that shapes the instantiated mesh: reader backend,
+    welding, decimation and the mesh cache version.
+    """
+    digest = hashlib.sha256()
+    for child in mesh_children(root_obj):
+        loop_vertices, loop_totals = mesh_loop_vertex_indices(child.data)
+        for array in (matrix_to_numpy(child.matrix_local), mesh_vertex_coordinates(child.data),
+                      loop_vertices, loop_totals):
+            digest.update(np.ascontiguousarray(array).tobytes())
+            digest.update(str(array.shape).encode('ascii'))
+    return digest.hexdigest()
+
+
+def axis_aligned_bounds(points):
+    """Returns (min (3,), max (3,)) of a point set"""
+    return points.min(axis=0), points.max(axis=0)
+
+
+def centering_and_scale(points, target_largest_dimension, min_dimension=1e-7):
+    """
+    Returns (center, scale_factor): translating by -center puts the AABB
+    center at the origin, scaling by scale_factor makes its largest side
+    target_largest_dimension. scale_factor is None for degenerate geometry.
+    """
+    minimum, maximum = axis_aligned_bounds(points)
+    largest_dimension = float((maximum - minimum).max())
+    scale_factor = target_largest_dimension / largest_dimension if largest_dimension > min_dimension else None
+    return (minimum + maximum) / 2.0, scale_factor
+
+
+def contact_offset(local_points, local_to_world, plane_point, plane_normal, clearance=0.0):
+    """
+    Distance to move an object along the (unit) plane normal so that its
+    lowest vertex lies clearance above the plane.
+
+    Projecting every world vertex onto the normal equals projecting the local
+    vertices onto R^T n, so the points are never transformed as a whole.
+    """
+    local_to_world = np.asarray(local_to_world, dtype=np.float64)
+    plane_normal = np.asarray(plane_normal, dtype=np.float64)
+    plane_normal = plane_normal / np.linalg.norm(plane_normal)
+    local_direction = local_to_world[:3, :3].T @ plane_normal
+    min_projection = float((local_points @ local_direction).min()) + float(local_to_world[:3, 3] @ plane_normal)
+    return float(np.asarray(plane_point, dtype=np.float64) @ plane_normal) - min_projection + clearance
@@ -0,0 +1,131 @@
+"""
+Output Naming Module
+Fixes every output file name when the file is written, so no rename pass is needed.
+
+Each run of the generator owns a contiguous block of view ids and pattern ids:
+
+    view_ordinal = stl_index * views_per_stl + view_index
+    view_id      = view_id_offset + view_ordinal + 1
+    pattern_id   = pattern_id_offset + view_ordinal * K + pattern_index + 1
+
+and files are named '{pattern_id:06d}_pattern.png', '{view_id:06d}_ambient.png',
+'depth_R_{view_id:06d}.exr' the moment they are written. The blocks of a
+dataset folder are recorded in runs.json in the output root:
+
+    new     the first run of a dataset; starts at offset 0 and replaces runs.json
+    append  continues numbering after the blocks of every earlier run
+    resume  reuses the block of the last run, so resumed outputs keep their names
+
+Workers of one sharded run compute the same block from the same records
+(an append run ignores its own record, which worker 0 may already have
+written), and only worker 0 writes runs.json.
+"""
+
+import datetime
+import json
+import os
+import secrets
+import time
+
+RUNS_FILE_NAME = "runs.json"
+RUN_MODES = ("new", "append", "resume")
+
+
+def render_ids(stl_index, view_index, views_per_stl, pattern_count, view_id_offset=0, pattern_id_offset=0):
+    """(first_pattern_id, view_id) of one (STL, view); the ambient and depth outputs use view_id"""
+    view_ordinal = stl_index * views_per_stl + view_index
+    return pattern_id_offset + view_ordinal * pattern_count + 1, view_id_offset + view_ordinal + 1
+
+
+def new_run_id():
+    """Timestamped run id; microseconds plus a random suffix keep runs started in the same second apart"""
+    return f"run_{datetime.datetime.now():%Y%m%d_%H%M%S_%f}_{secrets.token_hex(3)}"
+
+
+def runs_path(output_root):
+    return os.path.join(output_root, RUNS_FILE_NAME)
+
+
+def load_runs(output_root):
+    """Run records of a dataset folder, oldest first ([] if it has none)"""
+    try:
+        with open(runs_path(output_root), 'r', encoding='utf-8') as f:
+            return json.load(f).get("runs", [])
+    except (OSError, ValueError):
+        return []
+
+
+def save_runs(output_root, runs):
+    """Replaces runs.json atomically"""
+    filepath = runs_path(output_root)
+    tmp_path = f"{filepath}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"runs": runs}, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+class RunNaming:
+    """The id block of one run"""
+
+    def __init__(self, run_id, stl_count, views_per_stl, pattern_count, view_id_offset=0, pattern_id_offset=0):
+        self.run_id = run_id
+        self.stl_count = int(stl_count)
+        self.views_per_stl = int(views_per_stl)
+        self.pattern_count = int(pattern_count)
+        self.view_id_offset = int(view_id_offset)
+        self.pattern_id_offset = int(pattern_id_offset)
+
+    def render_ids(self, stl_index, view_index):
+        return render_ids(stl_index, view_index, self.views_per_stl, self.pattern_count,
+                          self.view_id_offset, self.pattern_id_offset)
+
+    @property
+    def view_id_end(self):
+        """Last view id of the block"""
+        return self.view_id_offset + self.stl_count * self.views_per_stl
+
+    @property
+    def pattern_id_end(self):
+        """Last pattern id of the block"""
+        return self.pattern_id_offset + self.stl_count * self.views_per_stl * self.pattern_count
+
+    def to_record(self):
+        return {"run_id": self.run_id, "stl_count": self.stl_count, "views_per_stl": self.views_per_stl,
+                "pattern_count": self.pattern_count, "view_id_offset": self.view_id_offset,
+                "pattern_id_offset": self.pattern_id_offset, "view_id_end": self.view_id_end,
+                "pattern_id_end": self.pattern_id_end, "time": time.time()}
+
+
+def open_run(output_root, run_id, stl_count, views_per_stl, pattern_count, mode="new", write=True):
+    """
+    Assigns the id block of a run and records it in runs.json.
+
+    Args:
+        run_id: shared by every worker of the run (new_run_id() if None)
+        stl_count: STL files of the whole run, not of one worker
+        mode: one of RUN_MODES
+        write: False for workers other than worker 0
+
+    Returns:
+        RunNaming
+    """
+    if mode not in RUN_MODES:
+        raise ValueError(f"未知的运行模式: {mode}")
+    runs = load_runs(output_root) if mode != "new" else []
+    if mode == "resume" and runs:
+        # 续跑沿用上一次运行的编号区间
+        last = runs.pop()
+        run_id = last["run_id"]
+        view_id_offset, pattern_id_offset = last["view_id_offset"], last["pattern_id_offset"]
+    else:
+        runs = [run for run in runs if run["run_id"] != run_id]
+        view_id_offset = max([run["view_id_end"] for run in runs], default=0)
+        pattern_id_offset = max([run["pattern_id_end"] for run in runs], default=0)
+    naming = RunNaming(run_id or new_run_id(), stl_count, views_per_stl, pattern_count,
+                       view_id_offset, pattern_id_offset)
+    if write:
+        os.makedirs(output_root, exist_ok=True)
+        save_runs(output_root, runs + [naming.to_record()])
+    return naming
@@ -0,0 +1,200 @@
+"""
+Pattern Cache Module
+Loads every projector pattern image once per Blender process and keeps the
+datablocks within a memory cap.
+
+Blender holds 16-bit PNGs as RGBA float buffers (16 bytes per pixel), so a
+large pattern library costs gigabytes. Many such files only contain 8-bit
+levels (binary / Gray-code patterns saved as 16-bit): those are converted to
+a byte image (4 bytes per pixel) that samples to the same values. Patterns
+with real 16-bit gradations stay float.
+
+Datablocks are named after the file's content hash, so identical files share
+one image and a cache created again in the same process (e.g. a new run in
+the render server) adopts the images that are already loaded. Switching
+patterns between renders only reassigns the texture node's image. When the
+buffers exceed max_bytes the least recently used images are removed, never
+the ones requested by the current call.
+
+Sources are either file paths or pattern_generator.GeneratedPattern objects,
+whose pixels are pushed into a new image with pixels.foreach_set.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from pattern_generator import GeneratedPattern
+from pattern_synthesis import linear_to_srgb
+from render_cache import file_digest
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+IMAGE_NAME_PREFIX = "pattern_"
+# 与最近的8位量化级的最大偏差 (以量化级为单位)，超出则认为图案含有16位层次
+BYTE_LEVEL_TOLERANCE = 0.05
+
+
+def image_buffer_bytes(width, height, is_float):
+    """Size of Blender's RGBA buffer of an image"""
+    return width * height * 4 * (4 if is_float else 1)
+
+
+def pattern_digest(source):
+    """Content hash of a pattern file or generated pattern"""
+    if isinstance(source, GeneratedPattern):
+        return source.digest
+    return file_digest(source)
+
+
+def byte_pattern_pixels(linear_pixels, colorspace):
+    """
+    Returns the byte image values (0..1, multiples of 1/255) that reproduce a
+    float image's linear pixels, or None if the image has finer levels.
+
+    Float images hold linear values while byte images hold encoded values and
+    are decoded while sampling, so the pixels are re-encoded first.
+    """
+    if colorspace == 'sRGB':
+        encoded = np.array(linear_pixels, dtype=np.float32)
+        encoded[..., :3] = linear_to_srgb(encoded[..., :3])
+    elif colorspace == 'Non-Color':
+        encoded = np.clip(np.asarray(linear_pixels, dtype=np.float32), 0.0, 1.0)
+    else:
+        return None
+    levels = encoded * 255.0
+    rounded = np.round(levels)
+    if np.abs(levels - rounded).max() > BYTE_LEVEL_TOLERANCE:
+        return None
+    return rounded.astype(np.float32) / 255.0
+
+
+class PatternTextureCache:
+    """Content-addressed, size-bounded cache of pattern image datablocks"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self.loads = 0
+        self.hits = 0
+        self.compacted = 0
+        self._entries = OrderedDict()
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def get(self, source):
+        """Image datablock of one pattern file or generated pattern"""
+        return self.get_many([source])[0]
+
+    def get_many(self, sources):
+        """Image datablocks of several patterns, all kept alive until the next call"""
+        keys = [IMAGE_NAME_PREFIX + pattern_digest(source)[:24] for source in sources]
+        images = []
+        for key, source in zip(keys, sources):
+            entry = self._entries.get(key)
+            if entry is not None and self._is_valid(entry[0]):
+                self.hits += 1
+            else:
+                if isinstance(source, GeneratedPattern):
+                    image = self._adopt_image(key) or self._create_image(key, source)
+                else:
+                    image = self._adopt_image(key) or self._load_image(key, source)
+                entry = (image, self._image_bytes(image))
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            images.append(entry[0])
+        self._evict(set(keys))
+        return images
+
+    def clear(self):
+        for image, _ in self._entries.values():
+            self._remove_image(image)
+        self._entries.clear()
+
+    def _evict(self, keep_keys):
+        total = self.total_bytes
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key in keep_keys:
+                continue
+            image, size = self._entries.pop(key)
+            self._remove_image(image)
+            total -= size
+
+    # --- bpy access (overridden in tests) ---
+
+    def _is_valid(self, image):
+        try:
+            return image.name is not None
+        except ReferenceError:
+            return False
+
+    def _adopt_image(self, key):
+        import bpy
+
+        return bpy.data.images.get(key)
+
+    def _image_bytes(self, image):
+        return image_buffer_bytes(image.size[0], image.size[1], image.is_float)
+
+    def _load_image(self, key, filepath):
+        import bpy
+
+        self.loads += 1
+        image = bpy.data.images.load(filepath, check_existing=False)
+        image.name = key
+        if not image.is_float:
+            return image
+
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        byte_pixels = byte_pattern_pixels(pixels.reshape(height, width, 4), image.colorspace_settings.name)
+        if byte_pixels is None:
+            return image
+
+        colorspace = image.colorspace_settings.name
+        bpy.data.images.remove(image)
+        compact = bpy.data.images.new(key, width, height, alpha=False, float_buffer=False)
+        compact.colorspace_settings.name = colorspace
+        compact.pixels.foreach_set(byte_pixels.ravel())
+        # 打包为内存中的PNG，缓冲区被释放后也能按原值重新加载
+        compact.pack()
+        self.compacted += 1
+        return compact
+
+    def _create_image(self, key, pattern):
+        """Builds a generated pattern's image: byte buffer for 0/1 patterns, float otherwise"""
+        import bpy
+
+        self.loads += 1
+        width, height = pattern.size
+        float_buffer = not pattern.is_binary
+        image = bpy.data.images.new(key, width, height, alpha=False, float_buffer=float_buffer)
+        if float_buffer:
+            image.file_format = 'OPEN_EXR'
+        else:
+            image.colorspace_settings.name = pattern.colorspace
+        image.pixels.foreach_set(pattern.rgba_pixels(linear=float_buffer).ravel())
+        image.pack()
+        return image
+
+    def _remove_image(self, image):
+        import bpy
+
+        if self._is_valid(image):
+            bpy.data.images.remove(image)
+
+
+_default_cache = None
+
+
+def get_pattern_cache(max_bytes=None):
+    """Process-wide cache; max_bytes updates the cap of an existing cache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PatternTextureCache(DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+    elif max_bytes is not None:
+        _default_cache.max_bytes = int(max_bytes)
+    return _default_cache
@@ -0,0 +1,153 @@
+"""
+Pattern Generator Module
+Computes structured-light pattern sets in NumPy instead of reading PNG files.
+
+Supported sets:
+    phase_shift  N-step sinusoidal phase shift of one fringe period
+    heterodyne   N-step phase shift for several periods (multi-frequency heterodyne)
+    gray_code    Gray-code bit planes, optionally followed by their inverses
+    binary       plain binary bit planes, optionally followed by their inverses
+
+Values are encoded intensities in 0..1 with the same meaning as the pixels of
+an 8-bit sRGB pattern PNG, stored in Blender pixel order (row 0 = bottom).
+Each pattern carries its metadata (period, phase offset, bit), which the v7
+script writes into scene_parameters.json. pattern_cache turns a pattern into
+an image datablock with pixels.foreach_set, so no file is written or read.
+"""
+
+import hashlib
+import json
+import math
+
+import numpy as np
+
+from pattern_synthesis import srgb_to_linear
+
+PATTERN_TYPES = ("phase_shift", "heterodyne", "gray_code", "binary")
+DEFAULT_PATTERN_PARAMS = {
+    "width": 1024,
+    "height": 768,
+    "steps": 4,
+    "periods": [32.0],
+    "orientation": "vertical",
+    "inverse": False,
+}
+
+
+class GeneratedPattern:
+    """One procedural pattern: (H, W) encoded values plus its metadata"""
+
+    def __init__(self, name, values, metadata, colorspace='sRGB'):
+        self.name = name
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.metadata = metadata
+        self.colorspace = colorspace
+        hasher = hashlib.sha256()
+        hasher.update(json.dumps([list(self.values.shape), colorspace]).encode('utf-8'))
+        hasher.update(self.values.tobytes())
+        self.digest = hasher.hexdigest()
+
+    def __repr__(self):
+        return f"GeneratedPattern({self.name})"
+
+    @property
+    def size(self):
+        """(width, height) like bpy Image.size"""
+        return self.values.shape[1], self.values.shape[0]
+
+    @property
+    def is_binary(self):
+        """True if every value is 0 or 1, i.e. a byte image holds it exactly"""
+        return bool(np.all((self.values == 0.0) | (self.values == 1.0)))
+
+    def rgba_pixels(self, linear=False):
+        """(H, W, 4) pixels; linear=True for float images, which hold linear values"""
+        values = srgb_to_linear(self.values) if linear and self.colorspace == 'sRGB' else self.values
+        rgba = np.ones(self.values.shape + (4,), dtype=np.float32)
+        rgba[..., :3] = values[..., np.newaxis]
+        return rgba
+
+    def linear_pixels(self):
+        """(H, W, 1) linear pattern for pattern_synthesis"""
+        return self.rgba_pixels(linear=True)[..., :1]
+
+
+def fringe_coordinates(width, height, orientation):
+    """(H, W) pixel index along which the code varies, and its extent"""
+    if orientation == "vertical":
+        return np.broadcast_to(np.arange(width, dtype=np.float64), (height, width)), width
+    if orientation == "horizontal":
+        return np.broadcast_to(np.arange(height, dtype=np.float64)[:, np.newaxis], (height, width)), height
+    raise ValueError(f"未知的条纹方向: {orientation}")
+
+
+def phase_shift_patterns(coordinates, period_px, steps, orientation, name_prefix, extra_metadata=None):
+    """I_k = 0.5 + 0.5 * cos(2*pi*x / period + 2*pi*k / steps)"""
+    phase = coordinates * (2.0 * math.pi / period_px)
+    patterns = []
+    for step in range(steps):
+        phase_offset = 2.0 * math.pi * step / steps
+        metadata = {"type": "phase_shift", "orientation": orientation, "period_px": float(period_px),
+                    "frequency": 1.0 / float(period_px), "step": step, "steps": steps,
+                    "phase_offset_rad": phase_offset}
+        metadata.update(extra_metadata or {})
+        patterns.append(GeneratedPattern(f"{name_prefix}_{step}", 0.5 + 0.5 * np.cos(phase + phase_offset), metadata))
+    return patterns
+
+
+def bit_plane_patterns(coordinates, extent, orientation, gray, inverse, bits=None):
+    """Bit planes (most significant first) of the binary or Gray code of each column / row"""
+    bits = bits or max(1, math.ceil(math.log2(extent)))
+    # 直接以像素序号编码：相邻列/行的格雷码只差一位
+    codes = coordinates.astype(np.int64)
+    if gray:
+        codes = codes ^ (codes >> 1)
+    code_type = "gray_code" if gray else "binary"
+    patterns = []
+    for inverted in ([False, True] if inverse else [False]):
+        for bit in range(bits):
+            plane = ((codes >> (bits - 1 - bit)) & 1).astype(np.float32)
+            if inverted:
+                plane = 1.0 - plane
+            metadata = {"type": code_type, "orientation": orientation, "bit": bit, "bits": bits,
+                        "inverted": inverted}
+            suffix = "_inv" if inverted else ""
+            patterns.append(GeneratedPattern(f"{code_type}_{bit}{suffix}", plane, metadata))
+    return patterns
+
+
+def generate_patterns(pattern_type, params=None):
+    """
+    Builds a pattern set.
+
+    Args:
+        pattern_type: one of PATTERN_TYPES
+        params: overrides of DEFAULT_PATTERN_PARAMS (width, height, steps,
+            periods, orientation, inverse, optional bits)
+
+    Returns:
+        list of GeneratedPattern in projection order
+    """
+    params = dict(DEFAULT_PATTERN_PARAMS, **(params or {}))
+    width, height = int(params["width"]), int(params["height"])
+    orientation = params["orientation"]
+    coordinates, extent = fringe_coordinates(width, height, orientation)
+    steps = int(params["steps"])
+    periods = [float(p) for p in params["periods"]]
+
+    if pattern_type == "phase_shift":
+        return phase_shift_patterns(coordinates, periods[0], steps, orientation, "phase")
+    if pattern_type == "heterodyne":
+        patterns = []
+        for frequency_index, period in enumerate(periods):
+            extra = {"type": "heterodyne", "frequency_index": frequency_index}
+            if frequency_index > 0 and period != periods[frequency_index - 1]:
+                previous = periods[frequency_index - 1]
+                extra["beat_period_px"] = previous * period / abs(previous - period)
+            patterns.extend(phase_shift_patterns(
+                coordinates, period, steps, orientation, f"heterodyne_f{frequency_index}", extra))
+        return patterns
+    if pattern_type in ("gray_code", "binary"):
+        return bit_plane_patterns(coordinates, extent, orientation, pattern_type == "gray_code",
+                                  bool(params["inverse"]), params.get("bits"))
+    raise ValueError(f"未知的图案类型: {pattern_type}")
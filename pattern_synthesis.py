@@ -0,0 +1,225 @@
+"""
+Pattern Synthesis Module
+Synthesizes structured-light pattern images from one projector-pass render per view.
+
+The v7 script (PATTERN_SYNTHESIS_MODE) writes, per view id:
+    projector_pass/irradiance_######.exr    projector lit with a white pattern, world off
+    projector_pass/projector_uv_######.exr  projector texture coordinate of every pixel (AOV)
+    projector_pass/ambient_######.exr       world lighting only, linear
+The image under any pattern p is then ambient + irradiance * p(projector_uv),
+so a new pattern set is a re-synthesis job instead of K re-renders per view.
+Indirect bounces of the projected light are taken from the white-pattern
+render, which is the only approximation compared to rendering each pattern.
+
+Usage (inside Blender, image I/O goes through bpy):
+    blender --background --python pattern_synthesis.py -- <output_root> <pattern_folder>
+"""
+
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+
+PROJECTOR_PASS_DIR_NAME = "projector_pass"
+PATTERN_IMAGE_EXTENSIONS = ["*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff"]
+_VIEW_ID_PATTERN = re.compile(r"irradiance_(\d+)\.exr$")
+
+
+def srgb_to_linear(values):
+    """Inverse sRGB transfer function (what Blender applies to sRGB textures)"""
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(values):
+    """sRGB transfer function, i.e. the 'Standard' view transform"""
+    values = np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1.0 / 2.4) - 0.055)
+
+
+def sample_pattern_bilinear(pattern, projector_uv):
+    """
+    Samples a pattern at projector texture coordinates like Blender's Image
+    Texture node (Linear interpolation, Clip extension).
+
+    Args:
+        pattern: (H, W, C) linear pattern, row 0 at the bottom (Blender pixel order)
+        projector_uv: (..., 2) texture coordinates, (0, 0) = bottom-left corner
+
+    Returns:
+        (..., C) sampled values, 0 outside the pattern and for non-finite coordinates
+    """
+    pattern = np.asarray(pattern, dtype=np.float32)
+    if pattern.ndim == 2:
+        pattern = pattern[..., np.newaxis]
+    height, width = pattern.shape[:2]
+
+    u = np.asarray(projector_uv[..., 0], dtype=np.float32)
+    v = np.asarray(projector_uv[..., 1], dtype=np.float32)
+    inside = np.isfinite(u) & np.isfinite(v) & (u >= 0.0) & (u <= 1.0) & (v >= 0.0) & (v <= 1.0)
+    u = np.where(inside, u, 0.0)
+    v = np.where(inside, v, 0.0)
+
+    # 像素中心位于 (i + 0.5) / W
+    x = u * width - 0.5
+    y = v * height - 0.5
+    x0 = np.floor(x).astype(np.int64)
+    y0 = np.floor(y).astype(np.int64)
+    fx = (x - x0)[..., np.newaxis]
+    fy = (y - y0)[..., np.newaxis]
+    x0c, x1c = np.clip(x0, 0, width - 1), np.clip(x0 + 1, 0, width - 1)
+    y0c, y1c = np.clip(y0, 0, height - 1), np.clip(y0 + 1, 0, height - 1)
+
+    sampled = (pattern[y0c, x0c] * (1.0 - fx) * (1.0 - fy) +
+               pattern[y0c, x1c] * fx * (1.0 - fy) +
+               pattern[y1c, x0c] * (1.0 - fx) * fy +
+               pattern[y1c, x1c] * fx * fy)
+    sampled[~inside] = 0.0
+    return sampled
+
+
+def synthesize_pattern_image(ambient, irradiance, projector_uv, pattern):
+    """
+    Returns the linear RGB image of one view under one pattern.
+
+    Args:
+        ambient: (h, w, >=3) linear world-only render
+        irradiance: (h, w, >=3) linear render with the projector showing white
+        projector_uv: (h, w, >=2) projector texture coordinates
+        pattern: (H, W, C) linear pattern (C = 1 or >= 3)
+    """
+    sampled = sample_pattern_bilinear(pattern, projector_uv[..., :2])
+    if sampled.shape[-1] == 1:
+        sampled = np.repeat(sampled, 3, axis=-1)
+    return ambient[..., :3] + irradiance[..., :3] * sampled[..., :3]
+
+
+def list_pattern_images(pattern_folder):
+    """Same ordering as get_pattern_images() in the v7 script"""
+    image_files = []
+    for ext in PATTERN_IMAGE_EXTENSIONS:
+        image_files.extend(glob.glob(os.path.join(pattern_folder, ext)))
+    image_files.sort()
+    return image_files
+
+
+def list_projector_pass_views(pass_dir):
+    """Returns the sorted view ids that have a projector pass in pass_dir"""
+    view_ids = []
+    for path in glob.glob(os.path.join(pass_dir, "irradiance_*.exr")):
+        match = _VIEW_ID_PATTERN.search(os.path.basename(path))
+        if match:
+            view_ids.append(int(match.group(1)))
+    return sorted(view_ids)
+
+
+def _load_pixels(filepath):
+    """Loads an image through bpy as a (h, w, c) linear float array"""
+    import bpy
+
+    image = bpy.data.images.load(filepath, check_existing=False)
+    try:
+        width, height = image.size
+        buffer = np.empty(width * height * image.channels, dtype=np.float32)
+        image.pixels.foreach_get(buffer)
+        pixels = buffer.reshape(height, width, image.channels)
+        # 8位图像的 pixels 仍是sRGB编码值；浮点图像已是线性值
+        if not image.is_float and image.colorspace_settings.name == 'sRGB':
+            pixels[..., :3] = srgb_to_linear(pixels[..., :3])
+        return pixels
+    finally:
+        bpy.data.images.remove(image)
+
+
+def _configure_png_output(scene, png_color_depth='16'):
+    """Same PNG settings and view transform as the rendered pattern images"""
+    image_settings = scene.render.image_settings
+    image_settings.file_format = 'PNG'
+    image_settings.color_mode = 'RGB'
+    image_settings.color_depth = png_color_depth
+    image_settings.compression = 15
+    scene.view_settings.view_transform = 'Standard'
+    scene.view_settings.look = 'None'
+    scene.view_settings.exposure = 0.0
+    scene.view_settings.gamma = 1.0
+
+
+def _save_linear_png(pixels, filepath, scene):
+    import bpy
+
+    height, width = pixels.shape[:2]
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[..., :3] = pixels[..., :3]
+    image = bpy.data.images.new("SynthesizedPattern", width, height, alpha=False, float_buffer=True)
+    try:
+        image.pixels.foreach_set(rgba.ravel())
+        image.save_render(filepath, scene=scene)
+    finally:
+        bpy.data.images.remove(image)
+
+
+def run_synthesis(output_root, pattern_folder, view_ids=None, pattern_output_dir=None, png_color_depth='16',
+                  view_done_callback=None, patterns=None, view_id_offset=0, pattern_id_offset=0):
+    """
+    Synthesizes '{id:06d}_pattern.png' for every pattern of every projector-pass view.
+
+    Pattern ids follow output_naming.render_ids(), with the offsets of the
+    run's id block: pattern_id_offset + (view_id - view_id_offset - 1) * K +
+    pattern_index + 1. view_done_callback(view_id) is
+    called once all patterns of a view are written. patterns, a list of
+    (H, W, C) linear arrays (e.g. from pattern_generator), replaces the
+    images of pattern_folder.
+
+    Returns:
+        int: number of images written
+    """
+    import bpy
+
+    pass_dir = os.path.join(output_root, PROJECTOR_PASS_DIR_NAME)
+    pattern_output_dir = pattern_output_dir or os.path.join(output_root, "pattern")
+    os.makedirs(pattern_output_dir, exist_ok=True)
+
+    if patterns is None:
+        pattern_files = list_pattern_images(pattern_folder)
+        if not pattern_files:
+            print(f"错误：在 '{pattern_folder}' 中未找到图案图像，无法合成。")
+            return 0
+        patterns = [_load_pixels(path) for path in pattern_files]
+    pattern_count = len(patterns)
+
+    if view_ids is None:
+        view_ids = list_projector_pass_views(pass_dir)
+    print(f"开始合成: {len(view_ids)} 个视角 x {pattern_count} 个图案")
+
+    scene = bpy.context.scene
+    _configure_png_output(scene, png_color_depth)
+
+    written = 0
+    for view_id in view_ids:
+        try:
+            irradiance = _load_pixels(os.path.join(pass_dir, f"irradiance_{view_id:06d}.exr"))
+            projector_uv = _load_pixels(os.path.join(pass_dir, f"projector_uv_{view_id:06d}.exr"))
+            ambient = _load_pixels(os.path.join(pass_dir, f"ambient_{view_id:06d}.exr"))
+        except RuntimeError as e:
+            print(f"   警告：视角 {view_id} 的投影通道不完整，跳过: {e}")
+            continue
+
+        for pattern_idx, pattern in enumerate(patterns):
+            pattern_id = pattern_id_offset + (view_id - view_id_offset - 1) * pattern_count + pattern_idx + 1
+            image = synthesize_pattern_image(ambient, irradiance, projector_uv, pattern)
+            _save_linear_png(image, os.path.join(pattern_output_dir, f"{pattern_id:06d}_pattern.png"), scene)
+            written += 1
+        if view_done_callback is not None:
+            view_done_callback(view_id)
+
+    print(f"合成完成，共写出 {written} 张图案图像到: {pattern_output_dir}")
+    return written
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if len(args) < 2:
+        raise SystemExit("用法: blender --background --python pattern_synthesis.py -- <output_root> <pattern_folder>")
+    run_synthesis(args[0], args[1])
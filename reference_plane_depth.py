@@ -0,0 +1,169 @@
+"""
+Reference Plane Depth Module
+Computes the reference-plane depth map in closed form from scene_parameters.json.
+
+The plane has a fixed pose and the camera is fully described by the recorded
+intrinsics/extrinsics, so every pixel's depth is a ray-plane intersection.
+Results are cached on disk, keyed by a hash of the camera and plane
+parameters; the v7 script only falls back to rendering when validation fails.
+
+Depth follows the Cycles Z pass: distance along the camera's viewing axis in
+Blender units, BACKGROUND_DEPTH where the ray misses the plane. Cycles clips
+by distance along the ray, so clip_start/clip_end are compared with the ray
+length (Z depth / cos of the ray's angle to the axis), not with Z.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+BACKGROUND_DEPTH = 1e10
+# 深度计算方式改变时递增，使旧缓存失效 (2: 按光线距离裁剪)
+DEPTH_CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".blender_tool", "reference_depth")
+
+
+def blender_camera_intrinsics(focal_length_mm, sensor_width_mm, sensor_height_mm, sensor_fit,
+                              resolution_x, resolution_y, shift_x=0.0, shift_y=0.0):
+    """
+    Pixel intrinsics of a Blender perspective camera with square pixels.
+
+    The sensor dimension chosen by sensor_fit spans the matching image
+    dimension (AUTO: sensor_width spans the larger one); shift is in units of
+    that same dimension. cy is measured from the bottom row, like Blender.
+
+    Returns:
+        tuple: (fx, fy, cx, cy)
+    """
+    if sensor_fit == 'VERTICAL':
+        sensor_size_mm, fit_pixels = sensor_height_mm, resolution_y
+    elif sensor_fit == 'HORIZONTAL':
+        sensor_size_mm, fit_pixels = sensor_width_mm, resolution_x
+    else:
+        sensor_size_mm, fit_pixels = sensor_width_mm, max(resolution_x, resolution_y)
+    focal_pixels = focal_length_mm / sensor_size_mm * fit_pixels
+    cx = resolution_x / 2.0 + shift_x * fit_pixels
+    cy = resolution_y / 2.0 + shift_y * fit_pixels
+    return focal_pixels, focal_pixels, cx, cy
+
+
+def load_scene_parameters(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _camera_geometry(params):
+    intrinsics = params["camera"]["intrinsics"]
+    fx, fy, cx, cy = blender_camera_intrinsics(
+        intrinsics["focal_length_mm"], intrinsics["sensor_width_mm"], intrinsics["sensor_height_mm"],
+        intrinsics.get("sensor_fit", 'AUTO'), intrinsics["resolution_x"], intrinsics["resolution_y"],
+        intrinsics.get("shift_x", 0.0), intrinsics.get("shift_y", 0.0))
+    world_to_cam = np.array(params["camera"]["extrinsics"]["world_to_cam_matrix"], dtype=np.float64)
+    cam_to_world = np.linalg.inv(world_to_cam)
+    return intrinsics, (fx, fy, cx, cy), cam_to_world
+
+
+def pixel_rays(params, cols, rows):
+    """
+    World-space rays through pixel centers.
+
+    Args:
+        cols, rows: pixel indices (row 0 = top of the image)
+
+    Returns:
+        (origin (3,), directions (..., 3)); a direction has camera-space z = -1,
+        so the ray parameter of a hit equals its Z-pass depth
+    """
+    intrinsics, (fx, fy, cx, cy), cam_to_world = _camera_geometry(params)
+    cols = np.asarray(cols, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+    y_up = intrinsics["resolution_y"] - rows - 0.5
+    directions_cam = np.stack([(cols + 0.5 - cx) / fx, (y_up - cy) / fy, -np.ones_like(cols)], axis=-1)
+    directions_world = directions_cam @ cam_to_world[:3, :3].T
+    return cam_to_world[:3, 3], directions_world
+
+
+def ray_lengths(params, depth, cols, rows):
+    """Distance along the ray of pixels (cols, rows) whose Z-pass depth is depth"""
+    _, directions = pixel_rays(params, cols, rows)
+    return depth * np.linalg.norm(directions, axis=-1)
+
+
+def compute_reference_plane_depth(params):
+    """Returns the (resolution_y, resolution_x) float32 depth map, row 0 = top."""
+    intrinsics = params["camera"]["intrinsics"]
+    width, height = int(intrinsics["resolution_x"]), int(intrinsics["resolution_y"])
+    rows, cols = np.mgrid[0:height, 0:width]
+    origin, directions = pixel_rays(params, cols, rows)
+
+    plane = params["reference_plane"]
+    plane_to_world = np.array(plane["matrix_world"], dtype=np.float64)
+    plane_point = plane_to_world[:3, 3]
+    plane_axes = plane_to_world[:3, :3]
+    normal = plane_axes[:, 2] / np.linalg.norm(plane_axes[:, 2])
+
+    denominator = directions @ normal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((plane_point - origin) @ normal) / denominator
+    hit_points = origin + directions * t[..., np.newaxis]
+    local = (hit_points - plane_point) @ np.linalg.pinv(plane_axes).T
+
+    half_size = float(plane["half_size"])
+    # t 是沿视轴的深度；裁剪比较的是沿光线的距离
+    distance = t * np.linalg.norm(directions, axis=-1)
+    hit = (np.isfinite(t) & (np.abs(denominator) > 1e-12) &
+           (np.abs(local[..., 0]) <= half_size) & (np.abs(local[..., 1]) <= half_size) &
+           (distance >= intrinsics["clip_start"]) & (distance <= intrinsics["clip_end"]))
+    return np.where(hit, t, BACKGROUND_DEPTH).astype(np.float32)
+
+
+def parameters_cache_key(params):
+    """Hash of everything the depth map depends on."""
+    relevant = {
+        "version": DEPTH_CACHE_VERSION,
+        "intrinsics": {key: params["camera"]["intrinsics"].get(key) for key in (
+            "focal_length_mm", "sensor_width_mm", "sensor_height_mm", "sensor_fit",
+            "resolution_x", "resolution_y", "shift_x", "shift_y", "clip_start", "clip_end")},
+        "world_to_cam": params["camera"]["extrinsics"]["world_to_cam_matrix"],
+        "plane": params["reference_plane"],
+    }
+    encoded = json.dumps(relevant, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def load_cached_depth(params, cache_dir=DEFAULT_CACHE_DIR):
+    cache_path = os.path.join(cache_dir, f"{parameters_cache_key(params)}.npy")
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        return np.load(cache_path)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached_depth(params, depth, cache_dir=DEFAULT_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{parameters_cache_key(params)}.npy")
+    tmp_path = cache_path + ".tmp.npy"
+    np.save(tmp_path, depth)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def validate_depth_map(depth, params):
+    """Returns None if the depth map is plausible, otherwise a description of the problem."""
+    intrinsics = params["camera"]["intrinsics"]
+    expected_shape = (int(intrinsics["resolution_y"]), int(intrinsics["resolution_x"]))
+    if depth is None or depth.shape != expected_shape:
+        return f"尺寸不符: {None if depth is None else depth.shape} != {expected_shape}"
+    if not np.all(np.isfinite(depth)):
+        return "包含非有限值"
+    rows, cols = np.nonzero(depth < BACKGROUND_DEPTH)
+    if rows.size == 0:
+        return "参考平面不在相机视野内"
+    distances = ray_lengths(params, depth[rows, cols].astype(np.float64), cols, rows)
+    if distances.min() < intrinsics["clip_start"] or distances.max() > intrinsics["clip_end"]:
+        return f"光线距离超出裁剪范围: [{distances.min():.3f}, {distances.max():.3f}]"
+    return None
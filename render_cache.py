@@ -0,0 +1,168 @@
+"""
+Render Cache Module
+Content-addressed cache of rendered output files with size-based LRU eviction.
+
+A cache key is a hash of everything a render depends on (STL bytes, pattern
+bytes, camera/projector pose, view rotation, per-sample random parameters,
+render profile), never of the output file names. When an STL is added and the
+render ids of later STLs shift, their outputs are still found and copied to
+the new names instead of being rendered again.
+
+Layout: <cache_dir>/<key[:2]>/<key>/<slot><ext>, one file per output slot of
+the render. An entry's directory mtime is its last use; the least recently
+used entries are deleted once the cache grows beyond max_bytes. Worker shards
+may share one cache directory: entries are published with an atomic rename
+and a half-deleted entry simply counts as a miss.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".blender_tool", "render_cache")
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+_file_digest_memo = {}
+
+
+def file_digest(filepath):
+    """SHA-256 of a file's bytes, memoized per (path, size, mtime)"""
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    digest = _file_digest_memo.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_DIGEST_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _file_digest_memo[memo_key] = digest
+    return digest
+
+
+def _normalize(value):
+    """Rounds floats so that values read back from Blender hash identically"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def render_key(**components):
+    """Cache key of one render from JSON-serializable components"""
+    encoded = json.dumps(_normalize(components), sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _slot_file_name(slot_index, output_path):
+    return f"{slot_index}{os.path.splitext(output_path)[1]}"
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class RenderCache:
+    """Copies render outputs into / out of a content-addressed cache directory"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key, output_paths):
+        """Copies a cached entry to output_paths; returns False on a miss"""
+        entry_dir = self._entry_dir(key)
+        try:
+            for slot_index, output_path in enumerate(output_paths):
+                source = os.path.join(entry_dir, _slot_file_name(slot_index, output_path))
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                shutil.copyfile(source, output_path)
+            os.utime(entry_dir)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, output_paths):
+        """Adds freshly rendered output_paths under key; returns False if an output is missing"""
+        if not output_paths or not all(os.path.isfile(path) for path in output_paths):
+            return False
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return True
+
+        staging_dir = f"{entry_dir}.tmp{os.getpid()}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        for slot_index, output_path in enumerate(output_paths):
+            shutil.copyfile(output_path, os.path.join(staging_dir, _slot_file_name(slot_index, output_path)))
+        entry_bytes = _directory_size(staging_dir)
+        try:
+            os.rename(staging_dir, entry_dir)
+        except OSError:
+            # 其他分片已写入同一条目
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return True
+
+        if self._total_bytes is None:
+            self._total_bytes = self.total_bytes()
+        else:
+            self._total_bytes += entry_bytes
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def _entries(self):
+        """[(last_use, size, path)] of all published entries"""
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if ".tmp" in name:
+                    continue
+                entry_dir = os.path.join(prefix_dir, name)
+                try:
+                    entries.append((os.path.getmtime(entry_dir), _directory_size(entry_dir), entry_dir))
+                except OSError:
+                    pass
+        return entries
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes=None):
+        """Deletes least recently used entries until the cache fits; returns the number removed"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry_dir in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            removed += 1
+        self._total_bytes = total
+        return removed
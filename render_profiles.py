@@ -0,0 +1,69 @@
+"""
+Render Profiles Module
+Named render-quality profiles shared by the GUI and the Blender scripts.
+
+"draft" and "preview" are meant for validating a new STL folder or pattern
+set in minutes before a production run: draft renders 1/16 of the pixels with
+1/32 of the production samples, so it finishes well over 10x faster.
+
+"production" reproduces the settings the script used before profiles existed:
+its light bounces and denoiser are left at the scene's values (None).
+"""
+
+DEFAULT_PROFILE_NAME = "production"
+
+RENDER_PROFILES = {
+    "draft": {
+        "resolution_scale": 0.25,
+        "samples": 16,
+        "max_bounces": 2,
+        "use_denoising": True,
+        "png_color_depth": '8',
+        "png_compression": 0,
+        "exr_codec": 'NONE',
+    },
+    "preview": {
+        "resolution_scale": 0.5,
+        "samples": 64,
+        "max_bounces": 4,
+        "use_denoising": True,
+        "png_color_depth": '8',
+        "png_compression": 15,
+        "exr_codec": 'ZIP',
+    },
+    "production": {
+        "resolution_scale": 1.0,
+        "samples": None,        # None: keep the script's render_samples / dl_train_samples
+        "max_bounces": None,    # None: keep the scene's own value, as the script did before profiles
+        "use_denoising": None,
+        "png_color_depth": '16',
+        "png_compression": 15,
+        "exr_codec": 'ZIP',
+    },
+}
+
+
+def profile_names():
+    return list(RENDER_PROFILES)
+
+
+def get_render_profile(name):
+    """Returns a copy of the named profile; raises ValueError for unknown names"""
+    name = (name or DEFAULT_PROFILE_NAME).strip().lower()
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"未知的渲染质量档位 '{name}'，可选: {', '.join(RENDER_PROFILES)}")
+    return dict(RENDER_PROFILES[name], name=name)
+
+
+def resolve_render_settings(profile, width, height, samples):
+    """
+    Applies a profile to the base resolution and sample count.
+
+    Returns:
+        tuple: (width, height, samples), never smaller than 1
+    """
+    scale = profile["resolution_scale"]
+    scaled_width = max(1, int(round(width * scale)))
+    scaled_height = max(1, int(round(height * scale)))
+    profile_samples = profile["samples"] if profile["samples"] is not None else samples
+    return scaled_width, scaled_height, max(1, int(profile_samples))
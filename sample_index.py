@@ -0,0 +1,186 @@
+"""
+Sample Index Module
+SQLite database with one row per (STL, view) sample, linking every output
+file to the parameters that generated it.
+
+Tables of samples.sqlite in the output root:
+
+    samples  view_id (key), run_id, stl, view angles, first_pattern_id,
+             pattern_count, seed, projector power, background strength,
+             environment rotation, shard (tar output) and the full
+             metadata as JSON
+    files    one row per output of a sample: component ('pattern_003',
+             'depth_R', 'ambient', ...), path, and for patterns the pattern
+             id and the pattern file / generated pattern name
+
+Paths are absolute for loose files and member names for tar output (the
+shard column tells which tar holds them). Example:
+
+    select_samples(db, "view_y_deg = ? AND projector_power > ?", (45.0, 4.8))
+
+Rows are written in batched transactions (one commit per batch_size samples)
+in WAL mode, so the workers of a sharded run can write to the same database
+while readers query it.
+"""
+
+import json
+import sqlite3
+
+INDEX_FILE_NAME = "samples.sqlite"
+DEFAULT_BATCH_SIZE = 256
+_PATTERN_COMPONENT_PREFIX = "pattern_"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    view_id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    stl TEXT,
+    view_y_deg REAL,
+    view_z_deg REAL,
+    first_pattern_id INTEGER,
+    pattern_count INTEGER,
+    seed INTEGER,
+    projector_power REAL,
+    background_strength REAL,
+    environment_rotation_z REAL,
+    shard TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    view_id INTEGER NOT NULL,
+    component TEXT NOT NULL,
+    path TEXT NOT NULL,
+    pattern_id INTEGER,
+    pattern_name TEXT,
+    PRIMARY KEY (view_id, component)
+);
+CREATE INDEX IF NOT EXISTS samples_stl ON samples (stl);
+CREATE INDEX IF NOT EXISTS files_pattern_id ON files (pattern_id);
+"""
+
+
+def connect(db_path, timeout=60.0):
+    connection = sqlite3.connect(db_path, timeout=timeout)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def pattern_index(component):
+    """'pattern_003' -> 3, None for other components"""
+    if component.startswith(_PATTERN_COMPONENT_PREFIX):
+        suffix = component[len(_PATTERN_COMPONENT_PREFIX):]
+        if suffix.isdigit():
+            return int(suffix)
+    return None
+
+
+class SampleIndex:
+    """Batched writer of the samples / files tables"""
+
+    def __init__(self, db_path, run_id, batch_size=DEFAULT_BATCH_SIZE, replace_other_runs=False):
+        """
+        Args:
+            run_id: stored with every row
+            batch_size: samples per transaction
+            replace_other_runs: delete the rows of every other run (a new dataset)
+        """
+        self.db_path = db_path
+        self.run_id = run_id
+        self.batch_size = max(1, int(batch_size))
+        self._connection = connect(db_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            if replace_other_runs:
+                self._connection.execute(
+                    "DELETE FROM files WHERE view_id IN (SELECT view_id FROM samples WHERE run_id IS NOT ?)",
+                    (run_id,))
+                self._connection.execute("DELETE FROM samples WHERE run_id IS NOT ?", (run_id,))
+        self._recorded = {row[0] for row in self._connection.execute("SELECT view_id FROM samples")}
+        self._sample_rows = []
+        self._file_rows = []
+        self.written = 0
+
+    def has_sample(self, view_id):
+        return int(view_id) in self._recorded
+
+    def add_sample(self, metadata, sample_files):
+        """
+        Queues one sample.
+
+        Args:
+            metadata: the sample's metadata dict (view_id, stl, view_angles_deg,
+                first_pattern_id, patterns and the randomized parameters)
+            sample_files: [(component, path)]
+        """
+        view_id = int(metadata["view_id"])
+        view_angles = metadata.get("view_angles_deg") or (None, None)
+        patterns = metadata.get("patterns") or []
+        first_pattern_id = metadata.get("first_pattern_id")
+        self._sample_rows.append((
+            view_id, metadata.get("run_id", self.run_id), metadata.get("stl"), view_angles[0], view_angles[1],
+            first_pattern_id, len(patterns), metadata.get("seed"), metadata.get("projector_power"),
+            metadata.get("background_strength"), metadata.get("environment_rotation_z"),
+            json.dumps(metadata, ensure_ascii=False, sort_keys=True)))
+        for component, path in sample_files:
+            index = pattern_index(component)
+            pattern_id = first_pattern_id + index if index is not None and first_pattern_id is not None else None
+            pattern_name = patterns[index] if index is not None and index < len(patterns) else None
+            self._file_rows.append((view_id, component, path, pattern_id, pattern_name))
+        self._recorded.add(view_id)
+        if len(self._sample_rows) >= self.batch_size:
+            self.commit()
+
+    def set_shard(self, view_ids, shard_name):
+        """Records the tar shard that holds the given samples (commits queued rows first)"""
+        self.commit()
+        with self._connection:
+            self._connection.executemany("UPDATE samples SET shard = ? WHERE view_id = ?",
+                                         [(shard_name, int(view_id)) for view_id in view_ids])
+
+    def commit(self):
+        """Writes the queued rows in one transaction"""
+        if not self._sample_rows:
+            return
+        with self._connection:
+            # 续跑时重新记录的样本替换旧行
+            self._connection.executemany(
+                "DELETE FROM files WHERE view_id = ?", [(row[0],) for row in self._sample_rows])
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO samples (view_id, run_id, stl, view_y_deg, view_z_deg, first_pattern_id, "
+                "pattern_count, seed, projector_power, background_strength, environment_rotation_z, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._sample_rows)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files (view_id, component, path, pattern_id, pattern_name) "
+                "VALUES (?, ?, ?, ?, ?)", self._file_rows)
+        self.written += len(self._sample_rows)
+        self._sample_rows = []
+        self._file_rows = []
+
+    def close(self):
+        self.commit()
+        self._connection.close()
+
+
+def select_samples(db_path, where="1", params=()):
+    """Sample rows (as dicts) matching an SQL condition on the samples table"""
+    connection = connect(db_path)
+    try:
+        return [dict(row) for row in connection.execute(
+            f"SELECT * FROM samples WHERE {where} ORDER BY view_id", params)]
+    finally:
+        connection.close()
+
+
+def sample_files(db_path, view_ids):
+    """{view_id: {component: row dict}} of the given samples"""
+    connection = connect(db_path)
+    try:
+        files = {}
+        for view_id in view_ids:
+            rows = connection.execute("SELECT * FROM files WHERE view_id = ?", (int(view_id),))
+            files[int(view_id)] = {row["component"]: dict(row) for row in rows}
+        return files
+    finally:
+        connection.close()
@@ -0,0 +1,146 @@
+"""
+Sample Metadata Module
+Streams the randomized parameters of every rendered view to JSONL.
+
+One flat record per view: ids, STL, view angles, seed, projector power,
+background strength, environment rotation, the random material values and
+the object's final matrix_world (4x4, row-major) after it was placed on the
+reference plane. Each worker appends to its own sample_metadata_w###.jsonl in
+the output root.
+
+Records go through a large write buffer; the file is flushed and fsynced at
+most every fsync_interval seconds (and on close), so the hot loop pays for a
+json.dumps and a buffered write per view. A crash loses at most the last
+interval; a torn last line is skipped when loading. append_once() instead
+fsyncs right away: the v7 script uses it before the first unit of a view is
+recorded in the completion manifest, so a view the manifest reports as done
+always has its record.
+
+load_sample_metadata() turns the records into one NumPy array per field
+(matrix_world as an (N, 4, 4) array), sorted by view id.
+"""
+
+import glob
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+METADATA_FILE_PATTERN = "sample_metadata_w*.jsonl"
+_WORKER_INDEX_PATTERN = re.compile(r"sample_metadata_w(\d+)\.jsonl$")
+DEFAULT_FSYNC_INTERVAL = 5.0
+_WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+def metadata_path(output_root, worker_index=0):
+    return os.path.join(output_root, f"sample_metadata_w{worker_index:03d}.jsonl")
+
+
+def remove_stale_streams(output_root, worker_count):
+    """Deletes the streams of workers that do not exist in a run with worker_count workers"""
+    for filepath in glob.glob(os.path.join(output_root, METADATA_FILE_PATTERN)):
+        match = _WORKER_INDEX_PATTERN.search(os.path.basename(filepath))
+        if match and int(match.group(1)) >= worker_count:
+            os.remove(filepath)
+
+
+def _ends_without_newline(filepath):
+    try:
+        with open(filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except OSError:
+        return False
+
+
+class MetadataStream:
+    """Buffered JSONL writer with periodic fsync"""
+
+    def __init__(self, filepath, append=False, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = filepath
+        self.fsync_interval = float(fsync_interval)
+        self.records_written = 0
+        self._durable_view_ids = set()
+        torn_tail = append and _ends_without_newline(filepath)
+        self._file = open(filepath, 'a' if append else 'w', encoding='utf-8', buffering=_WRITE_BUFFER_BYTES)
+        if torn_tail:
+            # 崩溃留下的残行单独成行，新记录不会接在它后面
+            self._file.write("\n")
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records_written += 1
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def append_once(self, record):
+        """Appends record unless its view_id was already written by this stream, then fsyncs"""
+        if record["view_id"] in self._durable_view_ids:
+            return
+        self.append(record)
+        self.sync()
+        self._durable_view_ids.add(record["view_id"])
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def read_metadata_records(filepath):
+    """Yields the records of one stream; a torn last line from a crash is ignored"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _column(key, values):
+    if key == "matrix_world":
+        return np.asarray(values, dtype=np.float64).reshape(len(values), 4, 4)
+    if all(isinstance(value, bool) for value in values):
+        return np.asarray(values, dtype=bool)
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return np.asarray(values, dtype=np.int64)
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return np.asarray(values, dtype=np.float64)
+    return np.asarray(values, dtype=object)
+
+
+def load_sample_metadata(source):
+    """
+    Loads every stream of an output root (or one stream file) column-wise.
+
+    The last record of a view wins (a resumed run re-renders unfinished
+    views). Fields missing from some records become object arrays with None.
+
+    Returns:
+        dict: field -> NumPy array with one entry per view, sorted by view_id
+    """
+    if os.path.isdir(source):
+        filepaths = sorted(glob.glob(os.path.join(source, METADATA_FILE_PATTERN)))
+    else:
+        filepaths = [source]
+    records = {}
+    for filepath in filepaths:
+        for record in read_metadata_records(filepath):
+            records[record["view_id"]] = record
+    ordered = [records[view_id] for view_id in sorted(records)]
+
+    keys = []
+    for record in ordered:
+        keys.extend(key for key in record if key not in keys)
+    return {key: _column(key, [record.get(key) for record in ordered]) for key in keys}
@@ -0,0 +1,130 @@
+"""
+STL Prefetch Module
+Parses and normalizes the next STL files in helper processes while the
+current model renders.
+
+A Python thread inside Blender only runs while the main thread releases the
+GIL, which long bpy operator calls such as render.render do not reliably do,
+so prefetching runs in separate short-lived processes of Blender's bundled
+interpreter (NumPy only, no bpy). Each one reads a file with stl_reader,
+computes the centering and scale with mesh_utils and writes the normalized
+parts in the mesh_cache .npz format. The main thread then only loads the
+arrays and builds the meshes with foreach_set.
+
+Usage of the helper (started by StlPrefetcher):
+    python stl_prefetch.py <stl_file> <target_largest_dimension> <output.npz> [mesh_cache_dir]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+import mesh_cache
+import mesh_utils
+import stl_reader
+
+_SCRIPT_PATH = os.path.abspath(__file__)
+
+
+def normalize_stl(stl_filepath, target_largest_dimension):
+    """
+    Parses an STL and centers / scales it the same way as the v7 script's
+    numpy import path.
+
+    Returns:
+        tuple: (parts, scale_factor) in the mesh_cache format
+    """
+    vertices, faces = stl_reader.read_stl(stl_filepath)
+    center, scale_factor = mesh_utils.centering_and_scale(vertices.astype(np.float64), target_largest_dimension)
+    centered = (vertices - center).astype(np.float32)
+    return [stl_reader.mesh_part_arrays(centered, faces)], scale_factor or 1.0
+
+
+class StlPrefetcher:
+    """Keeps up to `depth` helper processes parsing the upcoming STL files"""
+
+    def __init__(self, target_largest_dimension, depth=2, mesh_cache_dir=None, python_executable=None):
+        """
+        Args:
+            mesh_cache_dir: when set, helpers skip files that already have a
+                mesh cache entry (the main thread loads those from the cache)
+        """
+        self.target_largest_dimension = float(target_largest_dimension)
+        self.depth = max(0, int(depth))
+        self.mesh_cache_dir = mesh_cache_dir
+        self.python_executable = python_executable or sys.executable
+        self._work_dir = tempfile.mkdtemp(prefix="stl_prefetch_")
+        self._pending = {}
+        self._launched = 0
+
+    def schedule(self, upcoming_stl_paths):
+        """Starts helpers for the first `depth` upcoming files that are not in flight yet"""
+        for stl_filepath in upcoming_stl_paths[:self.depth]:
+            key = os.path.abspath(stl_filepath)
+            if key in self._pending:
+                continue
+            if len(self._pending) >= self.depth:
+                break
+            output_path = os.path.join(self._work_dir, f"{self._launched}.npz")
+            self._launched += 1
+            command = [self.python_executable, _SCRIPT_PATH, key, repr(self.target_largest_dimension), output_path]
+            if self.mesh_cache_dir:
+                command.append(self.mesh_cache_dir)
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            except OSError as e:
+                print(f"   警告：无法启动STL预取进程: {e}")
+                self.depth = 0
+                return
+            self._pending[key] = (process, output_path)
+
+    def take(self, stl_filepath):
+        """
+        Waits for the helper of stl_filepath.
+
+        Returns:
+            (parts, scale_factor), or None if the file was not prefetched,
+            is already in the mesh cache, or the helper failed
+        """
+        pending = self._pending.pop(os.path.abspath(stl_filepath), None)
+        if pending is None:
+            return None
+        process, output_path = pending
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', errors='replace').strip().splitlines()
+            print(f"   警告：STL预取失败 ({os.path.basename(stl_filepath)}): {message[-1] if message else process.returncode}")
+            return None
+        prefetched = mesh_cache.load_normalized_mesh(output_path)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return prefetched
+
+    def close(self):
+        """Stops helpers that are still running and removes their outputs"""
+        for process, _ in self._pending.values():
+            if process.poll() is None:
+                process.kill()
+            process.communicate()
+        self._pending.clear()
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+
+
+def main(argv):
+    stl_filepath, target_largest_dimension, output_path = argv[0], float(argv[1]), argv[2]
+    if len(argv) > 3 and os.path.isfile(
+            mesh_cache.mesh_cache_path(stl_filepath, target_largest_dimension, argv[3], reader="numpy")):
+        return 0
+    parts, scale_factor = normalize_stl(stl_filepath, target_largest_dimension)
+    mesh_cache.save_normalized_mesh(output_path, parts, scale_factor)
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        raise SystemExit("用法: python stl_prefetch.py <stl_file> <target_largest_dimension> <output.npz> [mesh_cache_dir]")
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+"""
+STL Reader Module
+Parses binary and ASCII STL files with NumPy instead of bpy.ops.wm.stl_import.
+
+read_stl() only touches the file and NumPy: binary files are memory-mapped
+as a structured dtype, ASCII files are tokenized in one pass, and duplicate
+corners are welded with a vectorized unique. It does not use bpy, so it is
+safe to call from background threads (e.g. to parse the next model while the
+current one renders). Only build_stl_object() has to run on Blender's main
+thread; it creates the mesh through foreach_set.
+"""
+
+import os
+
+import numpy as np
+
+STL_HEADER_SIZE = 80
+STL_BINARY_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute_byte_count", "<u2"),
+])
+
+
+def is_binary_stl(filepath):
+    """Binary STL sizes are exactly 84 + 50 * triangle_count (some ASCII-like headers start with 'solid')"""
+    file_size = os.path.getsize(filepath)
+    if file_size < STL_HEADER_SIZE + 4:
+        return False
+    with open(filepath, 'rb') as f:
+        f.seek(STL_HEADER_SIZE)
+        triangle_count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    return file_size == STL_HEADER_SIZE + 4 + triangle_count * STL_BINARY_DTYPE.itemsize
+
+
+def read_binary_triangles(filepath):
+    """(F, 3, 3) float32 triangle corners of a binary STL, read through a memory map"""
+    with open(filepath, 'rb') as f:
+        f.seek(STL_HEADER_SIZE)
+        triangle_count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    if triangle_count == 0:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    mapped = np.memmap(filepath, dtype=STL_BINARY_DTYPE, mode='r',
+                       offset=STL_HEADER_SIZE + 4, shape=(triangle_count,))
+    try:
+        return np.array(mapped["vertices"], dtype=np.float32)
+    finally:
+        # 及时释放映射，Windows 下映射中的文件无法删除或覆盖
+        del mapped
+
+
+def read_ascii_triangles(filepath):
+    """(F, 3, 3) float32 triangle corners of an ASCII STL"""
+    with open(filepath, 'rb') as f:
+        tokens = np.array(f.read().split())
+    vertex_positions = np.flatnonzero(tokens == b"vertex")
+    if len(vertex_positions) % 3:
+        raise ValueError(f"ASCII STL 顶点数不是3的倍数: {filepath}")
+    coordinate_indices = vertex_positions[:, np.newaxis] + np.arange(1, 4)
+    corners = tokens[coordinate_indices].astype(np.float32)
+    return corners.reshape(-1, 3, 3)
+
+
+def weld_vertices(triangles):
+    """
+    Merges bit-identical corners and drops the triangles that collapse to a
+    line or point (repeated corners), like stl_import does; vertices only
+    used by dropped triangles are removed.
+
+    Returns:
+        tuple: (vertices (N, 3) float32, faces (F, 3) int32)
+    """
+    corners = np.ascontiguousarray(triangles.reshape(-1, 3), dtype=np.float32) + np.float32(0.0)  # -0.0 -> 0.0
+    corner_keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first_index, inverse = np.unique(corner_keys, return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1, 3)
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    used_vertices, faces = np.unique(faces, return_inverse=True)
+    return corners[first_index[used_vertices]], faces.reshape(-1, 3).astype(np.int32)
+
+
+def read_stl(filepath):
+    """Parses an STL file into welded (vertices, faces); thread-safe, no bpy"""
+    if is_binary_stl(filepath):
+        triangles = read_binary_triangles(filepath)
+    else:
+        triangles = read_ascii_triangles(filepath)
+    if len(triangles) == 0:
+        raise ValueError(f"STL 文件不包含三角形: {filepath}")
+    vertices, faces = weld_vertices(triangles)
+    if len(faces) == 0:
+        raise ValueError(f"STL 文件只包含退化三角形: {filepath}")
+    return vertices, faces
+
+
+def mesh_part_arrays(vertices, faces):
+    """Converts (vertices, faces) to the part dict used by mesh_cache.build_mesh_data()"""
+    face_count = len(faces)
+    return {
+        "vertices": vertices,
+        "loop_starts": np.arange(0, face_count * 3, 3, dtype=np.int32),
+        "loop_totals": np.full(face_count, 3, dtype=np.int32),
+        "loop_vertices": np.ascontiguousarray(faces, dtype=np.int32).ravel(),
+    }
+
+
+def build_stl_object(name, vertices, faces, collection):
+    """Creates a mesh object from parsed STL arrays (Blender main thread only)"""
+    import bpy
+    from mesh_cache import build_mesh_data
+
+    mesh_obj = bpy.data.objects.new(name, build_mesh_data(name, mesh_part_arrays(vertices, faces)))
+    collection.objects.link(mesh_obj)
+    return mesh_obj
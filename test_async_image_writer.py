@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后台异步图像编码 (不需要Blender)
+"""
+
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from async_image_writer import AsyncImageWriter, encode_png, quantize_linear_pixels
+from pattern_synthesis import srgb_to_linear
+
+
+def _read_png(path):
+    """解析未滤波的PNG，返回 (宽, 高, 位深, 颜色类型, 像素字节)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    position = 8
+    chunks = {}
+    while position < len(data):
+        length = struct.unpack(">I", data[position:position + 4])[0]
+        chunk_type = data[position + 4:position + 8]
+        chunk_data = data[position + 8:position + 8 + length]
+        crc = struct.unpack(">I", data[position + 8 + length:position + 12 + length])[0]
+        assert crc == zlib.crc32(chunk_type + chunk_data) & 0xFFFFFFFF
+        chunks[chunk_type] = chunk_data
+        position += 12 + length
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    return width, height, bit_depth, color_type, zlib.decompress(chunks[b"IDAT"])
+
+
+def test_png_round_trip_16_bit():
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint16).reshape(2, 3, 3) * 3000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frame.png")
+        encode_png(path, pixels, bit_depth=16, compression=15)
+        width, height, bit_depth, color_type, raw = _read_png(path)
+        assert (width, height, bit_depth, color_type) == (3, 2, 16, 2)
+        rows = np.frombuffer(raw, dtype=np.uint8).reshape(2, 1 + 3 * 3 * 2)
+        assert (rows[:, 0] == 0).all()
+        decoded = rows[:, 1:].copy().view(">u2").reshape(2, 3, 3)
+        np.testing.assert_array_equal(decoded, pixels)
+        assert os.listdir(tmp) == ["frame.png"]
+    print("[OK] 16位PNG编码可无损解码，不留临时文件")
+
+
+def test_quantize_flips_rows_and_applies_srgb():
+    levels = np.array([0, 64, 128, 255], dtype=np.float32) / 255.0
+    linear = np.ones((2, 4, 4), dtype=np.float32)
+    linear[0, :, :3] = srgb_to_linear(levels)[:, np.newaxis]
+    linear[1, :, :3] = 0.0
+    quantized = quantize_linear_pixels(linear, channels=3, bit_depth=8)
+    assert quantized.shape == (2, 4, 3) and quantized.dtype == np.uint8
+    # Blender 第0行在底部，PNG 第0行在顶部
+    np.testing.assert_array_equal(quantized[1, :, 0], [0, 64, 128, 255])
+    assert (quantized[0] == 0).all()
+    assert quantize_linear_pixels(linear, channels=4, bit_depth=16)[0, 0, 3] == 65535
+    print("[OK] 量化时翻转行序并使用sRGB曲线")
+
+
+def test_bw_quantize_uses_rec709_luma():
+    linear = np.ones((1, 3, 4), dtype=np.float32)
+    linear[0, :, :3] = np.eye(3, dtype=np.float32)
+    quantized = quantize_linear_pixels(linear, channels=1, bit_depth=16)
+    assert quantized.shape == (1, 3, 1)
+    # 纯红、纯绿、纯蓝的灰度按 Rec.709 系数加权，而不是只取红色通道
+    np.testing.assert_array_equal(quantized[0, :, 0], np.round(np.array([0.2126, 0.7152, 0.0722]) * 65535))
+    print("[OK] 灰度输出使用 Rec.709 亮度")
+
+
+def test_writer_runs_callbacks_after_files_are_written():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = AsyncImageWriter(queue_dir=tmp, workers=2, max_pending=2)
+        outputs = [os.path.join(tmp, f"frame_{i}.png") for i in range(5)]
+        done = []
+        try:
+            for i, path in enumerate(outputs):
+                frame = np.full((4, 6, 4), i / 4.0, dtype=np.float32)
+                writer.submit(frame, path, channels=3, bit_depth=16)
+                assert writer.pending_count <= 2
+                writer.when_written([path], lambda path=path: done.append(os.path.exists(path)))
+            writer.when_written([], lambda: done.append("now"))
+            assert "now" in done
+        finally:
+            writer.close()
+        assert all(os.path.exists(path) for path in outputs)
+        assert done.count(True) == 5 and writer.written == 5 and writer.failed == 0
+        assert not os.path.exists(writer.queue_dir)
+    print("[OK] 后台进程写完文件后才执行回调，队列长度受限")
+
+
+def test_failed_frame_skips_its_callback():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = AsyncImageWriter(queue_dir=tmp, workers=1)
+        done = []
+        bad_path = os.path.join(tmp, "missing_dir", "frame.png")
+        try:
+            writer.submit(np.zeros((2, 2, 4), dtype=np.float32), bad_path)
+            writer.when_written([bad_path], lambda: done.append(bad_path))
+            writer.flush()
+        finally:
+            writer.close()
+        assert done == [] and writer.failed == 1
+    print("[OK] 编码失败的帧不执行回调")
+
+
+if __name__ == "__main__":
+    test_png_round_trip_16_bit()
+    test_quantize_flips_rows_and_applies_srgb()
+    test_bw_quantize_uses_rec709_luma()
+    test_writer_runs_callbacks_after_files_are_written()
+    test_failed_frame_skips_its_callback()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试自动调优的组合生成、选择与保存 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+from blender_autotune import candidate_grid, load_host_profile, save_host_profile, select_best_profile
+from blender_worker_pool import shard_cpu_set
+
+
+def test_candidate_grid_resolves_auto_threads_and_dedupes():
+    grid = candidate_grid([1, 2], [0, 0], [0, 256], [False])
+    assert len(grid) == 4
+    cpu_count = os.cpu_count() or 1
+    one_worker = [p for p in grid if p["workers"] == 1][0]
+    assert one_worker["threads_per_worker"] == cpu_count
+    assert {p["tile_size"] for p in grid} == {None, 256}
+    print("[OK] 组合网格展开并去重")
+
+
+def test_select_best_profile_respects_memory_budget():
+    results = [
+        {"workers": 1, "success": True, "images_per_minute": 10.0, "peak_rss_mb": 500},
+        {"workers": 4, "success": True, "images_per_minute": 30.0, "peak_rss_mb": 4000},
+        {"workers": 8, "success": False, "images_per_minute": 0.0, "peak_rss_mb": 0},
+    ]
+    assert select_best_profile(results)["workers"] == 4
+    assert select_best_profile(results, max_rss_mb=1000)["workers"] == 1
+    assert select_best_profile(results[2:]) is None
+    # 未测量内存 (None) 的结果不能满足内存上限
+    unmeasured = [dict(result, peak_rss_mb=None) for result in results]
+    assert select_best_profile(unmeasured)["workers"] == 4
+    assert select_best_profile(unmeasured, max_rss_mb=1000) is None
+    print("[OK] 按吞吐量与内存上限选择最佳配置")
+
+
+def test_host_profile_round_trip():
+    with tempfile.TemporaryDirectory() as folder:
+        store_path = os.path.join(folder, "profiles.json")
+        assert load_host_profile(store_path) is None
+        save_host_profile({"workers": 2, "threads_per_worker": 4}, store_path)
+        assert load_host_profile(store_path) == {"workers": 2, "threads_per_worker": 4}
+    print("[OK] 调优结果按主机保存并读取")
+
+
+def test_shard_cpu_sets_are_disjoint_blocks():
+    cpu_count = os.cpu_count() or 1
+    threads = max(1, cpu_count // 2)
+    first, second = shard_cpu_set(0, threads), shard_cpu_set(1, threads)
+    assert len(first) == threads
+    if cpu_count >= 2:
+        assert not first & second
+    print("[OK] 各分片的CPU核心互不重叠")
+
+
+if __name__ == "__main__":
+    test_candidate_grid_resolves_auto_threads_and_dedupes()
+    test_select_best_profile_respects_memory_budget()
+    test_host_profile_round_trip()
+    test_shard_cpu_sets_are_disjoint_blocks()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试tar分片输出 (不需要Blender)
+"""
+
+import json
+import os
+import tempfile
+
+from dataset_shards import ShardWriter, iter_samples, load_shard_index, read_sample
+
+
+def _write_view_files(folder, view_id):
+    files = []
+    for component, name in [("pattern_000", f"{view_id:06d}_pattern.png"), ("depth_R", f"depth_R_{view_id:06d}.exr")]:
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write(f"{component}-{view_id}".encode('utf-8'))
+        files.append((component, path))
+    return files
+
+
+def test_samples_are_grouped_and_loose_files_removed_per_shard():
+    with tempfile.TemporaryDirectory() as tmp:
+        shard_dir = os.path.join(tmp, "shards")
+        closed = []
+        writer = ShardWriter(shard_dir, samples_per_shard=2,
+                             shard_closed_callback=lambda name, keys: closed.append((name, keys)))
+        view_files = {view_id: _write_view_files(tmp, view_id) for view_id in (1, 2, 3)}
+        for view_id, files in view_files.items():
+            writer.add_sample(f"{view_id:06d}", files, {"view_id": view_id})
+        # 第一个分片已关闭：其零散文件被删除；第二个分片未关闭，文件保留
+        assert not any(os.path.exists(path) for _, path in view_files[1] + view_files[2])
+        assert all(os.path.exists(path) for _, path in view_files[3]) and writer.pending_count == 1
+        writer.close()
+        assert writer.shards_written == 2
+        assert closed == [("samples_w000_000000.tar", ["000001", "000002"]), ("samples_w000_000001.tar", ["000003"])]
+
+        index = load_shard_index(shard_dir)
+        assert index == {"000001": "samples_w000_000000.tar", "000002": "samples_w000_000000.tar",
+                         "000003": "samples_w000_000001.tar"}
+        sample = read_sample(shard_dir, "000002", index)
+        assert sample["pattern_000.png"] == b"pattern_000-2" and sample["depth_R.exr"] == b"depth_R-2"
+        assert json.loads(sample["json"]) == {"view_id": 2}
+        keys = [key for key, _ in iter_samples(os.path.join(shard_dir, index["000001"]))]
+        assert keys == ["000001", "000002"]
+    print("[OK] 每个视角的输出打包为一个样本，分片关闭后删除零散文件")
+
+
+def test_resume_skips_packed_samples_and_rewrites_torn_shard():
+    with tempfile.TemporaryDirectory() as tmp:
+        shard_dir = os.path.join(tmp, "shards")
+        writer = ShardWriter(shard_dir, samples_per_shard=1)
+        writer.add_sample("000001", _write_view_files(tmp, 1))
+        # 模拟崩溃：第二个分片打开后未关闭
+        torn = ShardWriter(shard_dir, samples_per_shard=5, resume=True)
+        torn.add_sample("000002", _write_view_files(tmp, 2))
+
+        resumed = ShardWriter(shard_dir, samples_per_shard=5, resume=True)
+        assert resumed.packed_keys == {"000001"}
+        resumed.add_sample("000001", _write_view_files(tmp, 1))
+        resumed.add_sample("000002", _write_view_files(tmp, 2))
+        resumed.close()
+        index = load_shard_index(shard_dir)
+        assert index == {"000001": "samples_w000_000000.tar", "000002": "samples_w000_000001.tar"}
+        # 已打包的样本不会重复写入，其零散文件留给调用方
+        assert os.path.exists(os.path.join(tmp, "000001_pattern.png"))
+
+        # 新运行 (非续跑) 丢弃旧分片
+        fresh = ShardWriter(shard_dir, samples_per_shard=5)
+        assert fresh.packed_keys == set() and load_shard_index(shard_dir) == {}
+        assert os.listdir(shard_dir) == []
+    print("[OK] 续跑时跳过已打包样本并重写未完成的分片，新运行清除旧分片")
+
+
+if __name__ == "__main__":
+    test_samples_are_grouped_and_loose_files_removed_per_shard()
+    test_resume_skips_packed_samples_and_rewrites_torn_shard()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试断点续跑的完成清单 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+from generation_manifest import GenerationManifest, load_completed_units, manifest_path
+
+LAYOUT = {"pattern_count": 3, "views_per_stl": 2, "pattern_synthesis": False}
+
+
+def test_resume_sees_units_of_previous_run():
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        manifest = GenerationManifest(manifest_dir, LAYOUT)
+        manifest.mark_done("depth", 1, "a.stl")
+        manifest.mark_done("pattern", 1, "a.stl")
+        manifest.close()
+
+        resumed = GenerationManifest(manifest_dir, LAYOUT, resume=True)
+        assert resumed.is_done("depth", 1, "a.stl")
+        assert resumed.is_done("pattern", 1, "a.stl")
+        assert not resumed.is_done("pattern", 2, "a.stl")
+        # 同一编号属于另一个STL时 (例如STL文件夹变了) 不算完成
+        assert not resumed.is_done("depth", 1, "b.stl")
+        resumed.close()
+    print("[OK] 续跑时读取到上次运行完成的单元")
+
+
+def test_torn_last_line_and_layout_change_are_ignored():
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        manifest = GenerationManifest(manifest_dir, LAYOUT)
+        manifest.mark_done("ambient", 1, "a.stl")
+        manifest.close()
+        with open(manifest_path(manifest_dir), 'a', encoding='utf-8') as f:
+            f.write('{"type": "unit", "kind": "amb')
+
+        assert load_completed_units(manifest_dir, LAYOUT) == {("ambient", 1): "a.stl"}
+        assert load_completed_units(manifest_dir, dict(LAYOUT, pattern_count=4)) == {}
+    print("[OK] 崩溃截断的最后一行与编号布局变化被忽略")
+
+
+def test_new_run_discards_old_manifests():
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        for shard_index in range(3):
+            manifest = GenerationManifest(manifest_dir, LAYOUT, shard_index=shard_index, shard_count=3)
+            manifest.mark_done("depth", shard_index + 1, "a.stl")
+            manifest.close()
+
+        GenerationManifest(manifest_dir, LAYOUT, shard_index=0, shard_count=2).close()
+        assert not os.path.exists(manifest_path(manifest_dir, 2))
+        assert load_completed_units(manifest_dir, LAYOUT) == {("depth", 2): "a.stl"}
+    print("[OK] 新运行清空本分片清单并删除多余分片的清单")
+
+
+def test_failed_render_is_not_marked_done():
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        written = os.path.join(manifest_dir, "000001_pattern.png")
+        with open(written, 'wb') as f:
+            f.write(b"png")
+        empty = os.path.join(manifest_dir, "000002_pattern.png")
+        open(empty, 'wb').close()
+
+        manifest = GenerationManifest(manifest_dir, LAYOUT)
+        recorded = []
+        assert manifest.mark_done_if_written("pattern", 1, "a.stl", [written], lambda: recorded.append(1))
+        # 渲染失败：文件没有写出或为空，也不写随机参数记录
+        assert not manifest.mark_done_if_written("pattern", 2, "a.stl", [empty], lambda: recorded.append(2))
+        assert recorded == [1]
+        assert not manifest.mark_done_if_written("depth", 1, "a.stl", [written, os.path.join(manifest_dir, "missing.exr")])
+        manifest.close()
+
+        resumed = GenerationManifest(manifest_dir, LAYOUT, resume=True)
+        assert resumed.is_done("pattern", 1, "a.stl")
+        assert not resumed.is_done("pattern", 2, "a.stl") and not resumed.is_done("depth", 1, "a.stl")
+        resumed.close()
+    print("[OK] 输出文件缺失的渲染不记为完成，续跑时重新渲染")
+
+
+if __name__ == "__main__":
+    test_resume_sees_units_of_previous_run()
+    test_torn_last_line_and_layout_change_are_ignored()
+    test_new_run_discards_old_manifests()
+    test_failed_render_is_not_marked_done()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试归一化网格缓存的存取 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from mesh_cache import load_normalized_mesh, mesh_cache_path, save_normalized_mesh
+
+
+def _triangle_part(offset):
+    return {
+        "vertices": np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float32) + offset,
+        "loop_starts": np.array([0], dtype=np.int32),
+        "loop_totals": np.array([3], dtype=np.int32),
+        "loop_vertices": np.array([0, 1, 2], dtype=np.int32),
+    }
+
+
+def test_round_trip_keeps_parts_and_scale():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "mesh.npz")
+        save_normalized_mesh(cache_path, [_triangle_part(0.0), _triangle_part(-2.0)], 37.5)
+        parts, scale_factor = load_normalized_mesh(cache_path)
+        assert scale_factor == 37.5
+        assert len(parts) == 2
+        np.testing.assert_array_equal(parts[1]["vertices"], _triangle_part(-2.0)["vertices"])
+        np.testing.assert_array_equal(parts[0]["loop_vertices"], [0, 1, 2])
+    print("[OK] 缓存的部件几何与缩放系数可原样读回")
+
+
+def test_key_changes_with_file_content_and_target_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        stl_path = os.path.join(tmp, "model.stl")
+        with open(stl_path, 'wb') as f:
+            f.write(b"solid model\nendsolid model\n")
+        first = mesh_cache_path(stl_path, 150.0, tmp)
+        assert first == mesh_cache_path(stl_path, 150.0, tmp)
+        assert first != mesh_cache_path(stl_path, 100.0, tmp)
+
+        with open(stl_path, 'ab') as f:
+            f.write(b"\n")
+        os.utime(stl_path, ns=(0, 10 ** 9))
+        assert first != mesh_cache_path(stl_path, 150.0, tmp)
+        assert load_normalized_mesh(first) is None
+    print("[OK] 缓存键随STL内容与目标尺寸变化")
+
+
+def test_key_separates_stl_reader_backends():
+    with tempfile.TemporaryDirectory() as tmp:
+        stl_path = os.path.join(tmp, "model.stl")
+        with open(stl_path, 'wb') as f:
+            f.write(b"solid model\nendsolid model\n")
+        # stl_reader 会焊接顶点并去掉退化三角形，两种读取方式的缓存不能互相复用
+        assert mesh_cache_path(stl_path, 150.0, tmp) == mesh_cache_path(stl_path, 150.0, tmp, reader="operator")
+        assert mesh_cache_path(stl_path, 150.0, tmp, reader="numpy") != mesh_cache_path(stl_path, 150.0, tmp)
+        assert (mesh_cache_path(stl_path, 150.0, tmp, variant="decimate:1", reader="numpy") !=
+                mesh_cache_path(stl_path, 150.0, tmp, variant="decimate:1"))
+    print("[OK] 缓存键区分STL读取方式")
+
+
+if __name__ == "__main__":
+    test_round_trip_keeps_parts_and_scale()
+    test_key_changes_with_file_content_and_target_size()
+    test_key_separates_stl_reader_backends()
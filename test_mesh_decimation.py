@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试像素误差预算的网格简化 (不需要Blender)
+"""
+
+import math
+
+import numpy as np
+
+from mesh_decimation import cluster_decimate, decimate_parts, decimation_cell_size, world_units_per_pixel
+from stl_reader import mesh_part_arrays
+
+
+def _grid_mesh(resolution):
+    """resolution x resolution 个方格的单位正方形，每格两个三角形"""
+    coordinates = np.linspace(0.0, 1.0, resolution + 1)
+    xs, ys = np.meshgrid(coordinates, coordinates, indexing='ij')
+    vertices = np.stack([xs.ravel(), ys.ravel(), np.zeros(xs.size)], axis=1)
+    index = np.arange((resolution + 1) ** 2).reshape(resolution + 1, resolution + 1)
+    a, b = index[:-1, :-1].ravel(), index[1:, :-1].ravel()
+    c, d = index[1:, 1:].ravel(), index[:-1, 1:].ravel()
+    faces = np.concatenate([np.stack([a, b, c], axis=1), np.stack([a, c, d], axis=1)])
+    return vertices, faces
+
+
+def test_pixel_size_uses_the_nearest_point_of_the_model():
+    units = world_units_per_pixel((0, 0, 0), (0, 0, 100), 20.0, 1000.0)
+    assert math.isclose(units, (100 - 10 * math.sqrt(3)) / 1000.0)
+    # 单元对角线 (缩放后) 恰好等于误差像素数
+    cell = decimation_cell_size(2.0, units, 0.5)
+    assert math.isclose(cell * 0.5 * math.sqrt(3), 2.0 * units)
+    print("[OK] 像素尺寸按模型最近点计算，单元对角线对应误差像素")
+
+
+def test_dense_grid_is_decimated_within_one_cell():
+    vertices, faces = _grid_mesh(100)
+    cell_size = 0.05
+    new_vertices, new_faces = cluster_decimate(vertices, faces, cell_size)
+    assert len(new_faces) < len(faces) // 10
+    assert new_faces.dtype == np.int32 and new_faces.max() < len(new_vertices)
+    # 每个新顶点离某个原顶点不超过一个单元对角线
+    distances = np.linalg.norm(new_vertices[:, np.newaxis, :2] - vertices[np.newaxis, :, :2], axis=2).min(axis=1)
+    assert distances.max() <= cell_size * math.sqrt(3)
+    # 没有退化或重复的三角形
+    assert np.all(new_faces[:, 0] != new_faces[:, 1]) and np.all(new_faces[:, 1] != new_faces[:, 2])
+    assert len(np.unique(np.sort(new_faces, axis=1), axis=0)) == len(new_faces)
+    print(f"[OK] 密集网格简化: {len(faces)} -> {len(new_faces)} 个三角形")
+
+
+def test_coarse_and_small_meshes_are_kept():
+    vertices, faces = _grid_mesh(4)
+    parts = [mesh_part_arrays(vertices.astype(np.float32), faces)]
+    decimated, before, after = decimate_parts(parts, 0.01)
+    assert before == after == 32
+    np.testing.assert_array_equal(decimated[0]["loop_vertices"], parts[0]["loop_vertices"])
+    # 低于三角形数下限时原样返回
+    kept, before, after = decimate_parts(parts, 0.5, min_triangles=100)
+    assert kept is parts and before == after
+    print("[OK] 粗糙网格和小模型保持不变")
+
+
+if __name__ == "__main__":
+    test_pixel_size_uses_the_nearest_point_of_the_model()
+    test_dense_grid_is_decimated_within_one_cell()
+    test_coarse_and_small_meshes_are_kept()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试向量化网格包围盒与平面放置 (不需要Blender)
+"""
+
+import math
+
+import numpy as np
+
+from mesh_utils import axis_aligned_bounds, centering_and_scale, contact_offset, root_mesh_digest, transform_points
+
+
+class _FakeCollection:
+    """只实现 foreach_get 的 bpy 属性集合"""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def foreach_get(self, attribute, target):
+        target[:] = self.values.ravel()
+
+
+class _FakeMesh:
+    def __init__(self, vertices, faces):
+        self.vertices = _FakeCollection(vertices)
+        self.loops = _FakeCollection([index for face in faces for index in face])
+        self.polygons = _FakeCollection([len(face) for face in faces])
+
+
+class _FakeMeshObject:
+    type = 'MESH'
+
+    def __init__(self, vertices, faces):
+        self.data = _FakeMesh(vertices, faces)
+        self.matrix_local = np.eye(4)
+
+
+class _FakeRoot:
+    def __init__(self, *children):
+        self.children = list(children)
+
+
+def _rotation_y(degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    matrix = np.eye(4)
+    matrix[:3, :3] = [[c, 0, s], [0, 1, 0], [-s, 0, c]]
+    return matrix
+
+
+def test_multi_part_model_is_centered_as_a_whole():
+    part_a = np.array([[0, 0, 0], [2, 1, 1]], dtype=np.float64)
+    part_b = np.array([[8, 3, 1], [10, 4, 2]], dtype=np.float64)
+    center, scale_factor = centering_and_scale(np.concatenate([part_a, part_b]), 150.0)
+    np.testing.assert_allclose(center, [5.0, 2.0, 1.0])
+    assert math.isclose(scale_factor, 15.0)
+    minimum, maximum = axis_aligned_bounds(np.concatenate([part_a, part_b]) - center)
+    np.testing.assert_allclose(minimum, -maximum)
+    assert centering_and_scale(np.zeros((3, 3)), 150.0)[1] is None
+    print("[OK] 多部件模型整体居中并按最大边缩放")
+
+
+def test_contact_uses_exact_vertices_of_rotated_model():
+    # 八面体：旋转45°后包围盒角点比真实最低点低得多
+    vertices = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]], dtype=np.float64)
+    local_to_world = _rotation_y(45.0)
+    local_to_world[:3, 3] = [0.0, 0.0, 5.0]
+    offset = contact_offset(vertices, local_to_world, (0, 0, 0), (0, 0, 1), clearance=0.1)
+    lowest_world_z = transform_points(vertices, local_to_world)[:, 2].min()
+    assert math.isclose(lowest_world_z + offset, 0.1)
+    assert math.isclose(offset, -(5.0 - math.sqrt(0.5)) + 0.1)
+    print("[OK] 旋转后的模型按真实最低顶点贴合平面")
+
+
+def test_mesh_digest_follows_the_instantiated_mesh():
+    vertices = [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    faces = [(0, 1, 2), (0, 1, 3)]
+    digest = root_mesh_digest(_FakeRoot(_FakeMeshObject(vertices, faces)))
+    assert digest == root_mesh_digest(_FakeRoot(_FakeMeshObject(vertices, faces)))
+    # 简化去掉一个面、或顶点位置变化 (不同读取器/焊接) 都得到不同的摘要
+    assert digest != root_mesh_digest(_FakeRoot(_FakeMeshObject(vertices, faces[:1])))
+    moved = [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1.001]]
+    assert digest != root_mesh_digest(_FakeRoot(_FakeMeshObject(moved, faces)))
+    print("[OK] 渲染缓存键随最终实例化的网格变化")
+
+
+if __name__ == "__main__":
+    test_multi_part_model_is_centered_as_a_whole()
+    test_contact_uses_exact_vertices_of_rotated_model()
+    test_mesh_digest_follows_the_instantiated_mesh()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试写出时确定的文件编号 (不需要Blender)
+"""
+
+import tempfile
+
+from output_naming import load_runs, new_run_id, open_run, render_ids
+
+
+def test_ids_are_unique_and_contiguous_within_a_run():
+    views_per_stl, pattern_count = 2, 3
+    pattern_ids = []
+    view_ids = []
+    for stl_index in range(4):
+        for view_index in range(views_per_stl):
+            first_pattern_id, view_id = render_ids(stl_index, view_index, views_per_stl, pattern_count)
+            pattern_ids.extend(range(first_pattern_id, first_pattern_id + pattern_count))
+            view_ids.append(view_id)
+    assert pattern_ids == list(range(1, 4 * views_per_stl * pattern_count + 1))
+    assert view_ids == list(range(1, 4 * views_per_stl + 1))
+    print("[OK] 同一次运行内的编号唯一且连续")
+
+
+def test_append_continues_after_earlier_runs_and_resume_reuses_the_block():
+    with tempfile.TemporaryDirectory() as tmp:
+        first = open_run(tmp, "run_a", stl_count=10, views_per_stl=2, pattern_count=4)
+        assert (first.view_id_offset, first.pattern_id_offset) == (0, 0)
+        assert (first.view_id_end, first.pattern_id_end) == (20, 80)
+
+        # 追加运行的图案数不同也不会与已有编号重叠
+        second = open_run(tmp, "run_b", stl_count=5, views_per_stl=1, pattern_count=6, mode="append")
+        assert second.render_ids(0, 0) == (81, 21) and second.pattern_id_end == 110
+        # 同一运行的其他工作进程 (不写 runs.json) 得到相同的区间
+        other_worker = open_run(tmp, "run_b", stl_count=5, views_per_stl=1, pattern_count=6,
+                                mode="append", write=False)
+        assert other_worker.render_ids(4, 0) == second.render_ids(4, 0) == (105, 25)
+        assert [run["run_id"] for run in load_runs(tmp)] == ["run_a", "run_b"]
+
+        resumed = open_run(tmp, None, stl_count=5, views_per_stl=1, pattern_count=6, mode="resume")
+        assert resumed.run_id == "run_b" and resumed.render_ids(0, 0) == (81, 21)
+        assert len(load_runs(tmp)) == 2
+
+        fresh = open_run(tmp, "run_c", stl_count=1, views_per_stl=1, pattern_count=1)
+        assert fresh.render_ids(0, 0) == (1, 1) and [run["run_id"] for run in load_runs(tmp)] == ["run_c"]
+    print("[OK] 追加模式接着已有编号，续跑沿用上次区间，新运行从1开始")
+
+
+def test_run_ids_started_together_are_distinct():
+    run_ids = [new_run_id() for _ in range(100)]
+    assert len(set(run_ids)) == len(run_ids)
+    assert all(run_id.startswith("run_") for run_id in run_ids)
+    print("[OK] 同一秒内创建的运行编号互不相同")
+
+
+if __name__ == "__main__":
+    test_ids_are_unique_and_contiguous_within_a_run()
+    test_append_continues_after_earlier_runs_and_resume_reuses_the_block()
+    test_run_ids_started_together_are_distinct()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试图案纹理缓存 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from pattern_cache import PatternTextureCache, byte_pattern_pixels, image_buffer_bytes
+from pattern_synthesis import srgb_to_linear
+
+
+class _FakeImage:
+    def __init__(self, name, size, is_float):
+        self.name = name
+        self.size = size
+        self.is_float = is_float
+
+
+class _FakeCache(PatternTextureCache):
+    """用假图像代替 bpy 数据块，只测试键和淘汰逻辑"""
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self.removed = []
+
+    def _adopt_image(self, key):
+        return None
+
+    def _load_image(self, key, filepath):
+        self.loads += 1
+        return _FakeImage(key, (10, 10), is_float=False)
+
+    def _remove_image(self, image):
+        self.removed.append(image.name)
+
+
+def test_byte_levels_are_detected_through_srgb():
+    levels = np.array([0, 1, 64, 128, 254, 255], dtype=np.float32) / 255.0
+    linear = np.ones((1, len(levels), 4), dtype=np.float32)
+    linear[..., :3] = srgb_to_linear(levels)[np.newaxis, :, np.newaxis]
+    byte_pixels = byte_pattern_pixels(linear, 'sRGB')
+    np.testing.assert_array_equal(np.round(byte_pixels[0, :, 0] * 255), [0, 1, 64, 128, 254, 255])
+    # 16位渐变 (非8位量化级) 保持浮点
+    gradient = np.ones((1, 100, 4), dtype=np.float32)
+    gradient[..., :3] = (np.arange(100, dtype=np.float32) * 7 / 65535.0)[np.newaxis, :, np.newaxis]
+    assert byte_pattern_pixels(gradient, 'Non-Color') is None
+    assert byte_pattern_pixels(linear, 'Linear Rec.709') is None
+    assert image_buffer_bytes(10, 10, True) == 4 * image_buffer_bytes(10, 10, False) == 1600
+    print("[OK] 只含8位层次的浮点图案可无损转为8位")
+
+
+def test_identical_files_share_one_image_and_lru_is_evicted():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, content in [("a.png", b"A"), ("b.png", b"B"), ("a_copy.png", b"A"), ("c.png", b"C")]:
+            path = os.path.join(tmp, name)
+            with open(path, 'wb') as f:
+                f.write(content)
+            paths.append(path)
+
+        cache = _FakeCache(max_bytes=2 * image_buffer_bytes(10, 10, False))
+        image_a = cache.get(paths[0])
+        image_b = cache.get(paths[1])
+        assert cache.get(paths[2]) is image_a and cache.loads == 2 and cache.hits == 1
+        # a 最近使用过，超出上限时淘汰 b
+        cache.get(paths[3])
+        assert cache.removed == [image_b.name] and cache.total_bytes == cache.max_bytes
+        # 同一次调用请求的图案即使超出上限也不会被淘汰
+        images = cache.get_many(paths)
+        assert len({image.name for image in images}) == 3 and cache.total_bytes > cache.max_bytes
+    print("[OK] 内容相同的图案共用一个数据块，超出上限时按LRU淘汰")
+
+
+def test_cap_holds_when_patterns_are_fetched_per_render():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for index in range(5):
+            path = os.path.join(tmp, f"p{index}.png")
+            with open(path, 'wb') as f:
+                f.write(bytes([index]))
+            paths.append(path)
+
+        # v6：加载时一次 get_many 校验全部图案，渲染时逐张 get
+        cache = _FakeCache(max_bytes=2 * image_buffer_bytes(10, 10, False))
+        cache.get_many(paths)
+        assert cache.loads == len(paths)
+        for _ in range(2):
+            for path in paths:
+                cache.get(path)
+                assert cache.total_bytes <= cache.max_bytes
+
+        # 上限足够时每个图案只加载一次
+        roomy = _FakeCache(max_bytes=len(paths) * image_buffer_bytes(10, 10, False))
+        roomy.get_many(paths)
+        for path in paths:
+            roomy.get(path)
+        assert roomy.loads == len(paths) and roomy.removed == []
+    print("[OK] 图案数超过上限时逐张取用不超过上限，上限足够时每个图案只加载一次")
+
+
+if __name__ == "__main__":
+    test_byte_levels_are_detected_through_srgb()
+    test_identical_files_share_one_image_and_lru_is_evicted()
+    test_cap_holds_when_patterns_are_fetched_per_render()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试内置结构光图案生成 (不需要Blender)
+"""
+
+import math
+
+import numpy as np
+
+from pattern_cache import pattern_digest
+from pattern_generator import generate_patterns
+
+
+def test_phase_shift_recovers_the_phase():
+    params = {"width": 64, "height": 8, "steps": 4, "periods": [16.0]}
+    patterns = generate_patterns("phase_shift", params)
+    assert len(patterns) == 4 and patterns[0].size == (64, 8)
+    assert [p.metadata["phase_offset_rad"] for p in patterns] == [2 * math.pi * k / 4 for k in range(4)]
+    # 标准N步相移解相: phi = atan2(-sum I_k sin d_k, sum I_k cos d_k)
+    offsets = np.array([p.metadata["phase_offset_rad"] for p in patterns])
+    stack = np.stack([p.values for p in patterns])
+    phase = np.arctan2(-np.tensordot(np.sin(offsets), stack, 1), np.tensordot(np.cos(offsets), stack, 1))
+    expected = 2 * math.pi * np.arange(64) / 16.0
+    np.testing.assert_allclose(np.angle(np.exp(1j * (phase[0] - expected))), 0.0, atol=1e-5)
+    assert not patterns[0].is_binary and patterns[0].values.min() >= 0.0 and patterns[0].values.max() <= 1.0
+    print("[OK] N步相移图案可解出正确相位")
+
+
+def test_heterodyne_records_beat_period():
+    patterns = generate_patterns("heterodyne", {"width": 32, "height": 4, "steps": 3, "periods": [8.0, 7.0]})
+    assert len(patterns) == 6
+    assert patterns[3].metadata["frequency_index"] == 1
+    assert math.isclose(patterns[3].metadata["beat_period_px"], 56.0)
+    print("[OK] 多频外差图案记录拍频周期")
+
+
+def test_gray_code_columns_are_unique_and_adjacent_codes_differ_by_one_bit():
+    patterns = generate_patterns("gray_code", {"width": 100, "height": 2, "inverse": True})
+    bits = patterns[0].metadata["bits"]
+    assert bits == 7 and len(patterns) == 2 * bits and all(p.is_binary for p in patterns)
+    planes = np.stack([p.values[0] for p in patterns[:bits]]).astype(np.int64)
+    codes = (planes * (2 ** np.arange(bits - 1, -1, -1))[:, np.newaxis]).sum(axis=0)
+    assert len(np.unique(codes)) == 100
+    changes = np.abs(np.diff(planes, axis=1)).sum(axis=0)
+    assert set(changes.tolist()) <= {0, 1}
+    np.testing.assert_array_equal(patterns[bits].values, 1.0 - patterns[0].values)
+    print("[OK] 格雷码每列编码唯一，相邻列只差一位，反码正确")
+
+
+def test_horizontal_binary_and_digests():
+    patterns = generate_patterns("binary", {"width": 4, "height": 16, "orientation": "horizontal"})
+    assert len(patterns) == 4
+    np.testing.assert_array_equal(patterns[0].values[:, 0], [0] * 8 + [1] * 8)
+    again = generate_patterns("binary", {"width": 4, "height": 16, "orientation": "horizontal"})
+    assert pattern_digest(patterns[1]) == pattern_digest(again[1]) != pattern_digest(patterns[2])
+    print("[OK] 水平二进制图案按行编码，相同内容的图案哈希相同")
+
+
+if __name__ == "__main__":
+    test_phase_shift_recovers_the_phase()
+    test_heterodyne_records_beat_period()
+    test_gray_code_columns_are_unique_and_adjacent_codes_differ_by_one_bit()
+    test_horizontal_binary_and_digests()
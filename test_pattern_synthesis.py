@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试离线图案合成 (不需要Blender)
+"""
+
+import numpy as np
+
+from pattern_synthesis import linear_to_srgb, sample_pattern_bilinear, srgb_to_linear, synthesize_pattern_image
+
+
+def test_sample_pattern_hits_pixel_centers():
+    pattern = np.arange(12, dtype=np.float32).reshape(3, 4, 1)
+    # 像素 (row=1, col=2) 的中心
+    uv = np.array([[(2.5 / 4, 1.5 / 3)]], dtype=np.float32)
+    assert np.allclose(sample_pattern_bilinear(pattern, uv), pattern[1, 2])
+    # 两个像素中心之间取平均
+    uv = np.array([[(2.0 / 4, 1.5 / 3)]], dtype=np.float32)
+    assert np.allclose(sample_pattern_bilinear(pattern, uv), (pattern[1, 1] + pattern[1, 2]) / 2)
+    print("[OK] 双线性采样与Blender像素中心约定一致")
+
+
+def test_outside_projector_frustum_is_dark():
+    pattern = np.ones((4, 4, 3), dtype=np.float32)
+    uv = np.array([[(-0.1, 0.5), (0.5, 1.2), (np.nan, 0.5)]], dtype=np.float32)
+    assert np.all(sample_pattern_bilinear(pattern, uv) == 0.0)
+    print("[OK] 投影范围外和无效坐标不被照亮")
+
+
+def test_synthesis_is_ambient_plus_modulated_irradiance():
+    ambient = np.full((2, 2, 4), 0.1, dtype=np.float32)
+    irradiance = np.full((2, 2, 4), 0.5, dtype=np.float32)
+    uv = np.full((2, 2, 3), 0.5, dtype=np.float32)
+    pattern = np.full((8, 8, 1), 0.4, dtype=np.float32)
+    image = synthesize_pattern_image(ambient, irradiance, uv, pattern)
+    assert image.shape == (2, 2, 3)
+    assert np.allclose(image, 0.1 + 0.5 * 0.4)
+    print("[OK] 合成结果 = 环境光 + 辐照度 x 图案")
+
+
+def test_srgb_round_trip():
+    values = np.linspace(0.0, 1.0, 11, dtype=np.float32)
+    assert np.allclose(linear_to_srgb(srgb_to_linear(values)), values, atol=1e-5)
+    print("[OK] sRGB 编解码可逆")
+
+
+if __name__ == "__main__":
+    test_sample_pattern_hits_pixel_centers()
+    test_outside_projector_frustum_is_dark()
+    test_synthesis_is_ambient_plus_modulated_irradiance()
+    test_srgb_round_trip()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试参考平面深度的解析计算 (不需要Blender)
+"""
+
+import tempfile
+
+import numpy as np
+
+import reference_plane_depth as rpd
+
+
+def make_params(distance=100.0, resolution=(64, 48), half_size=1000.0):
+    # 相机位于原点看向 -Z，平面位于 z = -distance 且法线朝向相机
+    plane_matrix = np.eye(4)
+    plane_matrix[2, 3] = -distance
+    return {
+        "camera": {
+            "intrinsics": {
+                "focal_length_mm": 50.0, "sensor_width_mm": 36.0, "sensor_height_mm": 24.0,
+                "sensor_fit": "AUTO", "shift_x": 0.0, "shift_y": 0.0,
+                "resolution_x": resolution[0], "resolution_y": resolution[1],
+                "clip_start": 10.0, "clip_end": 1500.0,
+            },
+            "extrinsics": {"world_to_cam_matrix": np.eye(4).tolist()},
+        },
+        "reference_plane": {"matrix_world": plane_matrix.tolist(), "half_size": half_size},
+    }
+
+
+def test_auto_sensor_fit_uses_sensor_width_on_longer_side():
+    fx, fy, cx, cy = rpd.blender_camera_intrinsics(50.0, 36.0, 24.0, 'AUTO', 640, 640)
+    assert np.isclose(fx, 50.0 / 36.0 * 640) and fx == fy
+    assert (cx, cy) == (320.0, 320.0)
+    fx, fy, _, _ = rpd.blender_camera_intrinsics(50.0, 36.0, 24.0, 'VERTICAL', 640, 480)
+    assert np.isclose(fy, 50.0 / 24.0 * 480)
+    print("[OK] 焦距按 sensor_fit 计算")
+
+
+def test_fronto_parallel_plane_has_constant_z_depth():
+    params = make_params(distance=100.0)
+    depth = rpd.compute_reference_plane_depth(params)
+    assert depth.shape == (48, 64)
+    assert np.allclose(depth, 100.0)
+    assert rpd.validate_depth_map(depth, params) is None
+    print("[OK] 正对相机的平面深度恒定")
+
+
+def test_small_plane_leaves_background():
+    params = make_params(distance=100.0, half_size=5.0)
+    depth = rpd.compute_reference_plane_depth(params)
+    assert depth[0, 0] == rpd.BACKGROUND_DEPTH
+    assert np.isclose(depth[24, 32], 100.0)
+    print("[OK] 未命中平面的像素为背景深度")
+
+
+def test_clip_end_applies_to_ray_length_not_z():
+    params = make_params(distance=100.0)
+    params["camera"]["intrinsics"]["clip_end"] = 105.0
+    depth = rpd.compute_reference_plane_depth(params)
+    # 中心像素的光线距离约为 100，角点光线倾斜，距离约 109 超出 clip_end
+    assert np.isclose(depth[24, 32], 100.0)
+    assert depth[0, 0] == rpd.BACKGROUND_DEPTH
+    assert rpd.validate_depth_map(depth, params) is None
+    # 按 Z 深度看全部在裁剪范围内的深度图，按光线距离校验应当失败
+    assert rpd.validate_depth_map(np.full_like(depth, 100.0), params) is not None
+    print("[OK] 裁剪距离按光线长度比较")
+
+
+def test_cache_round_trip_and_key_changes_with_parameters():
+    params = make_params()
+    depth = rpd.compute_reference_plane_depth(params)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        assert rpd.load_cached_depth(params, cache_dir) is None
+        rpd.store_cached_depth(params, depth, cache_dir)
+        assert np.array_equal(rpd.load_cached_depth(params, cache_dir), depth)
+        assert rpd.load_cached_depth(make_params(distance=120.0), cache_dir) is None
+    print("[OK] 缓存按参数哈希命中")
+
+
+if __name__ == "__main__":
+    test_auto_sensor_fit_uses_sensor_width_on_longer_side()
+    test_fronto_parallel_plane_has_constant_z_depth()
+    test_small_plane_leaves_background()
+    test_clip_end_applies_to_ray_length_not_z()
+    test_cache_round_trip_and_key_changes_with_parameters()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试内容寻址渲染缓存 (不需要Blender)
+"""
+
+import os
+import tempfile
+import time
+
+from render_cache import RenderCache, file_digest, render_key
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_key_depends_on_content_not_on_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write(os.path.join(tmp, "a.stl"), b"solid a")
+        _write(os.path.join(tmp, "b.stl"), b"solid a")
+        assert file_digest(os.path.join(tmp, "a.stl")) == file_digest(os.path.join(tmp, "b.stl"))
+
+    base = render_key(kind="pattern", view=[0.0, 45.0], sample={"projector_power": 1.5})
+    assert base == render_key(kind="pattern", view=[0.0, 45.0000000001], sample={"projector_power": 1.5})
+    assert base != render_key(kind="pattern", view=[0.0, 90.0], sample={"projector_power": 1.5})
+    print("[OK] 缓存键只取决于内容与参数")
+
+
+def test_store_then_restore_under_new_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"))
+        rendered = [os.path.join(tmp, "out", "000001_pattern.png"), os.path.join(tmp, "out", "000001_ambient.png")]
+        _write(rendered[0], b"pattern")
+        _write(rendered[1], b"ambient")
+        key = render_key(kind="pattern+view_outputs")
+
+        assert not cache.restore(key, rendered)
+        assert cache.store(key, rendered)
+        # 前面插入一个STL后，同样的内容以新编号输出
+        renamed = [os.path.join(tmp, "out2", "000004_pattern.png"), os.path.join(tmp, "out2", "000004_ambient.png")]
+        assert cache.restore(key, renamed)
+        with open(renamed[1], 'rb') as f:
+            assert f.read() == b"ambient"
+        assert (cache.hits, cache.misses) == (1, 1)
+    print("[OK] 缓存条目可复制到新的输出文件名")
+
+
+def test_least_recently_used_entries_are_evicted():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"), max_bytes=250)
+        output = os.path.join(tmp, "out", "image.png")
+        keys = [render_key(index=i) for i in range(3)]
+        for key in keys[:2]:
+            _write(output, b"x" * 100)
+            cache.store(key, [output])
+            time.sleep(0.02)
+        assert cache.restore(keys[0], [output])
+        time.sleep(0.02)
+
+        _write(output, b"x" * 100)
+        cache.store(keys[2], [output])
+        assert cache.total_bytes() <= 250
+        assert cache.restore(keys[0], [output])
+        assert not cache.restore(keys[1], [output])
+    print("[OK] 超出上限时淘汰最久未使用的条目")
+
+
+if __name__ == "__main__":
+    test_key_depends_on_content_not_on_names()
+    test_store_then_restore_under_new_names()
+    test_least_recently_used_entries_are_evicted()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试渲染质量档位 (不需要Blender)
+"""
+
+from render_profiles import DEFAULT_PROFILE_NAME, get_render_profile, profile_names, resolve_render_settings
+
+
+def test_production_keeps_script_settings():
+    profile = get_render_profile(DEFAULT_PROFILE_NAME)
+    assert resolve_render_settings(profile, 640, 640, 512) == (640, 640, 512)
+    print("[OK] production 档位保持脚本原有分辨率与采样数")
+
+
+def test_production_matches_pre_profile_settings():
+    # 引入档位之前脚本写死的输出设置；光线反弹与降噪从未设置，保持场景默认值 (None)
+    baseline = {"resolution_scale": 1.0, "samples": None, "max_bounces": None, "use_denoising": None,
+                "png_color_depth": '16', "png_compression": 15, "exr_codec": 'ZIP'}
+    profile = get_render_profile("production")
+    assert {key: profile[key] for key in baseline} == baseline
+    assert set(profile) == set(baseline) | {"name"}
+    print("[OK] production 档位与引入档位前的渲染设置一致")
+
+
+def test_draft_is_at_least_ten_times_cheaper():
+    draft_w, draft_h, draft_samples = resolve_render_settings(get_render_profile("draft"), 640, 640, 512)
+    production_cost = 640 * 640 * 512
+    assert production_cost / (draft_w * draft_h * draft_samples) >= 10
+    print("[OK] draft 档位的像素x采样数不到 production 的十分之一")
+
+
+def test_profile_lookup_is_case_insensitive_and_strict():
+    assert get_render_profile(" Preview ")["name"] == "preview"
+    assert set(profile_names()) == {"draft", "preview", "production"}
+    try:
+        get_render_profile("ultra")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知档位应当报错")
+    print("[OK] 档位名称校验")
+
+
+if __name__ == "__main__":
+    test_production_keeps_script_settings()
+    test_production_matches_pre_profile_settings()
+    test_draft_is_at_least_ten_times_cheaper()
+    test_profile_lookup_is_case_insensitive_and_strict()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试SQLite样本索引 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+from sample_index import SampleIndex, sample_files, select_samples
+
+
+def _metadata(view_id, y_deg, power, run_id="run_a"):
+    return {"run_id": run_id, "stl": f"model_{view_id}.stl", "view_id": view_id, "first_pattern_id": view_id * 2 - 1,
+            "view_angles_deg": [y_deg, 0.0], "patterns": ["p0.png", "p1.png"], "seed": 0,
+            "projector_power": power, "background_strength": 0.5, "environment_rotation_z": 90.0}
+
+
+def _files(view_id):
+    return [("pattern_000", f"/data/{view_id * 2 - 1:06d}_pattern.png"),
+            ("pattern_001", f"/data/{view_id * 2:06d}_pattern.png"),
+            ("depth_R", f"/data/depth_R_{view_id:06d}.exr")]
+
+
+def test_samples_are_batched_and_queryable():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "samples.sqlite")
+        index = SampleIndex(db_path, "run_a", batch_size=2)
+        index.add_sample(_metadata(1, 0.0, 4.2), _files(1))
+        # 未满一批时尚未提交
+        assert select_samples(db_path) == []
+        index.add_sample(_metadata(2, 45.0, 4.9), _files(2))
+        index.add_sample(_metadata(3, 45.0, 4.6), _files(3))
+        assert [row["view_id"] for row in select_samples(db_path)] == [1, 2]
+        index.set_shard([2, 3], "samples_w000_000000.tar")
+        index.close()
+
+        rows = select_samples(db_path, "view_y_deg = ? AND projector_power > ?", (45.0, 4.8))
+        assert [row["view_id"] for row in rows] == [2] and rows[0]["shard"] == "samples_w000_000000.tar"
+        files = sample_files(db_path, [3])[3]
+        assert files["pattern_001"]["pattern_id"] == 6 and files["pattern_001"]["pattern_name"] == "p1.png"
+        assert files["depth_R"]["pattern_id"] is None
+    print("[OK] 样本按批次写入，可按视角和随机参数查询")
+
+
+def test_resume_keeps_rows_and_new_run_drops_old_runs():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "samples.sqlite")
+        index = SampleIndex(db_path, "run_a")
+        index.add_sample(_metadata(1, 0.0, 4.2), _files(1))
+        index.close()
+
+        resumed = SampleIndex(db_path, "run_a")
+        assert resumed.has_sample(1) and not resumed.has_sample(2)
+        # 重新记录同一样本替换旧行
+        resumed.add_sample(_metadata(1, 0.0, 4.4), _files(1)[:1])
+        resumed.close()
+        assert select_samples(db_path)[0]["projector_power"] == 4.4
+        assert list(sample_files(db_path, [1])[1]) == ["pattern_000"]
+
+        fresh = SampleIndex(db_path, "run_b", replace_other_runs=True)
+        assert not fresh.has_sample(1)
+        fresh.close()
+        assert select_samples(db_path) == [] and sample_files(db_path, [1]) == {1: {}}
+    print("[OK] 续跑保留已有行，新运行清除旧运行的样本")
+
+
+if __name__ == "__main__":
+    test_samples_are_batched_and_queryable()
+    test_resume_keeps_rows_and_new_run_drops_old_runs()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试逐视角随机参数JSONL记录 (不需要Blender)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from sample_metadata import MetadataStream, load_sample_metadata, metadata_path, remove_stale_streams
+
+
+def _record(view_id, power, matrix_offset=0.0):
+    matrix = (np.eye(4) + matrix_offset).tolist()
+    return {"view_id": view_id, "stl": f"model_{view_id}.stl", "projector_power": power, "seed": 0,
+            "material_roughness": 0.5, "matrix_world": matrix}
+
+
+def test_streams_load_as_numpy_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        first = MetadataStream(metadata_path(tmp, 0), fsync_interval=3600)
+        second = MetadataStream(metadata_path(tmp, 1), fsync_interval=3600)
+        first.append(_record(2, 4.5))
+        second.append(_record(1, 5.0, matrix_offset=1.0))
+        first.close()
+        second.close()
+
+        columns = load_sample_metadata(tmp)
+        np.testing.assert_array_equal(columns["view_id"], [1, 2])
+        assert columns["view_id"].dtype == np.int64 and columns["projector_power"].dtype == np.float64
+        assert columns["matrix_world"].shape == (2, 4, 4) and columns["matrix_world"][0, 0, 0] == 2.0
+        assert list(columns["stl"]) == ["model_1.stl", "model_2.stl"]
+    print("[OK] 多个工作进程的记录按视角编号合并为NumPy列")
+
+
+def test_torn_line_is_skipped_and_last_record_of_a_view_wins():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = metadata_path(tmp, 0)
+        stream = MetadataStream(path, fsync_interval=0)
+        stream.append(_record(1, 4.0))
+        stream.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"view_id": 2, "projector_pow')
+
+        resumed = MetadataStream(path, append=True)
+        resumed.append(_record(1, 4.4))
+        resumed.close()
+        columns = load_sample_metadata(path)
+        np.testing.assert_array_equal(columns["view_id"], [1])
+        assert columns["projector_power"][0] == 4.4
+
+        with open(metadata_path(tmp, 3), 'w') as f:
+            f.write("")
+        remove_stale_streams(tmp, 2)
+        assert os.listdir(tmp) == [os.path.basename(path)]
+    print("[OK] 崩溃留下的残行被跳过，续跑时同一视角以最后一条为准")
+
+
+def test_append_once_is_durable_before_close():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = metadata_path(tmp, 0)
+        stream = MetadataStream(path, fsync_interval=3600)
+        stream.append_once(_record(1, 4.0))
+        stream.append_once(_record(1, 4.0))
+        # 未关闭 (模拟随后崩溃)：记录已落盘且同一视角只写一次
+        columns = load_sample_metadata(path)
+        np.testing.assert_array_equal(columns["view_id"], [1])
+        assert stream.records_written == 1
+        stream.close()
+    print("[OK] 视角记录在渲染单元记入清单前已落盘，且只写一次")
+
+
+if __name__ == "__main__":
+    test_streams_load_as_numpy_columns()
+    test_torn_line_is_skipped_and_last_record_of_a_view_wins()
+    test_append_once_is_durable_before_close()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试STL预取辅助进程 (不需要Blender)
+"""
+
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import mesh_cache
+from stl_prefetch import StlPrefetcher, normalize_stl
+
+TETRAHEDRON = [(0, 0, 0), (4, 0, 0), (0, 2, 0), (0, 0, 1)]
+
+
+def _write_tetrahedron(path, offset=0.0):
+    corners = [(0, 2, 1), (0, 1, 3), (0, 3, 2), (1, 2, 3)]
+    with open(path, 'wb') as f:
+        f.write(b"tetrahedron".ljust(80, b" "))
+        f.write(struct.pack("<I", len(corners)))
+        for face in corners:
+            f.write(struct.pack("<3f", 0.0, 0.0, 0.0))
+            for index in face:
+                f.write(struct.pack("<3f", *(c + offset for c in TETRAHEDRON[index])))
+            f.write(struct.pack("<H", 0))
+
+
+def test_normalize_stl_centers_and_scales():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "a.stl")
+        _write_tetrahedron(path, offset=10.0)
+        parts, scale_factor = normalize_stl(path, 150.0)
+        assert len(parts) == 1 and scale_factor == 150.0 / 4.0
+        vertices = parts[0]["vertices"]
+        np.testing.assert_allclose((vertices.min(axis=0) + vertices.max(axis=0)) / 2.0, 0.0, atol=1e-6)
+        assert len(parts[0]["loop_totals"]) == 4
+    print("[OK] 预取归一化：包围盒居中，最大边缩放到目标尺寸")
+
+
+def test_prefetcher_runs_helpers_and_skips_cached_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"{i}.stl") for i in range(3)]
+        for i, path in enumerate(paths):
+            _write_tetrahedron(path, offset=float(i))
+        cache_dir = os.path.join(tmp, "mesh_cache")
+        cached_parts, cached_scale = normalize_stl(paths[1], 150.0)
+        mesh_cache.save_normalized_mesh(mesh_cache.mesh_cache_path(paths[1], 150.0, cache_dir, reader="numpy"),
+                                        cached_parts, cached_scale)
+
+        prefetcher = StlPrefetcher(150.0, depth=2, mesh_cache_dir=cache_dir)
+        try:
+            prefetcher.schedule(paths)
+            assert len(prefetcher._pending) == 2
+            parts, scale_factor = prefetcher.take(paths[0])
+            expected_parts, expected_scale = normalize_stl(paths[0], 150.0)
+            np.testing.assert_array_equal(parts[0]["vertices"], expected_parts[0]["vertices"])
+            assert scale_factor == expected_scale
+            # 已在网格缓存中的文件由主线程从缓存加载
+            assert prefetcher.take(paths[1]) is None
+            # 未预取的文件
+            assert prefetcher.take(paths[2]) is None
+            prefetcher.schedule(paths[2:])
+            work_dir = prefetcher._work_dir
+        finally:
+            prefetcher.close()
+        assert not os.path.exists(work_dir) and not prefetcher._pending
+    print("[OK] 预取进程输出归一化网格，跳过已缓存的文件")
+
+
+if __name__ == "__main__":
+    test_normalize_stl_centers_and_scales()
+    test_prefetcher_runs_helpers_and_skips_cached_files()
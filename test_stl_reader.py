@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 NumPy STL 解析 (不需要Blender)
+"""
+
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from stl_reader import is_binary_stl, mesh_part_arrays, read_stl
+
+# 两个共享一条边的三角形 (单位正方形)
+SQUARE_TRIANGLES = [
+    [(0, 0, 0), (1, 0, 0), (1, 1, 0)],
+    [(0, 0, 0), (1, 1, 0), (0, 1, 0)],
+]
+
+
+def _write_binary(path, triangles, header=b"binary"):
+    with open(path, 'wb') as f:
+        f.write(header.ljust(80, b" "))
+        f.write(struct.pack("<I", len(triangles)))
+        for triangle in triangles:
+            f.write(struct.pack("<3f", 0.0, 0.0, 1.0))
+            for corner in triangle:
+                f.write(struct.pack("<3f", *corner))
+            f.write(struct.pack("<H", 0))
+
+
+def _write_ascii(path, triangles):
+    lines = ["solid square"]
+    for triangle in triangles:
+        lines += ["  facet normal 0 0 1", "    outer loop"]
+        lines += [f"      vertex {x:e} {y:e} {z:e}" for x, y, z in triangle]
+        lines += ["    endloop", "  endfacet"]
+    lines.append("endsolid square")
+    with open(path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _corners(vertices, faces):
+    return vertices[faces]
+
+
+def test_binary_and_ascii_give_the_same_welded_mesh():
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_path = os.path.join(tmp, "square_binary.stl")
+        ascii_path = os.path.join(tmp, "square_ascii.stl")
+        # 以 'solid' 开头的二进制头不能被误判为ASCII
+        _write_binary(binary_path, SQUARE_TRIANGLES, header=b"solid exported as binary")
+        _write_ascii(ascii_path, SQUARE_TRIANGLES)
+        assert is_binary_stl(binary_path) and not is_binary_stl(ascii_path)
+
+        binary_vertices, binary_faces = read_stl(binary_path)
+        ascii_vertices, ascii_faces = read_stl(ascii_path)
+        assert binary_vertices.shape == (4, 3) and binary_faces.shape == (2, 3)
+        np.testing.assert_array_equal(_corners(binary_vertices, binary_faces), np.array(SQUARE_TRIANGLES, dtype=np.float32))
+        np.testing.assert_array_equal(_corners(ascii_vertices, ascii_faces), _corners(binary_vertices, binary_faces))
+    print("[OK] 二进制与ASCII STL 解析并焊接为同一网格")
+
+
+def test_negative_zero_is_welded_and_loops_are_triangles():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "signed_zero.stl")
+        triangles = [[(0, 0, 0), (1, 0, 0), (1, 1, 0)], [(-0.0, 0, 0), (1, 1, 0), (0, 1, 0)]]
+        _write_binary(path, triangles)
+        vertices, faces = read_stl(path)
+        assert len(vertices) == 4
+        part = mesh_part_arrays(vertices, faces)
+        np.testing.assert_array_equal(part["loop_starts"], [0, 3])
+        np.testing.assert_array_equal(part["loop_vertices"], faces.ravel())
+    print("[OK] -0.0 与 0.0 焊接为同一顶点")
+
+
+def test_degenerate_triangles_are_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "degenerate.stl")
+        # 第三个三角形焊接后有重复顶点 (退化为线段)，其独有的顶点 (2, 2, 0) 也应去掉
+        _write_binary(path, SQUARE_TRIANGLES + [[(0, 0, 0), (2, 2, 0), (0, 0, 0)]])
+        vertices, faces = read_stl(path)
+        assert faces.shape == (2, 3) and len(vertices) == 4
+        assert all(len(set(face)) == 3 for face in faces.tolist())
+        np.testing.assert_array_equal(_corners(vertices, faces), np.array(SQUARE_TRIANGLES, dtype=np.float32))
+
+        point_path = os.path.join(tmp, "point.stl")
+        _write_binary(point_path, [[(1, 1, 1)] * 3])
+        try:
+            read_stl(point_path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("只有退化三角形的STL应当报错")
+    print("[OK] 焊接后顶点重复的退化三角形被丢弃")
+
+
+if __name__ == "__main__":
+    test_binary_and_ascii_give_the_same_welded_mesh()
+    test_negative_zero_is_welded_and_loops_are_triangles()
+    test_degenerate_triangles_are_dropped()
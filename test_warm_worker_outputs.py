@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻进程路径返回本次写出的文件 (不需要Blender)
+"""
+
+import os
+import tempfile
+import time
+
+from blender_mcp_integration import BlenderMCPIntegration
+
+
+class _FakeWarmWorker:
+    """代替常驻Blender进程，在输出目录写出两个文件"""
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+
+    def run_job(self, config):
+        for name in ("000001_pattern.png", "scene_parameters.json"):
+            with open(os.path.join(self.output_folder, name), 'w') as f:
+                f.write("x")
+        return {"type": "done", "success": True, "parameters_file": os.path.join(self.output_folder, "scene_parameters.json")}
+
+
+def test_warm_worker_reports_files_written_by_the_job():
+    with tempfile.TemporaryDirectory() as output_folder:
+        old_file = os.path.join(output_folder, "old_ambient.png")
+        with open(old_file, 'w') as f:
+            f.write("x")
+        past = time.time() - 3600
+        os.utime(old_file, (past, past))
+
+        integration = BlenderMCPIntegration()
+        integration._get_warm_worker = lambda script_path: _FakeWarmWorker(output_folder)
+        result = integration.generate_dataset({"paths": {"output_folder": output_folder},
+                                               "advanced": {"persistent_worker": True}})
+        assert result["success"], result
+        assert sorted(os.path.basename(path) for path in result["output_files"]) == [
+            "000001_pattern.png", "scene_parameters.json"]
+        assert integration.temp_config_file is None
+    print("[OK] 常驻进程路径返回本次写出的文件，不写临时配置")
+
+
+if __name__ == "__main__":
+    test_warm_worker_reports_files_written_by_the_job()
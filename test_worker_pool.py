@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试STL分片逻辑 (不需要Blender)
+"""
+
+import json
+import os
+import tempfile
+
+from blender_worker_pool import BlenderWorkerPool, list_stl_files, script_supports_shards, split_into_shards
+
+
+class _RecordingIntegration:
+    """代替Blender执行：记录每个分片进程收到的 "worker" 配置段"""
+
+    def __init__(self):
+        self.worker_sections = []
+
+    def _create_blender_script(self, config_path):
+        return config_path
+
+    def _execute_blender_script(self, config_path, extra_args=None, cpu_affinity=None):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.worker_sections.append(json.load(f)["worker"])
+        return {"output_files": [], "parameters_file": ""}
+
+
+def _write_script(folder, name, source):
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
+
+
+def test_split_into_shards_covers_all_items_in_order():
+    items = [f"model_{i}.stl" for i in range(10)]
+    shards = split_into_shards(items, 3)
+
+    assert [offset for offset, _ in shards] == [0, 4, 7]
+    assert [len(shard) for _, shard in shards] == [4, 3, 3]
+    # 按偏移量拼接后必须与原始顺序一致，保证全局编号确定
+    rebuilt = []
+    for offset, shard in shards:
+        assert items[offset:offset + len(shard)] == shard
+        rebuilt.extend(shard)
+    assert rebuilt == items
+    print("[OK] 分片覆盖全部STL且顺序不变")
+
+
+def test_split_into_shards_drops_empty_shards():
+    shards = split_into_shards(["a.stl", "b.stl"], 8)
+    assert shards == [(0, ["a.stl"]), (1, ["b.stl"])]
+    assert split_into_shards([], 4) == []
+    print("[OK] 进程数多于STL时不产生空分片")
+
+
+def test_list_stl_files_is_sorted():
+    with tempfile.TemporaryDirectory() as folder:
+        for name in ("c.stl", "a.stl", "b.stl", "notes.txt"):
+            open(os.path.join(folder, name), 'w').close()
+        names = [os.path.basename(p) for p in list_stl_files(folder)]
+    assert names == ["a.stl", "b.stl", "c.stl"]
+    print("[OK] STL列表排序与Blender脚本一致")
+
+
+def test_two_shards_render_disjoint_stl_sets():
+    with tempfile.TemporaryDirectory() as folder:
+        script = _write_script(folder, "sharded.py", "SUPPORTS_WORKER_SHARDS = True\n")
+        stl_files = [os.path.join(folder, f"model_{i}.stl") for i in range(5)]
+        integration = _RecordingIntegration()
+        BlenderWorkerPool(integration, 2, threads_per_worker=1).run(
+            {"advanced": {"script_path": script}}, stl_files=stl_files)
+
+    sections = sorted(integration.worker_sections, key=lambda worker: worker["shard_index"])
+    assert [worker["shard_count"] for worker in sections] == [2, 2]
+    first, second = (set(worker["stl_files"]) for worker in sections)
+    assert first and second and not first & second
+    assert first | second == set(stl_files)
+    assert len({worker["run_id"] for worker in sections}) == 1
+    print("[OK] 两个分片进程的STL集合互不重叠且覆盖全部STL")
+
+
+def test_pool_refuses_scripts_without_worker_support():
+    here = os.path.dirname(os.path.abspath(__file__))
+    assert script_supports_shards(os.path.join(here, "深度图数据集_v7.py"))
+    assert not script_supports_shards(os.path.join(here, "深度图数据集_v6.py"))
+    with tempfile.TemporaryDirectory() as folder:
+        script = _write_script(folder, "legacy.py", "# SUPPORTS_WORKER_SHARDS = True\n")
+        integration = _RecordingIntegration()
+        try:
+            BlenderWorkerPool(integration, 2).run({"advanced": {"script_path": script}},
+                                                  stl_files=["a.stl", "b.stl"])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("不支持分片的脚本应当报错")
+        assert integration.worker_sections == []
+    print("[OK] 不读取worker配置段的脚本被拒绝分片")
+
+
+if __name__ == "__main__":
+    test_split_into_shards_covers_all_items_in_order()
+    test_split_into_shards_drops_empty_shards()
+    test_list_stl_files_is_sorted()
+    test_two_shards_render_disjoint_stl_sets()
+    test_pool_refuses_scripts_without_worker_support()
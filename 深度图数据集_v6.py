@@ -128,32 +128,41 @@ def setup_projector(projector_config):
     return projector
 
 def load_patterns(pattern_path):
-    """从指定路径加载所有图像作为投影图案"""
+    """从指定路径加载所有图像作为投影图案，返回可加载的图案文件路径 (渲染时经缓存取图像)"""
     print(f"从路径加载投影图案: {pattern_path}", flush=True)
-    pattern_images = []
+    pattern_files = []
     if not os.path.isdir(pattern_path):
         print(f"错误: 投影图案路径不存在或不是一个目录: {pattern_path}", flush=True)
-        return pattern_images
+        return pattern_files
         
     # 支持多种图像格式
     supported_formats = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
     
-    for img_name in sorted(os.listdir(pattern_path)):
-        if img_name.lower().endswith(supported_formats):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    import pattern_cache
+
+    # 按内容哈希缓存：同一进程内每个图案只加载一次 (文件内容变化时哈希不同，会重新加载)
+    cache = pattern_cache.get_pattern_cache()
+    candidate_paths = [os.path.join(pattern_path, img_name) for img_name in sorted(os.listdir(pattern_path))
+                       if img_name.lower().endswith(supported_formats)]
+    try:
+        cache.get_many(candidate_paths)
+        pattern_files = candidate_paths
+    except Exception as e:
+        # 有文件无法加载时逐个检查并跳过坏文件
+        print(f"警告: 批量加载投影图案失败 ({e})，逐个检查图案文件。", flush=True)
+        for img_path in candidate_paths:
             try:
-                img_path = os.path.join(pattern_path, img_name)
-                # 检查图像是否已加载
-                img = bpy.data.images.get(img_name)
-                if not img:
-                    img = bpy.data.images.load(img_path)
-                else:
-                    img.reload() # 重新加载以确保是最新版本
-                pattern_images.append(img)
-                print(f"  - 成功加载图案: {img_name}", flush=True)
-            except Exception as e:
-                print(f"警告: 加载投影图案失败: {img_name}. 错误: {e}", flush=True)
-    
-    if not pattern_images:
+                cache.get(img_path)
+                pattern_files.append(img_path)
+            except Exception as file_error:
+                print(f"警告: 加载投影图案失败: {os.path.basename(img_path)}. 错误: {file_error}", flush=True)
+    for img_path in pattern_files:
+        print(f"  - 成功加载图案: {os.path.basename(img_path)}", flush=True)
+
+    if not pattern_files:
         # 如果没有找到支持格式的图像，尝试列出目录内容进行调试
         try:
             files = os.listdir(pattern_path)
@@ -161,16 +170,30 @@ def load_patterns(pattern_path):
         except Exception as e:
             print(f"  - 无法列出目录内容: {e}", flush=True)
             
-    print(f"共加载 {len(pattern_images)} 个图案。", flush=True)
-    return pattern_images
+    print(f"共加载 {len(pattern_files)} 个图案。", flush=True)
+    return pattern_files
 
-def load_stl(stl_path):
-    """加载单个STL文件"""
+def load_stl(stl_path, backend="operator"):
+    """加载单个STL文件 (backend: "operator" 使用 stl_import, "numpy" 使用 stl_reader 解析)"""
     print(f"加载STL文件: {stl_path}", flush=True)
     if not os.path.exists(stl_path):
         print(f"错误: STL文件不存在: {stl_path}", flush=True)
         return None
     
+    if backend == "numpy":
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        if script_dir not in sys.path:
+            sys.path.insert(0, script_dir)
+        import stl_reader
+        try:
+            vertices, faces = stl_reader.read_stl(stl_path)
+            obj = stl_reader.build_stl_object(os.path.splitext(os.path.basename(stl_path))[0],
+                                              vertices, faces, bpy.context.collection)
+            print(f"  - 成功解析: {os.path.basename(stl_path)} ({len(faces)} 个三角形)", flush=True)
+            return obj
+        except (OSError, ValueError) as e:
+            print(f"  - 警告: NumPy解析STL失败，回退到 stl_import: {e}", flush=True)
+
     bpy.ops.wm.stl_import(filepath=stl_path)
     print(f"  - 成功导入: {os.path.basename(stl_path)}", flush=True)
     return bpy.context.selected_objects[0]
@@ -218,14 +241,19 @@ def render_ambient(obj, output_path, stl_file):
     print(f"  - 环境光渲染完成。", flush=True)
 
 
-def render_projection(obj, projector, pattern_images, output_path, stl_file, angle):
+def render_projection(obj, projector, pattern_files, output_path, stl_file, angle):
     """为单个物体在特定角度下渲染所有投影图案"""
+    import pattern_cache
+
     print(f"    开始渲染投影，角度: {angle}", flush=True)
     projector.hide_render = False
     
     base_name = os.path.splitext(stl_file)[0]
+    # 每张图案在使用前才从缓存取出，超出内存上限时按LRU淘汰其余图案
+    cache = pattern_cache.get_pattern_cache()
     
-    for i, pattern_image in enumerate(pattern_images):
+    for i, pattern_file in enumerate(pattern_files):
+        pattern_image = cache.get(pattern_file)
         # 设置投影图案
         node_tree = projector.data.node_tree
         tex_image_node = node_tree.nodes.get('Image Texture')
@@ -271,6 +299,7 @@ def main_script_logic(config_path):
         advanced_config = config.get("advanced", {})
 
         rotation_angles = advanced_config.get('rotation_angles', [0, 45, 90])
+        stl_reader_backend = advanced_config.get('stl_reader', "operator")
         render_samples = render_config.get('samples', 128)
         resolution = render_config.get('resolution', [1920, 1080])
         resolution_x, resolution_y = resolution
@@ -327,8 +356,8 @@ def main_script_logic(config_path):
 
         # --- 3. 加载资产 ---
         print("--- 开始加载资产 ---", flush=True)
-        pattern_images = load_patterns(pattern_path)
-        if not pattern_images:
+        pattern_files = load_patterns(pattern_path)
+        if not pattern_files:
             print("错误：未能加载任何投影图案，脚本终止。", flush=True)
             return
 
@@ -344,7 +373,7 @@ def main_script_logic(config_path):
         total_files = len(stl_files)
         for i, stl_file in enumerate(stl_files):
             print(f"--- 开始处理文件 {i+1}/{total_files}: {stl_file} ---", flush=True)
-            obj = load_stl(os.path.join(stl_model_path, stl_file))
+            obj = load_stl(os.path.join(stl_model_path, stl_file), stl_reader_backend)
             if not obj:
                 print(f"  警告：加载STL文件失败: {stl_file}，跳过此文件。", flush=True)
                 continue
@@ -362,7 +391,7 @@ def main_script_logic(config_path):
                 print(f"    - 物体Z轴旋转设置为 {angle} 度", flush=True)
 
                 # 渲染投影
-                render_projection(obj, projector, pattern_images, output_path, stl_file, angle)
+                render_projection(obj, projector, pattern_files, output_path, stl_file, angle)
             
             # 循环结束后重置旋转
             obj.rotation_euler.z = 0
@@ -1,11 +1,38 @@
 import bpy
 import os
+import contextlib
+import copy
 import math
+import functools
 import glob
 from mathutils import Vector, Matrix, Quaternion
 import traceback
 import random
 import json
+import sys
+import time
+
+# 直接用 blender --python 运行时，同目录下的辅助模块也能被导入
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPT_DIR)
+
+import async_image_writer
+import dataset_shards
+import generation_manifest
+import mesh_cache
+import mesh_decimation
+import mesh_utils
+import output_naming
+import pattern_cache
+import pattern_generator
+import reference_plane_depth
+import render_cache
+import render_profiles
+import sample_index
+import sample_metadata
+import stl_prefetch
+import stl_reader
 
 
 # --- 预期的对象名称常量 ---
@@ -19,6 +46,18 @@ PROJECTOR_IMAGE_TEXTURE_NODE_NAME = "Image Texture"
 PROJECTOR_EMISSION_NODE_NAME = "Emission"
 ADDON_PROJECTOR_OPERATOR_NAME = "projector.create"
 REFERENCE_PLANE_NAME = "ReferencePlane"
+DEPTH_OUTPUT_NODE_NAME = "DepthOutputNode"
+# 只依赖几何体的合成器输出节点：每个 (STL, 视角) 用深度渲染配置单独写一次，其余渲染时全部静音
+GEOMETRY_OUTPUT_NODE_NAMES = (DEPTH_OUTPUT_NODE_NAME,)
+PROJECTOR_PASS_OUTPUT_NODE_NAME = "ProjectorPassOutputNode"
+AMBIENT_PASS_OUTPUT_NODE_NAME = "AmbientPassOutputNode"
+PROJECTOR_UV_AOV_NAME = "ProjectorUV"
+PROJECTOR_UV_NODE_GROUP_NAME = "ProjectorUVCoordinates"
+PROJECTOR_UV_AOV_NODE_NAME = "ProjectorUVAOV"
+PROJECTOR_WHITE_IMAGE_NAME = "ProjectorWhitePattern"
+AMBIENT_LIGHT_GROUP_OUTPUT_NODE_NAME = "AmbientLightGroupOutputNode"
+WORLD_LIGHT_GROUP_NAME = "world"
+PROJECTOR_LIGHT_GROUP_NAME = "projector"
 
 
 # ############################################################################
@@ -41,6 +80,7 @@ PROJECTOR_PARENT_DEFAULT_SCALE = (1.0, 1.0, 1.0)
 
 STL_TARGET_LOCATION = (60, 0.0, 0.0) # 原: (0.6, 0.0, 0.0)
 STL_TARGET_LARGEST_DIMENSION = 150.0 # 原: 1.5
+REFERENCE_PLANE_HALF_SIZE = 1000.0 # 原: 10.0
 # ############################################################################
 
 
@@ -52,6 +92,7 @@ depth_output_dir_abs = r"E:\zr_network\blender\output\depth"
 HDRI_ENVIRONMENT_MAP_PATH = r"E:\zr_network\blender\HDRI\brown_photostudio_02_4k.hdr"
 AMBIENT_RGB_OUTPUT_DIR = r"E:\zr_network\blender\output\ambient"
 PARAMS_OUTPUT_FILE = os.path.join(os.path.dirname(output_dir), "scene_parameters.json")
+PROJECTOR_PASS_OUTPUT_DIR = os.path.join(os.path.dirname(output_dir), "projector_pass")
 
 
 # --- 核心修改：受控的随机化参数 ---
@@ -84,8 +125,843 @@ dl_filter_type = 'GAUSSIAN'
 dl_filter_width = 1.5
 
 
+# 渲染质量档位 (见 render_profiles.py)：draft / preview 用于在正式运行前快速验证
+# 新的STL文件夹或图案集；production 使用上面的分辨率与采样数。
+RENDER_QUALITY_PROFILE = render_profiles.DEFAULT_PROFILE_NAME
+
+
+# 只需要几何通道 (深度等) 时使用的Cycles设置：1个采样、近似无宽度的盒式滤波
+# (每个像素只取中心一条光线，轮廓处不会混合前后景深度)、无反弹、无降噪。
+DEPTH_RENDER_PROFILE = {
+    "samples": 1,
+    "pixel_filter_type": 'BOX',
+    "filter_width": 0.01,
+    "max_bounces": 0,
+    "use_adaptive_sampling": False,
+    "use_denoising": False,
+}
+
+
+# 动画模式：每个视角的全部图案通过一次 render(animation=True) 渲染，
+# 由 frame_change_pre 处理器逐帧切换投影图案，并启用持久数据复用场景。
+RENDER_PATTERNS_AS_ANIMATION = False
+
+
+# 持久渲染数据：同一视角内的渲染之间只有投影图案纹理变化，Cycles 保留已同步的场景和BVH；
+# 导入新网格或切换视角时通过关闭再开启 use_persistent_data 使其失效。
+PERSISTENT_RENDER_DATA = True
+
+
+# 异步图像编码：图案/环境光静帧渲染时不写文件，从 Viewer 节点取出合成后的线性像素，
+# 由后台进程编码PNG，渲染线程不再等待压缩；排队帧数达到上限时渲染等待编码 (背压)。
+# 编码按 'Standard' 视图变换进行，因此该模式下视图变换固定为 'Standard'。动画模式的图案仍由Blender写出。
+ASYNC_IMAGE_WRITE = False
+ASYNC_WRITE_WORKERS = 2
+ASYNC_WRITE_MAX_PENDING = 8
+ASYNC_VIEWER_NODE_NAME = "AsyncWriteViewer"
+
+
+# 输出格式："files" 每个输出一个文件；"tar" 把每个 (STL, 视角) 样本的全部输出和元数据打包进
+# 固定大小的tar分片 (输出根目录/shards)。Blender 仍先写出文件，分片落盘并记入索引后删除零散文件。
+OUTPUT_FORMAT = "files"
+SAMPLES_PER_SHARD = dataset_shards.DEFAULT_SAMPLES_PER_SHARD
+
+
+# 样本索引：每个 (STL, 视角) 样本在输出根目录的 samples.sqlite 中有一行，记录全部输出文件位置与随机参数，
+# 按批次事务写入 (WAL 模式，多个工作进程可同时写入)。
+USE_SAMPLE_INDEX = True
+
+
+# 每个渲染视角的全部随机值 (功率、环境光、材质等) 与放置后的物体 matrix_world 追加写入
+# sample_metadata_w###.jsonl (缓冲写入，按间隔 fsync)，可用 sample_metadata.load_sample_metadata 整体读入 NumPy。
+SAMPLE_METADATA_STREAM = True
+METADATA_FSYNC_INTERVAL_S = sample_metadata.DEFAULT_FSYNC_INTERVAL
+
+
+# 参考平面深度图由 scene_parameters.json 解析计算 (射线-平面求交，按参数哈希缓存)，
+# 只有校验失败时才回退到渲染。
+ANALYTIC_REFERENCE_DEPTH = True
+
+
+# 图案合成模式：每个视角只渲染一次投影通道 (白色图案下的辐照度 + 投影仪UV AOV)
+# 和一次线性环境光，图案图像由 pattern_synthesis.py 离线合成，K 次渲染变为 1 次。
+PATTERN_SYNTHESIS_MODE = False
+
+
+# Cycles 光照组：世界光与投影仪分属不同光照组，环境光图直接取自图案渲染的
+# 世界光照组通道，省去每个视角单独的环境光渲染。Blender 不支持光照组时自动回退。
+USE_LIGHT_GROUPS = True
+
+
+# 断点续跑：每个完成的渲染单元 (深度/图案/环境光/投影通道) 追加写入输出根目录下的
+# manifest_shard###.jsonl；续跑时跳过清单中已完成的单元，编号由 compute_render_ids 确定不变。
+RESUME_MODE = False
+
+
+# 文件名在写出时确定 (不再事后重命名)：每次运行在输出根目录的 runs.json 中占用一段连续的视角/图案编号。
+# 追加模式从已有运行之后继续编号；续跑沿用上一次运行的编号区间。
+APPEND_MODE = False
+RUN_ID = None
+RUN_STL_COUNT = None
+
+
+# 渲染缓存：每个输出按内容哈希 (STL/图案字节、相机/投影仪位姿、视角、随机参数、渲染档位) 缓存，
+# 重新运行 (例如新增图案或STL) 时未变化的输出直接从缓存复制，缓存按大小做LRU淘汰。
+USE_RENDER_CACHE = False
+RENDER_CACHE_DIR = render_cache.DEFAULT_CACHE_DIR
+RENDER_CACHE_MAX_GB = 20.0
+# 修改影响渲染结果的代码时递增，使旧缓存失效
+RENDER_CACHE_VERSION = 2
+# 每个STL的随机参数 (材质/投影仪功率/环境光)。None (默认) 时每次运行重新随机抽取；
+# 设置种子后由种子与STL内容哈希确定，重新运行时保持不变，渲染缓存和断点续跑才能复用结果。
+SAMPLE_RANDOM_SEED = None
+
+
+# 网格缓存：STL导入、居中和缩放后的几何按文件哈希与目标尺寸存为 .npz，
+# 之后的运行直接用 foreach_set 构建网格，不再调用 stl_import。
+USE_MESH_CACHE = True
+MESH_CACHE_DIR = mesh_cache.DEFAULT_CACHE_DIR
+# STL读取方式："operator" 使用 bpy.ops.wm.stl_import (默认，与 v6 一致)；
+# "numpy" 由 stl_reader 解析并用 foreach_set 建网格 (解析失败时回退，STL预取需要此方式)。
+STL_READER_BACKEND = "operator"
+# 网格简化：按相机参数估计模型最近处一个像素的尺寸，对三角形数超过下限的模型做顶点聚类简化，
+# 屏幕空间误差不超过此像素数；0 表示关闭。简化结果作为网格缓存的变体保存。
+MESH_DECIMATION_ERROR_PX = 0.0
+MESH_DECIMATION_MIN_TRIANGLES = 100000
+# STL预取：渲染当前模型时，由辅助进程提前解析并归一化之后的这么多个STL (仅 "numpy" 读取方式)；0 表示关闭。
+STL_PREFETCH_COUNT = 2
+# 图案纹理缓存：每个图案文件按内容哈希在进程内只加载一次，只含8位层次的16位图案转为8位存储，
+# 超过上限 (MB) 时删除最久未使用的图案。
+PATTERN_CACHE_MAX_MB = 2048
+# 图案来源："folder" 读取 image_pattern_folder 中的图像；"phase_shift" / "heterodyne" / "gray_code" / "binary"
+# 由 pattern_generator 在内存中生成 (参数见 pattern_generator.DEFAULT_PATTERN_PARAMS)，不读写图案文件。
+PATTERN_SOURCE = "folder"
+PATTERN_GENERATOR_PARAMS = dict(pattern_generator.DEFAULT_PATTERN_PARAMS)
+
+
+# --- 每个STL的拍摄视角 (度) ---
+#VIEW_Y_ANGLES_DEG = [0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0]
+#VIEW_Z_ANGLES_DEG = [0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0]
+VIEW_Y_ANGLES_DEG = [0.0, 45.0]
+VIEW_Z_ANGLES_DEG = [0.0]
+
+
+# --- 多进程分片参数 (由编排器通过配置文件中的 "worker" 段写入) ---
+# 单进程运行时保持默认值：处理整个STL文件夹，索引从0开始。
+# 编排器据此标记确认本脚本会读取 "worker" 段，不支持的脚本拒绝分片。
+SUPPORTS_WORKER_SHARDS = True
+WORKER_SHARD_INDEX = 0
+WORKER_SHARD_COUNT = 1
+WORKER_STL_FILES = None
+WORKER_STL_INDEX_OFFSET = 0
+# Cycles 渲染分块大小 (像素)；None 表示保持Blender默认值。由自动调优结果写入。
+RENDER_TILE_SIZE = None
+
+# apply_config_overrides 可能修改的模块级设置。导入时的值即默认值，
+# 常驻进程每个任务先恢复默认值，上一个任务的设置不会带入下一个任务。
+CONFIG_GLOBAL_NAMES = (
+    "output_dir", "image_pattern_folder", "stl_model_folder", "depth_output_dir_abs",
+    "AMBIENT_RGB_OUTPUT_DIR", "PARAMS_OUTPUT_FILE", "PROJECTOR_PASS_OUTPUT_DIR", "STL_TARGET_LARGEST_DIMENSION",
+    "render_width", "render_height", "render_samples", "RENDER_PATTERNS_AS_ANIMATION", "PATTERN_SYNTHESIS_MODE",
+    "USE_LIGHT_GROUPS", "PERSISTENT_RENDER_DATA", "RENDER_QUALITY_PROFILE", "RESUME_MODE", "APPEND_MODE",
+    "ASYNC_IMAGE_WRITE", "ASYNC_WRITE_WORKERS", "ASYNC_WRITE_MAX_PENDING", "OUTPUT_FORMAT", "SAMPLES_PER_SHARD",
+    "USE_SAMPLE_INDEX", "SAMPLE_METADATA_STREAM", "METADATA_FSYNC_INTERVAL_S",
+    "USE_RENDER_CACHE", "RENDER_CACHE_DIR", "RENDER_CACHE_MAX_GB", "SAMPLE_RANDOM_SEED",
+    "USE_MESH_CACHE", "MESH_CACHE_DIR", "STL_READER_BACKEND", "MESH_DECIMATION_ERROR_PX", "STL_PREFETCH_COUNT",
+    "PATTERN_CACHE_MAX_MB", "PATTERN_SOURCE", "PATTERN_GENERATOR_PARAMS",
+    "WORKER_SHARD_INDEX", "WORKER_SHARD_COUNT", "WORKER_STL_FILES", "WORKER_STL_INDEX_OFFSET", "RENDER_TILE_SIZE",
+    "RUN_ID", "RUN_STL_COUNT",
+)
+_CONFIG_DEFAULTS = {name: copy.deepcopy(globals()[name]) for name in CONFIG_GLOBAL_NAMES}
+
+
 # --- 全局变量 ---
 g_projector_internal_mapping_node = None
+g_light_groups_active = False
+g_render_profile = render_profiles.get_render_profile(render_profiles.DEFAULT_PROFILE_NAME)
+# 首次配置前场景自身的 Cycles 设置；档位中为 None 的项恢复为这些值，常驻进程中上个档位的修改不会残留
+g_scene_cycles_defaults = None
+g_render_timing_stats = None
+g_generation_manifest = None
+g_render_cache = None
+g_render_cache_signature = None
+g_stl_prefetcher = None
+g_generated_patterns = None
+g_image_writer = None
+g_shard_writer = None
+g_run_naming = None
+g_sample_index = None
+g_metadata_stream = None
+# render_stl_files 打开、由 finalize_outputs 关闭的输出 (分片、样本索引、完成清单)
+g_open_outputs = None
+
+
+class RenderTimingStats:
+    """
+    Wall time of every render (render_pre -> render_post, so each frame of an
+    animation render counts), grouped by label. The first render of each label
+    after a persistent-data invalidation includes the full scene sync and BVH
+    build, so comparing 'first' and 'rest' averages shows what persistence saves.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.label = "render"
+        self._render_start = None
+        # 上次失效后已经渲染过的标签；每种渲染 (结构光、环境光、深度...) 各自记一次 'first'
+        self._labels_since_invalidation = set()
+
+    def mark_invalidated(self):
+        self._labels_since_invalidation.clear()
+
+    def on_render_pre(self, scene, *_):
+        self._render_start = time.perf_counter()
+
+    def on_render_post(self, scene, *_):
+        if self._render_start is None:
+            return
+        elapsed = time.perf_counter() - self._render_start
+        self._render_start = None
+        phase = "rest" if self.label in self._labels_since_invalidation else "first"
+        self._labels_since_invalidation.add(self.label)
+        self.samples.setdefault((self.label, phase), []).append(elapsed)
+
+    def report(self):
+        if not self.samples:
+            return
+        print(f"\n--- 渲染耗时统计 (持久数据: {'开' if PERSISTENT_RENDER_DATA else '关'}) ---")
+        for (label, phase), times in sorted(self.samples.items()):
+            phase_text = "失效后首次" if phase == "first" else "后续"
+            print(f"   {label:<15} {phase_text:<6} {len(times):>5} 次, 平均 {sum(times) / len(times):.3f} s, 合计 {sum(times):.1f} s")
+
+
+def install_render_timing_stats():
+    """(Re)installs the render_pre/render_post handlers of a fresh RenderTimingStats."""
+    global g_render_timing_stats
+    if g_render_timing_stats is not None:
+        if g_render_timing_stats.on_render_pre in bpy.app.handlers.render_pre:
+            bpy.app.handlers.render_pre.remove(g_render_timing_stats.on_render_pre)
+        if g_render_timing_stats.on_render_post in bpy.app.handlers.render_post:
+            bpy.app.handlers.render_post.remove(g_render_timing_stats.on_render_post)
+    g_render_timing_stats = RenderTimingStats()
+    bpy.app.handlers.render_pre.append(g_render_timing_stats.on_render_pre)
+    bpy.app.handlers.render_post.append(g_render_timing_stats.on_render_post)
+    return g_render_timing_stats
+
+
+def set_render_timing_label(label):
+    if g_render_timing_stats is not None:
+        g_render_timing_stats.label = label
+
+
+def invalidate_persistent_render_data(reason):
+    """Drops Cycles' persistent session data so the next render re-syncs the whole scene."""
+    scene = bpy.context.scene
+    if g_render_timing_stats is not None:
+        g_render_timing_stats.mark_invalidated()
+    if not scene.render.use_persistent_data:
+        return
+    # 关闭时 Blender 会释放持久数据，随后重新开启
+    scene.render.use_persistent_data = False
+    scene.render.use_persistent_data = True
+    print(f"   持久渲染数据已失效 ({reason})。")
+
+
+def load_script_config(config_path):
+    """Loads the JSON config written by the GUI/orchestrator, or returns {}."""
+    if not config_path:
+        return {}
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        print(f"成功加载配置文件: {config_path}")
+        return config
+    except Exception as e:
+        print(f"错误: 加载配置文件 '{config_path}' 失败: {e}")
+        return {}
+
+
+def reset_config_defaults():
+    """Restores every setting apply_config_overrides can change to its import-time default."""
+    globals().update(copy.deepcopy(_CONFIG_DEFAULTS))
+
+
+def apply_config_overrides(config):
+    """Overrides the module-level defaults with values from the GUI config (keys absent from config keep their defaults)."""
+    global output_dir, image_pattern_folder, stl_model_folder, depth_output_dir_abs
+    global AMBIENT_RGB_OUTPUT_DIR, PARAMS_OUTPUT_FILE, PROJECTOR_PASS_OUTPUT_DIR, STL_TARGET_LARGEST_DIMENSION
+    global render_width, render_height, render_samples, RENDER_PATTERNS_AS_ANIMATION, PATTERN_SYNTHESIS_MODE
+    global USE_LIGHT_GROUPS, PERSISTENT_RENDER_DATA, RENDER_QUALITY_PROFILE, RESUME_MODE, APPEND_MODE
+    global ASYNC_IMAGE_WRITE, ASYNC_WRITE_WORKERS, ASYNC_WRITE_MAX_PENDING, OUTPUT_FORMAT, SAMPLES_PER_SHARD
+    global USE_SAMPLE_INDEX, SAMPLE_METADATA_STREAM, METADATA_FSYNC_INTERVAL_S
+    global USE_RENDER_CACHE, RENDER_CACHE_DIR, RENDER_CACHE_MAX_GB, SAMPLE_RANDOM_SEED
+    global USE_MESH_CACHE, MESH_CACHE_DIR, STL_READER_BACKEND, MESH_DECIMATION_ERROR_PX, STL_PREFETCH_COUNT
+    global PATTERN_CACHE_MAX_MB, PATTERN_SOURCE, PATTERN_GENERATOR_PARAMS
+    global WORKER_SHARD_INDEX, WORKER_SHARD_COUNT, WORKER_STL_FILES, WORKER_STL_INDEX_OFFSET, RENDER_TILE_SIZE
+    global RUN_ID, RUN_STL_COUNT
+
+    reset_config_defaults()
+    paths = config.get("paths", {})
+    if paths.get("stl_folder"):
+        stl_model_folder = paths["stl_folder"]
+    if paths.get("pattern_folder"):
+        image_pattern_folder = paths["pattern_folder"]
+    if paths.get("output_folder"):
+        output_root = paths["output_folder"]
+        output_dir = os.path.join(output_root, "pattern")
+        depth_output_dir_abs = os.path.join(output_root, "depth")
+        AMBIENT_RGB_OUTPUT_DIR = os.path.join(output_root, "ambient")
+        PARAMS_OUTPUT_FILE = os.path.join(output_root, "scene_parameters.json")
+        PROJECTOR_PASS_OUTPUT_DIR = os.path.join(output_root, "projector_pass")
+
+    projector = config.get("projector", {})
+    if projector.get("pattern_source"):
+        PATTERN_SOURCE = projector["pattern_source"]
+    if projector.get("pattern_params"):
+        PATTERN_GENERATOR_PARAMS = dict(pattern_generator.DEFAULT_PATTERN_PARAMS, **projector["pattern_params"])
+
+    render = config.get("render", {})
+    if "resolution" in render and len(render["resolution"]) == 2:
+        render_width, render_height = int(render["resolution"][0]), int(render["resolution"][1])
+    if "samples" in render:
+        render_samples = int(render["samples"])
+    if "pattern_animation" in render:
+        RENDER_PATTERNS_AS_ANIMATION = bool(render["pattern_animation"])
+    if "pattern_synthesis" in render:
+        PATTERN_SYNTHESIS_MODE = bool(render["pattern_synthesis"])
+    if "light_groups" in render:
+        USE_LIGHT_GROUPS = bool(render["light_groups"])
+    if "persistent_data" in render:
+        PERSISTENT_RENDER_DATA = bool(render["persistent_data"])
+    if "async_write" in render:
+        ASYNC_IMAGE_WRITE = bool(render["async_write"])
+    if "async_write_workers" in render:
+        ASYNC_WRITE_WORKERS = int(render["async_write_workers"])
+    if "async_write_queue" in render:
+        ASYNC_WRITE_MAX_PENDING = int(render["async_write_queue"])
+    if render.get("quality_profile"):
+        RENDER_QUALITY_PROFILE = render["quality_profile"]
+
+    advanced = config.get("advanced", {})
+    if "stl_max_size" in advanced:
+        STL_TARGET_LARGEST_DIMENSION = float(advanced["stl_max_size"])
+    if "resume" in advanced:
+        RESUME_MODE = bool(advanced["resume"])
+    if "append" in advanced:
+        APPEND_MODE = bool(advanced["append"])
+    if "render_cache" in advanced:
+        USE_RENDER_CACHE = bool(advanced["render_cache"])
+    if advanced.get("render_cache_dir"):
+        RENDER_CACHE_DIR = advanced["render_cache_dir"]
+    if "render_cache_max_gb" in advanced:
+        RENDER_CACHE_MAX_GB = float(advanced["render_cache_max_gb"])
+    if advanced.get("random_seed") not in (None, ""):
+        SAMPLE_RANDOM_SEED = int(advanced["random_seed"])
+    if "mesh_cache" in advanced:
+        USE_MESH_CACHE = bool(advanced["mesh_cache"])
+    if advanced.get("mesh_cache_dir"):
+        MESH_CACHE_DIR = advanced["mesh_cache_dir"]
+    if advanced.get("stl_reader"):
+        STL_READER_BACKEND = advanced["stl_reader"]
+    if "decimation_error_px" in advanced:
+        MESH_DECIMATION_ERROR_PX = float(advanced["decimation_error_px"])
+    if "stl_prefetch" in advanced:
+        STL_PREFETCH_COUNT = int(advanced["stl_prefetch"])
+    if "pattern_cache_max_mb" in advanced:
+        PATTERN_CACHE_MAX_MB = float(advanced["pattern_cache_max_mb"])
+    if advanced.get("output_format"):
+        OUTPUT_FORMAT = advanced["output_format"]
+    if "samples_per_shard" in advanced:
+        SAMPLES_PER_SHARD = int(advanced["samples_per_shard"])
+    if "sample_index" in advanced:
+        USE_SAMPLE_INDEX = bool(advanced["sample_index"])
+    if "metadata_stream" in advanced:
+        SAMPLE_METADATA_STREAM = bool(advanced["metadata_stream"])
+    if "metadata_fsync_interval" in advanced:
+        METADATA_FSYNC_INTERVAL_S = float(advanced["metadata_fsync_interval"])
+
+    worker = config.get("worker", {})
+    if worker:
+        WORKER_SHARD_INDEX = int(worker.get("shard_index", 0))
+        WORKER_SHARD_COUNT = int(worker.get("shard_count", 1))
+        WORKER_STL_FILES = worker.get("stl_files")
+        WORKER_STL_INDEX_OFFSET = int(worker.get("stl_index_offset", 0))
+        RENDER_TILE_SIZE = int(worker["tile_size"]) if worker.get("tile_size") else None
+        RUN_ID = worker.get("run_id")
+        RUN_STL_COUNT = int(worker["stl_count"]) if worker.get("stl_count") else None
+        print(f"工作进程分片 {WORKER_SHARD_INDEX + 1}/{WORKER_SHARD_COUNT}: "
+              f"{len(WORKER_STL_FILES or [])} 个STL, 全局索引起点 {WORKER_STL_INDEX_OFFSET}")
+
+
+def compute_render_ids(global_stl_idx, view_idx, views_per_stl, pattern_count):
+    """
+    Returns (first_pattern_id, ambient_id) for one (STL, view).
+
+    IDs are derived from the global STL index and the run's id block instead
+    of running counters, so every worker of a sharded run produces the same
+    numbering a single process would, and the ids written into the file names
+    are final. A skipped STL leaves a gap.
+    """
+    if g_run_naming is None:
+        return output_naming.render_ids(global_stl_idx, view_idx, views_per_stl, pattern_count)
+    return g_run_naming.render_ids(global_stl_idx, view_idx)
+
+
+def open_run_naming(stl_count, views_per_stl, pattern_count):
+    """Assigns this run's view/pattern id block (runs.json is written by worker 0 only)."""
+    global g_run_naming
+
+    if RESUME_MODE:
+        mode = "resume"
+    elif APPEND_MODE:
+        mode = "append"
+    else:
+        mode = "new"
+    g_run_naming = output_naming.open_run(
+        os.path.dirname(PARAMS_OUTPUT_FILE), RUN_ID, RUN_STL_COUNT or stl_count, views_per_stl, pattern_count,
+        mode=mode, write=WORKER_SHARD_INDEX == 0)
+    print(f"运行 {g_run_naming.run_id} ({mode}): 视角编号 {g_run_naming.view_id_offset + 1}-{g_run_naming.view_id_end}, "
+          f"图案编号 {g_run_naming.pattern_id_offset + 1}-{g_run_naming.pattern_id_end}")
+    return g_run_naming
+
+
+def open_generation_manifest(pattern_count, views_per_stl):
+    """Opens this shard's completion manifest; in resume mode loads what earlier runs finished."""
+    global g_generation_manifest
+
+    layout = {
+        "pattern_count": pattern_count,
+        "views_per_stl": views_per_stl,
+        "pattern_synthesis": PATTERN_SYNTHESIS_MODE,
+    }
+    g_generation_manifest = generation_manifest.GenerationManifest(
+        os.path.dirname(PARAMS_OUTPUT_FILE), layout,
+        shard_index=WORKER_SHARD_INDEX, shard_count=WORKER_SHARD_COUNT, resume=RESUME_MODE)
+    if RESUME_MODE:
+        print(f"断点续跑：清单中已有 {g_generation_manifest.completed_count} 个完成的渲染单元")
+    return g_generation_manifest
+
+
+def close_generation_manifest():
+    global g_generation_manifest
+
+    if g_generation_manifest is not None:
+        g_generation_manifest.close()
+        g_generation_manifest = None
+
+
+def open_render_cache(scene_ctx):
+    """Opens the render cache and hashes the scene state shared by every render of this run."""
+    global g_render_cache, g_render_cache_signature
+
+    if not USE_RENDER_CACHE:
+        g_render_cache = None
+        return None
+    g_render_cache = render_cache.RenderCache(RENDER_CACHE_DIR, int(RENDER_CACHE_MAX_GB * 1024 ** 3))
+    g_render_cache_signature = scene_cache_signature(scene_ctx)
+    print(f"渲染缓存已启用: {RENDER_CACHE_DIR} (上限 {RENDER_CACHE_MAX_GB} GB)")
+    if SAMPLE_RANDOM_SEED is None:
+        print("   提示：未设置随机种子，每次运行的随机参数不同，只有深度渲染能命中缓存。")
+    return g_render_cache
+
+
+def scene_cache_signature(scene_ctx):
+    """Camera, projector, reference plane, environment and render/output settings that every cached output depends on."""
+    scene = bpy.context.scene
+    image_settings = scene.render.image_settings
+    hdri_path = bpy.path.abspath(HDRI_ENVIRONMENT_MAP_PATH) if HDRI_ENVIRONMENT_MAP_PATH else None
+    camera_obj = scene_ctx["scanner_cam_obj"]
+    projector_obj = scene_ctx["projector_light_emitter_obj"]
+
+    def matrix_rows(obj):
+        return [list(row) for row in obj.matrix_world] if obj else None
+
+    return {
+        "version": RENDER_CACHE_VERSION,
+        "camera": {
+            "matrix_world": matrix_rows(camera_obj),
+            "lens": camera_obj.data.lens,
+            "sensor": [camera_obj.data.sensor_width, camera_obj.data.sensor_height, camera_obj.data.sensor_fit],
+            "shift": [camera_obj.data.shift_x, camera_obj.data.shift_y],
+            "clip": [camera_obj.data.clip_start, camera_obj.data.clip_end],
+        },
+        "projector": {
+            "matrix_world": matrix_rows(projector_obj),
+            "spot_size": getattr(projector_obj.data, 'spot_size', None) if projector_obj else None,
+            "texture_scale_x": PROJECTOR_FOCAL_LENGTH_FIXED,
+            "pattern_rotation_z_deg": PRJECTOR_PATTERN_ROTATION_Z_DEG,
+        },
+        "reference_plane": matrix_rows(scene_ctx["reference_plane_obj"]),
+        "environment": {
+            "hdri_path": hdri_path,
+            "hdri_digest": render_cache.file_digest(hdri_path) if hdri_path and os.path.isfile(hdri_path) else None,
+        },
+        "stl_placement": [list(STL_TARGET_LOCATION), STL_TARGET_LARGEST_DIMENSION],
+        "render": {
+            "engine": scene.render.engine,
+            "resolution": [scene.render.resolution_x, scene.render.resolution_y],
+            "samples": scene.cycles.samples if use_cycles else None,
+            "profile": g_render_profile,
+            "view_transform": scene.view_settings.view_transform,
+            "light_groups": g_light_groups_active,
+            "pattern_synthesis": PATTERN_SYNTHESIS_MODE,
+        },
+        "output": {
+            "format": OUTPUT_FORMAT,
+            "file_format": image_settings.file_format,
+            "color_mode": image_settings.color_mode,
+            "color_depth": image_settings.color_depth,
+        },
+    }
+
+
+def render_cache_key(kind, mesh_digest, view_angles, sample_params=None, pattern_source=None):
+    """Cache key of one render (mesh_digest: mesh_utils.root_mesh_digest of the instantiated model); None when the render cache is off."""
+    if g_render_cache is None:
+        return None
+    pattern_digest = pattern_cache.pattern_digest(pattern_source) if pattern_source else None
+    return render_cache.render_key(kind=kind, scene=g_render_cache_signature, mesh=mesh_digest,
+                                   view=list(view_angles), sample=sample_params, pattern=pattern_digest)
+
+
+def render_cached(cache_key, output_paths, render_function):
+    """Copies output_paths from the render cache on a hit; otherwise renders and stores them."""
+    if cache_key is None:
+        return render_function()
+    if g_render_cache.restore(cache_key, output_paths):
+        return True
+    rendered = render_function()
+    if rendered:
+        when_outputs_written(output_paths, lambda: g_render_cache.store(cache_key, output_paths))
+    return rendered
+
+
+def open_image_writer():
+    """Starts the background PNG encoders when ASYNC_IMAGE_WRITE is on."""
+    global g_image_writer
+
+    if not ASYNC_IMAGE_WRITE:
+        g_image_writer = None
+        return None
+    g_image_writer = async_image_writer.AsyncImageWriter(
+        os.path.dirname(PARAMS_OUTPUT_FILE), ASYNC_WRITE_WORKERS, ASYNC_WRITE_MAX_PENDING)
+    print(f"异步图像编码已启用: {ASYNC_WRITE_WORKERS} 个编码进程, 最多排队 {ASYNC_WRITE_MAX_PENDING} 帧")
+    return g_image_writer
+
+
+def close_image_writer():
+    """Waits for every queued frame (running their callbacks) and stops the encoders."""
+    global g_image_writer
+
+    if g_image_writer is not None:
+        print(f"等待后台编码完成 ({g_image_writer.pending_count} 帧排队中)...")
+        g_image_writer.close()
+        print(f"后台编码: 写出 {g_image_writer.written} 帧, 失败 {g_image_writer.failed} 帧")
+        g_image_writer = None
+
+
+def when_outputs_written(output_paths, callback):
+    """Runs callback once output_paths are complete on disk (immediately unless queued for async encoding)."""
+    if g_image_writer is None:
+        callback()
+    else:
+        g_image_writer.when_written(output_paths, callback)
+
+
+def mark_done_when_written(kind, unit_id, stl_name, output_paths, before_mark=None):
+    """Records a unit in the manifest once output_paths are on disk; a render that wrote nothing stays pending."""
+    when_outputs_written(output_paths, functools.partial(
+        g_generation_manifest.mark_done_if_written, kind, unit_id, stl_name, list(output_paths), before_mark))
+
+
+def record_view_metadata(view_record):
+    """
+    Appends a view's randomization record before the first of its units is
+    marked done, and fsyncs it: the manifest never lists a unit whose view has
+    no record, and a view whose renders all failed gets none.
+    """
+    if g_metadata_stream is not None and view_record is not None:
+        g_metadata_stream.append_once(view_record)
+
+
+def render_still(render_filepath_base):
+    """Renders the current frame to render_filepath_base + extension, encoding it in the background if enabled."""
+    scene = bpy.context.scene
+    if g_image_writer is None:
+        scene.render.filepath = render_filepath_base
+        bpy.ops.render.render(write_still=True)
+        return
+
+    # 先删除上一帧的 Viewer 图像：合成器没有刷新时不会误把旧像素当作本帧写出
+    stale_viewer_image = bpy.data.images.get("Viewer Node")
+    if stale_viewer_image is not None:
+        bpy.data.images.remove(stale_viewer_image)
+    bpy.ops.render.render()
+    output_path = render_filepath_base + scene.render.file_extension
+    viewer_image = bpy.data.images.get("Viewer Node")
+    expected_size = (scene.render.resolution_x * scene.render.resolution_percentage // 100,
+                     scene.render.resolution_y * scene.render.resolution_percentage // 100)
+    if viewer_image is None or tuple(viewer_image.size) != expected_size:
+        print("   警告：Viewer 节点没有渲染结果，改为同步写出。")
+        bpy.data.images['Render Result'].save_render(filepath=output_path, scene=scene)
+        return
+    image_settings = scene.render.image_settings
+    g_image_writer.submit(async_image_writer.image_pixels(viewer_image), output_path,
+                          channels={'BW': 1, 'RGB': 3, 'RGBA': 4}[image_settings.color_mode],
+                          bit_depth=int(image_settings.color_depth),
+                          compression=image_settings.compression)
+
+
+def open_shard_writer():
+    """Opens this worker's tar shard writer when OUTPUT_FORMAT is 'tar'."""
+    global g_shard_writer
+
+    if OUTPUT_FORMAT != "tar":
+        g_shard_writer = None
+        return None
+    shard_dir = os.path.join(os.path.dirname(PARAMS_OUTPUT_FILE), "shards")
+    # 追加模式保留已有运行的分片 (编号不重叠)
+    g_shard_writer = dataset_shards.ShardWriter(shard_dir, SAMPLES_PER_SHARD, WORKER_SHARD_INDEX,
+                                                WORKER_SHARD_COUNT, resume=RESUME_MODE or APPEND_MODE,
+                                                shard_closed_callback=record_sample_shard)
+    print(f"分片输出已启用: 每个分片 {SAMPLES_PER_SHARD} 个样本, 目录 {shard_dir}")
+    return g_shard_writer
+
+
+def close_shard_writer():
+    """Closes the last, partially filled shard."""
+    global g_shard_writer
+
+    if g_shard_writer is not None:
+        g_shard_writer.close()
+        print(f"分片输出: 本次写出 {g_shard_writer.shards_written} 个分片")
+        g_shard_writer = None
+
+
+def open_sample_index():
+    """Opens samples.sqlite; a new run (neither resume nor append) drops the rows of earlier runs."""
+    global g_sample_index
+
+    if not USE_SAMPLE_INDEX:
+        g_sample_index = None
+        return None
+    db_path = os.path.join(os.path.dirname(PARAMS_OUTPUT_FILE), sample_index.INDEX_FILE_NAME)
+    g_sample_index = sample_index.SampleIndex(
+        db_path, g_run_naming.run_id,
+        replace_other_runs=WORKER_SHARD_INDEX == 0 and not (RESUME_MODE or APPEND_MODE))
+    print(f"样本索引: {db_path}")
+    return g_sample_index
+
+
+def close_sample_index():
+    global g_sample_index
+
+    if g_sample_index is not None:
+        g_sample_index.close()
+        print(f"样本索引: 本次写入 {g_sample_index.written} 个样本")
+        g_sample_index = None
+
+
+def open_metadata_stream():
+    """Opens this worker's per-view randomization stream; resume and append add to the existing file."""
+    global g_metadata_stream
+
+    if not SAMPLE_METADATA_STREAM:
+        g_metadata_stream = None
+        return None
+    output_root = os.path.dirname(PARAMS_OUTPUT_FILE)
+    append = RESUME_MODE or APPEND_MODE
+    if not append and WORKER_SHARD_INDEX == 0:
+        sample_metadata.remove_stale_streams(output_root, WORKER_SHARD_COUNT)
+    g_metadata_stream = sample_metadata.MetadataStream(
+        sample_metadata.metadata_path(output_root, WORKER_SHARD_INDEX), append, METADATA_FSYNC_INTERVAL_S)
+    return g_metadata_stream
+
+
+def close_metadata_stream():
+    global g_metadata_stream
+
+    if g_metadata_stream is not None:
+        g_metadata_stream.close()
+        print(f"随机参数记录: 本次写入 {g_metadata_stream.records_written} 个视角 -> {g_metadata_stream.path}")
+        g_metadata_stream = None
+
+
+def view_metadata_record(stl_name, view_id, first_pattern_id, view_angles, sample_params, material_params,
+                         matrix_world):
+    """Flat record of every randomized value of one view, see sample_metadata."""
+    record = {
+        "run_id": g_run_naming.run_id,
+        "view_id": view_id,
+        "first_pattern_id": first_pattern_id,
+        "stl": stl_name,
+        "view_y_deg": view_angles[0],
+        "view_z_deg": view_angles[1],
+    }
+    record.update(sample_params)
+    record.update({f"material_{key}": value for key, value in material_params.items()})
+    record["projector_texture_scale_x"] = projector_texture_scale_x
+    record["projector_pattern_rotation_z_deg"] = projector_pattern_rotation_z_deg
+    record["matrix_world"] = [list(row) for row in matrix_world]
+    return record
+
+
+def record_sample_shard(shard_name, keys):
+    if g_sample_index is not None:
+        g_sample_index.set_shard([int(key) for key in keys], shard_name)
+
+
+def view_sample_pending(view_id):
+    """True if a finished view still has to be packed into a shard or recorded in the sample index."""
+    return ((g_shard_writer is not None and f"{view_id:06d}" not in g_shard_writer.packed_keys) or
+            (g_sample_index is not None and not g_sample_index.has_sample(view_id)))
+
+
+def pattern_source_name(pattern_source):
+    if isinstance(pattern_source, pattern_generator.GeneratedPattern):
+        return pattern_source.name
+    return os.path.basename(pattern_source)
+
+
+def view_sample_files(scene_ctx, view_id, first_pattern_id):
+    """[(component, filepath)] of every output of one (STL, view) sample."""
+    extension = bpy.context.scene.render.file_extension
+    pattern_count = len(scene_ctx["pattern_image_files"])
+    sample_files = [(f"pattern_{pattern_idx:03d}",
+                     os.path.join(scene_ctx["abs_main_output_dir"],
+                                  f"{first_pattern_id + pattern_idx:06d}_pattern{extension}"))
+                    for pattern_idx in range(pattern_count)]
+    node_names = GEOMETRY_OUTPUT_NODE_NAMES + get_light_group_view_output_node_names()
+    if PATTERN_SYNTHESIS_MODE:
+        node_names += (PROJECTOR_PASS_OUTPUT_NODE_NAME, AMBIENT_PASS_OUTPUT_NODE_NAME)
+    for file_path in output_node_file_paths(node_names, view_id):
+        # 'depth_R_000012.exr' -> 'depth_R', '000012_ambient.png' -> 'ambient'
+        component = os.path.splitext(os.path.basename(file_path))[0].replace(f"{view_id:06d}", "").strip("_")
+        sample_files.append((component, file_path))
+    if not g_light_groups_active:
+        sample_files.append(("ambient", os.path.join(AMBIENT_RGB_OUTPUT_DIR, f"{view_id:06d}_ambient{extension}")))
+    return sample_files
+
+
+def queue_view_sample(scene_ctx, stl_name, view_id, first_pattern_id, view_angles, sample_params):
+    """
+    Records one view's outputs (shard and sample index) once they are all on
+    disk: after background encoding, or after offline synthesis in synthesis mode.
+    """
+    if not view_sample_pending(view_id):
+        return
+    sample_files = view_sample_files(scene_ctx, view_id, first_pattern_id)
+    metadata = {
+        "run_id": g_run_naming.run_id,
+        "stl": stl_name,
+        "view_id": view_id,
+        "first_pattern_id": first_pattern_id,
+        "view_angles_deg": list(view_angles),
+        "patterns": [pattern_source_name(source) for source in scene_ctx["pattern_image_files"]],
+    }
+    metadata.update(sample_params)
+    if PATTERN_SYNTHESIS_MODE and not g_generation_manifest.is_done("synthesis", view_id, stl_name):
+        scene_ctx.setdefault("pending_samples", {})[view_id] = (sample_files, metadata)
+        return
+    when_outputs_written([file_path for _, file_path in sample_files],
+                         functools.partial(store_view_sample, sample_files, metadata))
+
+
+def store_view_sample(sample_files, metadata):
+    """Adds a finished view to the sample index and the open shard."""
+    missing = [file_path for _, file_path in sample_files if not os.path.exists(file_path)]
+    if missing:
+        print(f"   警告：视角 {metadata['view_id']} 缺少 {len(missing)} 个输出 (如 '{missing[0]}')，不记录该样本。")
+        return
+    key = f"{metadata['view_id']:06d}"
+    if g_sample_index is not None and not g_sample_index.has_sample(metadata['view_id']):
+        if g_shard_writer is not None:
+            # 打包后零散文件会被删除，索引中记录分片内的成员名
+            indexed_files = [(component, dataset_shards.member_name(key, component, file_path))
+                             for component, file_path in sample_files]
+        else:
+            indexed_files = sample_files
+        g_sample_index.add_sample(metadata, indexed_files)
+    if g_shard_writer is not None:
+        g_shard_writer.add_sample(key, sample_files, metadata)
+
+
+def draw_sample_params(stl_file_path):
+    """
+    (stl_rng, sample_params) of one STL; stl_rng goes on to randomize the
+    material. Without SAMPLE_RANDOM_SEED every run draws fresh values. With a
+    seed the draws only depend on the seed and the STL content, not on the
+    STL's position in the folder.
+    """
+    if SAMPLE_RANDOM_SEED is None:
+        stl_rng = random.Random()
+    else:
+        stl_digest = render_cache.file_digest(stl_file_path)
+        stl_rng = random.Random(f"{SAMPLE_RANDOM_SEED}:{stl_digest}")
+
+    min_strength = max(0, AMBIENT_STRENGTH_BASELINE - AMBIENT_STRENGTH_VARIATION)
+    max_strength = AMBIENT_STRENGTH_BASELINE + AMBIENT_STRENGTH_VARIATION
+    random_background_strength = stl_rng.uniform(min_strength, max_strength)
+
+    if USE_DISCRETE_POWER_LEVELS:
+        current_projector_power = stl_rng.choice(PROJECTOR_POWER_LEVELS)
+    else:
+        min_power = max(0, PROJECTOR_POWER_NOMINAL - PROJECTOR_POWER_DRIFT)
+        max_power = PROJECTOR_POWER_NOMINAL + PROJECTOR_POWER_DRIFT
+        current_projector_power = stl_rng.uniform(min_power, max_power)
+
+    random_z_rot_env_map = stl_rng.uniform(0.0, 360.0)
+    return stl_rng, {
+        "seed": SAMPLE_RANDOM_SEED,
+        "projector_power": current_projector_power,
+        "background_strength": random_background_strength,
+        "environment_rotation_z": random_z_rot_env_map,
+    }
+
+
+def view_angle_list():
+    """(y_rot_deg, z_rot_deg) of every view, in view index order."""
+    return [(y_rot_deg, z_rot_deg) for y_rot_deg in VIEW_Y_ANGLES_DEG for z_rot_deg in VIEW_Z_ANGLES_DEG]
+
+
+def stl_view_render_units(global_stl_idx, views_per_stl, pattern_count):
+    """[(view_id, units)] for every view of one STL."""
+    stl_view_units = []
+    for view_idx in range(views_per_stl):
+        first_pattern_id, view_id = compute_render_ids(global_stl_idx, view_idx, views_per_stl, pattern_count)
+        stl_view_units.append((view_id, view_render_units(first_pattern_id, view_id, pattern_count)))
+    return stl_view_units
+
+
+def open_stl_prefetcher():
+    """Starts the STL prefetcher when enabled (numpy reader only; stl_import must run on the main thread)."""
+    global g_stl_prefetcher
+
+    if STL_PREFETCH_COUNT <= 0 or STL_READER_BACKEND != "numpy":
+        g_stl_prefetcher = None
+        return None
+    g_stl_prefetcher = stl_prefetch.StlPrefetcher(
+        STL_TARGET_LARGEST_DIMENSION, STL_PREFETCH_COUNT, MESH_CACHE_DIR if USE_MESH_CACHE else None)
+    print(f"STL预取已启用: 渲染时提前解析之后的 {STL_PREFETCH_COUNT} 个模型")
+    return g_stl_prefetcher
+
+
+def close_stl_prefetcher():
+    global g_stl_prefetcher
+
+    if g_stl_prefetcher is not None:
+        g_stl_prefetcher.close()
+        g_stl_prefetcher = None
+
+
+def view_render_units(first_pattern_id, view_id, pattern_count):
+    """Manifest units (kind, id) one view writes, see generation_manifest.UNIT_KINDS."""
+    units = [("depth", view_id), ("ambient", view_id)]
+    if PATTERN_SYNTHESIS_MODE:
+        units.append(("projector_pass", view_id))
+    else:
+        units.extend(("pattern", first_pattern_id + i) for i in range(pattern_count))
+    return units
 
 
 # ############################################################################
@@ -107,7 +983,9 @@ def setup_scene_units():
     
     print(" 场景单位已设置为厘米。")
     
-    # 4. (可选但推荐) 调整3D视图网格以匹配新单位
+    # 4. (可选但推荐) 调整3D视图网格以匹配新单位 (--background 模式下没有screen)
+    if bpy.context.screen is None:
+        return
     for area in bpy.context.screen.areas:
         if area.type == 'VIEW_3D':
             for space in area.spaces:
@@ -172,16 +1050,34 @@ def setup_world_background(hdri_filepath_abs, z_rotation_degrees, strength):
     # 只连接背景节点到世界输出
     links.new(background_node.outputs['Background'], world_output_node.inputs['Surface'])
 
+    if g_light_groups_active:
+        world.lightgroup = WORLD_LIGHT_GROUP_NAME
+
 
 def setup_render_settings():
+    global g_light_groups_active, g_render_profile, g_scene_cycles_defaults
     print("配置渲染设置...")
     scene = bpy.context.scene
     image_settings = scene.render.image_settings
+    g_render_profile = render_profiles.get_render_profile(RENDER_QUALITY_PROFILE)
+    profile_width, profile_height, profile_samples = render_profiles.resolve_render_settings(
+        g_render_profile, render_width, render_height, dl_train_samples if dl_mode else render_samples)
+    print(f"   渲染质量档位 '{g_render_profile['name']}': {profile_width}x{profile_height}, {profile_samples} 采样")
     if use_cycles:
         scene.render.engine = 'CYCLES'
-        scene.cycles.samples = dl_train_samples if dl_mode else render_samples
+        scene.cycles.samples = profile_samples
+        if g_scene_cycles_defaults is None:
+            g_scene_cycles_defaults = {"max_bounces": scene.cycles.max_bounces,
+                                       "use_denoising": scene.cycles.use_denoising}
+        for setting, scene_default in g_scene_cycles_defaults.items():
+            value = g_render_profile[setting]
+            setattr(scene.cycles, setting, scene_default if value is None else value)
         scene.cycles.pixel_filter_type = dl_filter_type
         scene.cycles.filter_width = dl_filter_width
+        if RENDER_TILE_SIZE:
+            scene.cycles.use_auto_tile = True
+            scene.cycles.tile_size = RENDER_TILE_SIZE
+            print(f"   Cycles 分块大小: {RENDER_TILE_SIZE}")
         prefs = bpy.context.preferences
         if hasattr(prefs, 'addons') and 'cycles' in prefs.addons and hasattr(prefs.addons['cycles'].preferences, 'compute_device_type'):
             cprefs = prefs.addons['cycles'].preferences
@@ -196,20 +1092,38 @@ def setup_render_settings():
         active_view_layer = scene.view_layers[scene.view_layers.keys()[0]] if scene.view_layers else None
         if active_view_layer:
             active_view_layer.use_pass_z = True
+            if PATTERN_SYNTHESIS_MODE and PROJECTOR_UV_AOV_NAME not in active_view_layer.aovs:
+                projector_uv_aov = active_view_layer.aovs.add()
+                projector_uv_aov.name = PROJECTOR_UV_AOV_NAME
+                projector_uv_aov.type = 'COLOR'
+            g_light_groups_active = USE_LIGHT_GROUPS and hasattr(active_view_layer, 'lightgroups')
+            if g_light_groups_active:
+                for light_group_name in (WORLD_LIGHT_GROUP_NAME, PROJECTOR_LIGHT_GROUP_NAME):
+                    if light_group_name not in active_view_layer.lightgroups:
+                        active_view_layer.lightgroups.add(name=light_group_name)
+                print("   已启用光照组 (世界光 / 投影仪)，环境光图将从图案渲染中输出。")
+            elif USE_LIGHT_GROUPS:
+                print("   警告：当前Blender版本不支持光照组，回退为单独的环境光渲染。")
         else:
             print("警告: 场景中没有视图层，无法启用Z通道。")
     else:
         scene.render.engine = 'BLENDER_EEVEE'
-    scene.render.resolution_x = render_width
-    scene.render.resolution_y = render_height
+    scene.render.resolution_x = profile_width
+    scene.render.resolution_y = profile_height
     image_settings.file_format = 'PNG'
     image_settings.color_mode = 'RGB'
-    image_settings.color_depth = '16'
-    image_settings.compression = 15
+    image_settings.color_depth = g_render_profile["png_color_depth"]
+    image_settings.compression = g_render_profile["png_compression"]
     scene.render.use_file_extension = True
     scene.render.use_render_cache = False
     scene.render.use_overwrite = True
     scene.render.use_placeholder = False
+    scene.render.use_persistent_data = PERSISTENT_RENDER_DATA or RENDER_PATTERNS_AS_ANIMATION
+    if PATTERN_SYNTHESIS_MODE or ASYNC_IMAGE_WRITE:
+        # 合成/后台编码在线性空间完成后只能套用简单的sRGB曲线，Blender写出的图像需保持一致
+        scene.view_settings.view_transform = 'Standard'
+        scene.view_settings.look = 'None'
+        print("   图案合成/异步编码模式：视图变换已设为 'Standard'。")
     print("渲染设置配置完成。")
 
 
@@ -232,7 +1146,7 @@ def setup_compositor_nodes(abs_depth_output_path):
     sep_color_node.location = (200, 0)
 
     file_output_node_depth = tree.nodes.new(type='CompositorNodeOutputFile')
-    file_output_node_depth.name = "DepthOutputNode"
+    file_output_node_depth.name = DEPTH_OUTPUT_NODE_NAME
     file_output_node_depth.location = (600, 0)
     
     if not ensure_directory_exists(abs_depth_output_path):
@@ -244,12 +1158,20 @@ def setup_compositor_nodes(abs_depth_output_path):
     file_output_node_depth.format.file_format = 'OPEN_EXR'
     file_output_node_depth.format.color_mode = 'BW'
     file_output_node_depth.format.color_depth = '32'
-    file_output_node_depth.format.exr_codec = 'ZIP'
+    file_output_node_depth.format.exr_codec = g_render_profile["exr_codec"]
     
     file_output_node_depth.file_slots.clear()
-    depth_slot = file_output_node_depth.file_slots.new("depth_R_")
+    # '######' 由帧号替换；几何通道只在帧号等于视角编号的渲染中写出
+    depth_slot = file_output_node_depth.file_slots.new("depth_R_######")
 
     tree.links.new(render_layers_node.outputs['Image'], composite_node.inputs['Image'])
+
+    if ASYNC_IMAGE_WRITE:
+        viewer_node = tree.nodes.new(type='CompositorNodeViewer')
+        viewer_node.name = ASYNC_VIEWER_NODE_NAME
+        viewer_node.location = (600, 400)
+        tree.links.new(render_layers_node.outputs['Image'], viewer_node.inputs['Image'])
+        tree.nodes.active = viewer_node
     
     if 'Depth' in render_layers_node.outputs:
         tree.links.new(render_layers_node.outputs['Depth'], sep_color_node.inputs['Image'])
@@ -259,9 +1181,181 @@ def setup_compositor_nodes(abs_depth_output_path):
     else:
         print("   严重警告：渲染层节点缺少 'Depth' 输出。请在视图层属性中启用Z通道！")
 
+    if g_light_groups_active:
+        setup_ambient_light_group_output_node(tree, render_layers_node)
+    if PATTERN_SYNTHESIS_MODE:
+        setup_projector_pass_output_nodes(tree, render_layers_node)
+
+    set_geometry_outputs_muted(True)
+    set_output_nodes_muted((PROJECTOR_PASS_OUTPUT_NODE_NAME, AMBIENT_PASS_OUTPUT_NODE_NAME,
+                            AMBIENT_LIGHT_GROUP_OUTPUT_NODE_NAME), True)
     print("合成器节点设置完成。")
 
 
+def _new_linear_exr_output_node(tree, name, base_path, location):
+    file_output_node = tree.nodes.new(type='CompositorNodeOutputFile')
+    file_output_node.name = name
+    file_output_node.location = location
+    file_output_node.base_path = base_path
+    file_output_node.format.file_format = 'OPEN_EXR'
+    file_output_node.format.color_mode = 'RGB'
+    file_output_node.format.color_depth = '32'
+    file_output_node.format.exr_codec = g_render_profile["exr_codec"]
+    file_output_node.file_slots.clear()
+    return file_output_node
+
+
+def light_group_output_name(light_group_name):
+    return f"Combined_{light_group_name}"
+
+
+def setup_ambient_light_group_output_node(tree, render_layers_node):
+    """
+    Writes the world light group of a render as '######_ambient.png' into the
+    ambient folder, with the same PNG settings and view transform as the
+    pattern images (frame = view id).
+    """
+    world_output = render_layers_node.outputs.get(light_group_output_name(WORLD_LIGHT_GROUP_NAME))
+    if world_output is None:
+        print("   严重警告：渲染层节点缺少世界光照组输出，无法从图案渲染中得到环境光图！")
+        return
+
+    ambient_output_node = tree.nodes.new(type='CompositorNodeOutputFile')
+    ambient_output_node.name = AMBIENT_LIGHT_GROUP_OUTPUT_NODE_NAME
+    ambient_output_node.location = (600, -600)
+    ambient_output_node.base_path = AMBIENT_RGB_OUTPUT_DIR
+    ambient_output_node.format.file_format = 'PNG'
+    ambient_output_node.format.color_mode = 'RGB'
+    ambient_output_node.format.color_depth = g_render_profile["png_color_depth"]
+    ambient_output_node.format.compression = g_render_profile["png_compression"]
+    ambient_output_node.file_slots.clear()
+    tree.links.new(world_output, ambient_output_node.file_slots.new("######_ambient"))
+    print(f"   世界光照组已连接到环境光输出: {AMBIENT_RGB_OUTPUT_DIR}")
+
+
+def setup_projector_pass_output_nodes(tree, render_layers_node):
+    """
+    Adds the File Output nodes read by pattern_synthesis.py: irradiance and
+    projector UV for the projector pass, plus linear ambient. With light groups
+    both irradiance and ambient come from the projector pass itself; otherwise
+    the ambient EXR is written by the separate ambient render.
+    """
+    if not ensure_directory_exists(PROJECTOR_PASS_OUTPUT_DIR):
+        print(f"警告：无法创建投影通道输出路径 '{PROJECTOR_PASS_OUTPUT_DIR}'。")
+        return
+
+    projector_pass_node = _new_linear_exr_output_node(
+        tree, PROJECTOR_PASS_OUTPUT_NODE_NAME, PROJECTOR_PASS_OUTPUT_DIR, (600, -200))
+    if g_light_groups_active:
+        irradiance_output = render_layers_node.outputs.get(light_group_output_name(PROJECTOR_LIGHT_GROUP_NAME))
+    else:
+        irradiance_output = render_layers_node.outputs['Image']
+    if irradiance_output is not None:
+        tree.links.new(irradiance_output, projector_pass_node.file_slots.new("irradiance_######"))
+    if PROJECTOR_UV_AOV_NAME in render_layers_node.outputs:
+        tree.links.new(render_layers_node.outputs[PROJECTOR_UV_AOV_NAME],
+                       projector_pass_node.file_slots.new("projector_uv_######"))
+    else:
+        print(f"   严重警告：渲染层节点缺少 '{PROJECTOR_UV_AOV_NAME}' AOV 输出，无法合成图案！")
+
+    if g_light_groups_active:
+        world_output = render_layers_node.outputs.get(light_group_output_name(WORLD_LIGHT_GROUP_NAME))
+        if world_output is not None:
+            tree.links.new(world_output, projector_pass_node.file_slots.new("ambient_######"))
+    else:
+        ambient_pass_node = _new_linear_exr_output_node(
+            tree, AMBIENT_PASS_OUTPUT_NODE_NAME, PROJECTOR_PASS_OUTPUT_DIR, (600, -400))
+        tree.links.new(render_layers_node.outputs['Image'],
+                       ambient_pass_node.file_slots.new("ambient_######"))
+    print(f"   投影通道输出已连接到: {PROJECTOR_PASS_OUTPUT_DIR}")
+
+
+def set_output_nodes_muted(node_names, muted):
+    """Mutes/unmutes the named compositor File Output nodes that exist."""
+    tree = bpy.context.scene.node_tree
+    if not tree:
+        return
+    for node_name in node_names:
+        node = tree.nodes.get(node_name)
+        if node:
+            node.mute = muted
+
+
+def set_geometry_outputs_muted(muted):
+    """Mutes/unmutes the File Output nodes that only depend on geometry (depth, ...)."""
+    set_output_nodes_muted(GEOMETRY_OUTPUT_NODE_NAMES, muted)
+
+
+def get_light_group_view_output_node_names():
+    """
+    Outputs written once per view by the view's first render when light groups
+    replace the separate ambient render; empty when they do not.
+    """
+    if not g_light_groups_active:
+        return ()
+    return (AMBIENT_LIGHT_GROUP_OUTPUT_NODE_NAME,)
+
+
+def output_node_file_paths(node_names, frame_number):
+    """Files the linked slots of the named File Output nodes write for frame_number."""
+    tree = bpy.context.scene.node_tree
+    file_paths = []
+    for node_name in node_names:
+        node = tree.nodes.get(node_name) if tree else None
+        if not node:
+            continue
+        extension = '.exr' if node.format.file_format == 'OPEN_EXR' else '.png'
+        for slot, slot_input in zip(node.file_slots, node.inputs):
+            if slot_input.is_linked:
+                file_name = slot.path.replace('######', f"{frame_number:06d}") + extension
+                file_paths.append(os.path.join(node.base_path, file_name))
+    return file_paths
+
+
+def apply_render_profile(profile):
+    """Applies {scene.cycles attribute: value}; returns the previous values for restore_render_profile()."""
+    cycles_settings = bpy.context.scene.cycles
+    saved_settings = {}
+    for attr_name, value in profile.items():
+        if hasattr(cycles_settings, attr_name):
+            saved_settings[attr_name] = getattr(cycles_settings, attr_name)
+            setattr(cycles_settings, attr_name, value)
+    return saved_settings
+
+
+def restore_render_profile(saved_settings):
+    cycles_settings = bpy.context.scene.cycles
+    for attr_name, value in saved_settings.items():
+        setattr(cycles_settings, attr_name, value)
+
+
+def render_geometry_outputs_only(frame_number):
+    """
+    Renders only the geometry File Output nodes (depth, ...) with
+    DEPTH_RENDER_PROFILE and restores the production settings afterwards.
+    '######' in their slot paths becomes frame_number; no image is written
+    through render.filepath.
+    """
+    scene = bpy.context.scene
+    set_render_timing_label("depth")
+    if use_cycles:
+        saved_settings = apply_render_profile(DEPTH_RENDER_PROFILE)
+    else:
+        saved_settings = {}
+    scene.frame_set(frame_number)
+    set_geometry_outputs_muted(False)
+    try:
+        bpy.ops.render.render()
+    except Exception as e:
+        print(f"渲染几何通道 (帧 {frame_number}) 时发生严重错误: {e}")
+        print(traceback.format_exc())
+        return False
+    finally:
+        set_geometry_outputs_muted(True)
+        restore_render_profile(saved_settings)
+    return True
+
+
 def get_or_create_camera(name, loc, rot_deg, scale_val, cam_type, lens_unit, focal_length, clip_start, clip_end):
     cam_obj = bpy.data.objects.get(name)
     if not (cam_obj and cam_obj.type == 'CAMERA'):
@@ -314,15 +1408,37 @@ def get_pattern_images(folder_path):
     return image_files
 
 
+def load_pattern_sources():
+    """
+    Pattern files of image_pattern_folder, or the generated patterns of
+    PATTERN_SOURCE. The render functions and pattern_cache accept both.
+    """
+    global g_generated_patterns
+
+    if PATTERN_SOURCE == "folder":
+        g_generated_patterns = None
+        return get_pattern_images(image_pattern_folder)
+    try:
+        g_generated_patterns = pattern_generator.generate_patterns(PATTERN_SOURCE, PATTERN_GENERATOR_PARAMS)
+    except (ValueError, KeyError) as e:
+        print(f"错误：生成图案失败: {e}")
+        g_generated_patterns = None
+        return []
+    print(f"已生成 {len(g_generated_patterns)} 个 {PATTERN_SOURCE} 图案 "
+          f"({PATTERN_GENERATOR_PARAMS['width']}x{PATTERN_GENERATOR_PARAMS['height']})")
+    return list(g_generated_patterns)
+
+
 def project_and_render_via_nodes(image_texture_node, emission_node, pattern_image_filepath, output_filename_base, current_output_dir_abs):
     if not image_texture_node or not emission_node:
         print("错误：未提供用于渲染的图像纹理节点或发射节点。")
         return False
     if pattern_image_filepath:
         try:
-            image_data_block = bpy.data.images.load(pattern_image_filepath, check_existing=True)
-            image_texture_node.image = image_data_block
-        except RuntimeError as e:
+            image_data_block = pattern_cache.get_pattern_cache(PATTERN_CACHE_MAX_MB * 1024 ** 2).get(pattern_image_filepath)
+            if image_texture_node.image != image_data_block:
+                image_texture_node.image = image_data_block
+        except (RuntimeError, OSError) as e:
             print(f"错误：加载图像 '{pattern_image_filepath}' 到图像纹理节点时出错：{e}")
             if emission_node.inputs['Strength'].default_value > 0:
                 return False
@@ -330,9 +1446,8 @@ def project_and_render_via_nodes(image_texture_node, emission_node, pattern_imag
         print(f"错误: 投影仪发射强度 > 0 但未提供 pattern_image_filepath。")
         return False
     render_filepath_full_base = os.path.join(current_output_dir_abs, output_filename_base)
-    bpy.context.scene.render.filepath = render_filepath_full_base
     try:
-        bpy.ops.render.render(write_still=True)
+        render_still(render_filepath_full_base)
     except Exception as e:
         print(f"渲染到 '{render_filepath_full_base}' 时发生严重错误: {e}")
         print(traceback.format_exc())
@@ -340,6 +1455,51 @@ def project_and_render_via_nodes(image_texture_node, emission_node, pattern_imag
     return True
 
 
+def render_view_patterns_as_animation(image_texture_node, pattern_image_filepaths, first_pattern_id, current_output_dir_abs):
+    """
+    Renders every pattern of one view with a single render(animation=True) call.
+
+    Frame N shows pattern (N - first_pattern_id): a frame_change_pre handler
+    swaps the image on the projector texture node, and '######' in the output
+    path is replaced by the frame number, so files get the same
+    '{id:06d}_pattern' names as the per-still path.
+    """
+    scene = bpy.context.scene
+    try:
+        pattern_images = pattern_cache.get_pattern_cache(PATTERN_CACHE_MAX_MB * 1024 ** 2).get_many(pattern_image_filepaths)
+    except (RuntimeError, OSError) as e:
+        print(f"错误：预加载图案图像时出错：{e}")
+        return False
+
+    def swap_pattern_for_frame(scene_arg, *_):
+        pattern_idx = scene_arg.frame_current - first_pattern_id
+        if 0 <= pattern_idx < len(pattern_images) and image_texture_node.image != pattern_images[pattern_idx]:
+            image_texture_node.image = pattern_images[pattern_idx]
+
+    last_pattern_id = first_pattern_id + len(pattern_images) - 1
+    original_frame_range = (scene.frame_start, scene.frame_end, scene.frame_step)
+    # 先扩大结束帧，避免起始帧暂时大于结束帧
+    scene.frame_end = max(scene.frame_end, last_pattern_id)
+    scene.frame_start = first_pattern_id
+    scene.frame_end = last_pattern_id
+    scene.frame_step = 1
+    scene.render.filepath = os.path.join(current_output_dir_abs, "######_pattern")
+
+    bpy.app.handlers.frame_change_pre.append(swap_pattern_for_frame)
+    set_render_timing_label("pattern")
+    try:
+        bpy.ops.render.render(animation=True)
+    except Exception as e:
+        print(f"动画渲染帧 {first_pattern_id}-{last_pattern_id} 时发生严重错误: {e}")
+        print(traceback.format_exc())
+        return False
+    finally:
+        bpy.app.handlers.frame_change_pre.remove(swap_pattern_for_frame)
+        scene.frame_end = max(original_frame_range[1], scene.frame_start)
+        scene.frame_start, scene.frame_end, scene.frame_step = original_frame_range
+    return True
+
+
 def get_stl_files_from_folder(folder_path):
     abs_folder_path = bpy.path.abspath(folder_path)
     if not os.path.isdir(abs_folder_path):
@@ -364,21 +1524,159 @@ def clear_object_by_name(object_name):
     return False
 
 
-def import_and_prepare_stl(stl_filepath, desired_object_name_base, target_location_center, target_largest_dimension):
-    print(f"正在导入STL文件: {os.path.basename(stl_filepath)}...")
+def clear_object_hierarchy(object_name):
+    """Removes an object, its children and their mesh datablocks."""
+    root_obj = bpy.data.objects.get(object_name)
+    if not root_obj:
+        return False
+    for child_obj in list(root_obj.children_recursive):
+        mesh_data = child_obj.data if child_obj.type == 'MESH' else None
+        bpy.data.objects.remove(child_obj, do_unlink=True)
+        if mesh_data and mesh_data.users == 0:
+            bpy.data.meshes.remove(mesh_data)
+    return clear_object_by_name(object_name)
+
+
+def import_and_prepare_stl(stl_filepath, desired_object_name_base, target_location_center, target_largest_dimension, rng=None):
+    rng = rng or random
+    parent_empty = None
+    cache_path = None
+    normalized_mesh = None
+    # 预取进程对已有网格缓存的文件不输出结果，因此总是先取回 (并回收进程)
+    prefetched_mesh = g_stl_prefetcher.take(stl_filepath) if g_stl_prefetcher else None
+    if USE_MESH_CACHE:
+        cache_path = mesh_cache.mesh_cache_path(stl_filepath, target_largest_dimension, MESH_CACHE_DIR,
+                                                reader=STL_READER_BACKEND)
+        normalized_mesh = mesh_cache.load_normalized_mesh(cache_path)
+        if normalized_mesh:
+            print(f"从网格缓存加载: {os.path.basename(stl_filepath)} ({len(normalized_mesh[0])} 个部件)")
+
+    if normalized_mesh is None and prefetched_mesh:
+        print(f"使用预取的STL数据: {os.path.basename(stl_filepath)}")
+        normalized_mesh = prefetched_mesh
+        if cache_path:
+            try:
+                mesh_cache.save_normalized_mesh(cache_path, *normalized_mesh)
+            except OSError as e:
+                print(f"   警告：写入网格缓存失败: {e}")
+
+    if normalized_mesh is None:
+        parent_empty = import_and_normalize_stl(stl_filepath, desired_object_name_base, target_largest_dimension)
+        if parent_empty is None:
+            return None
+        if cache_path or MESH_DECIMATION_ERROR_PX > 0:
+            normalized_mesh = (mesh_cache.extract_normalized_parts(parent_empty), parent_empty.scale[0])
+        if cache_path:
+            try:
+                mesh_cache.save_normalized_mesh(cache_path, *normalized_mesh)
+            except OSError as e:
+                print(f"   警告：写入网格缓存失败: {e}")
+
+    if normalized_mesh is not None and MESH_DECIMATION_ERROR_PX > 0:
+        decimated_mesh = decimate_normalized_mesh(stl_filepath, normalized_mesh, target_largest_dimension)
+        if decimated_mesh is not normalized_mesh:
+            if parent_empty is not None:
+                clear_object_hierarchy(parent_empty.name)
+                parent_empty = None
+            normalized_mesh = decimated_mesh
+
+    if parent_empty is None:
+        parent_empty = mesh_cache.instantiate_normalized_mesh(
+            normalized_mesh[0], normalized_mesh[1], f"{desired_object_name_base}_ROOT", desired_object_name_base,
+            bpy.context.collection)
+
+    parent_empty.location = target_location_center
+    parent_empty.rotation_euler = (0, 0, 0)
+    bpy.context.view_layer.update()
+    # 随机材质值作为自定义属性随模型保存，供逐视角记录
+    parent_empty["material_params"] = apply_random_stl_material(parent_empty, desired_object_name_base, rng)
+    return parent_empty
+
+
+def scanner_units_per_pixel(target_largest_dimension):
+    """World size of one rendered pixel at the nearest point a scaled model can reach."""
+    scene = bpy.context.scene
+    camera_obj = scene.camera
+    if camera_obj and camera_obj.type == 'CAMERA':
+        camera_location = tuple(camera_obj.matrix_world.translation)
+        camera_data = camera_obj.data
+        focal_length_px = reference_plane_depth.blender_camera_intrinsics(
+            camera_data.lens, camera_data.sensor_width, camera_data.sensor_height, camera_data.sensor_fit,
+            scene.render.resolution_x, scene.render.resolution_y)[0]
+    else:
+        camera_location = CAMERA_DEFAULT_LOC
+        focal_length_px = CAMERA_DEFAULT_FOCAL_LENGTH / 36.0 * max(render_width, render_height)
+    return mesh_decimation.world_units_per_pixel(
+        camera_location, STL_TARGET_LOCATION, target_largest_dimension, focal_length_px)
+
+
+def decimate_normalized_mesh(stl_filepath, normalized_mesh, target_largest_dimension):
+    """
+    Returns the pixel-budget decimated (parts, scale_factor) of a normalized
+    model, or normalized_mesh itself when nothing was removed. Decimated parts
+    are cached as a mesh_cache variant; triangle counts go to
+    mesh_decimation_shard###.jsonl in the output root.
+    """
+    parts, scale_factor = normalized_mesh
+    triangles_before = sum(len(part["loop_totals"]) for part in parts)
+    if triangles_before <= MESH_DECIMATION_MIN_TRIANGLES:
+        return normalized_mesh
+
+    cell_size = mesh_decimation.decimation_cell_size(
+        MESH_DECIMATION_ERROR_PX, scanner_units_per_pixel(target_largest_dimension), scale_factor)
+    variant_path = mesh_cache.mesh_cache_path(stl_filepath, target_largest_dimension, MESH_CACHE_DIR,
+                                              variant=f"decimate:{cell_size:.6g}", reader=STL_READER_BACKEND)
+    decimated_mesh = mesh_cache.load_normalized_mesh(variant_path)
+    if decimated_mesh is None:
+        decimated_parts, _, _ = mesh_decimation.decimate_parts(parts, cell_size)
+        decimated_mesh = (decimated_parts, scale_factor)
+        try:
+            mesh_cache.save_normalized_mesh(variant_path, *decimated_mesh)
+        except OSError as e:
+            print(f"   警告：写入简化网格缓存失败: {e}")
+    triangles_after = sum(len(part["loop_totals"]) for part in decimated_mesh[0])
+
+    print(f"   网格简化 (误差 {MESH_DECIMATION_ERROR_PX} 像素): {triangles_before} -> {triangles_after} 个三角形")
+    record_path = os.path.join(os.path.dirname(PARAMS_OUTPUT_FILE),
+                               f"mesh_decimation_shard{WORKER_SHARD_INDEX:03d}.jsonl")
     try:
-        bpy.ops.wm.stl_import(filepath=stl_filepath)
-    except Exception as e:
-        print(f"错误：无法导入STL文件 '{stl_filepath}': {e}")
-        print(traceback.format_exc())
-        return None
-    
-    if not bpy.context.selected_objects:
-        print(f"错误：导入STL '{stl_filepath}' 后没有选中任何对象。")
-        return None
+        with open(record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"stl": os.path.basename(stl_filepath), "error_px": MESH_DECIMATION_ERROR_PX,
+                                "cell_size": cell_size, "triangles_before": triangles_before,
+                                "triangles_after": triangles_after}, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"   警告：记录网格简化结果失败: {e}")
+    if triangles_after == triangles_before:
+        return normalized_mesh
+    return decimated_mesh
+
+
+def import_and_normalize_stl(stl_filepath, desired_object_name_base, target_largest_dimension):
+    """Imports an STL under a new root empty, centers its parts and scales it to the target size."""
+    print(f"正在导入STL文件: {os.path.basename(stl_filepath)}...")
+    all_imported_meshes = None
+    if STL_READER_BACKEND == "numpy":
+        try:
+            vertices, faces = stl_reader.read_stl(stl_filepath)
+            all_imported_meshes = [stl_reader.build_stl_object(
+                os.path.splitext(os.path.basename(stl_filepath))[0], vertices, faces, bpy.context.collection)]
+        except (OSError, ValueError) as e:
+            print(f"   警告：NumPy解析STL失败，回退到 stl_import: {e}")
+
+    if all_imported_meshes is None:
+        try:
+            bpy.ops.wm.stl_import(filepath=stl_filepath)
+        except Exception as e:
+            print(f"错误：无法导入STL文件 '{stl_filepath}': {e}")
+            print(traceback.format_exc())
+            return None
+        
+        if not bpy.context.selected_objects:
+            print(f"错误：导入STL '{stl_filepath}' 后没有选中任何对象。")
+            return None
 
-    temp_imported_objects = list(bpy.context.selected_objects)
-    all_imported_meshes = [obj for obj in temp_imported_objects if obj.type == 'MESH']
+        temp_imported_objects = list(bpy.context.selected_objects)
+        all_imported_meshes = [obj for obj in temp_imported_objects if obj.type == 'MESH']
     
     if not all_imported_meshes:
         print(f"错误：STL '{stl_filepath}' 未包含任何有效网格数据。")
@@ -390,53 +1688,29 @@ def import_and_prepare_stl(stl_filepath, desired_object_name_base, target_locati
     for i, mesh_obj in enumerate(all_imported_meshes):
         mesh_obj.name = f"{desired_object_name_base}_part{i}"
         mesh_obj.parent = parent_empty
-        bpy.context.view_layer.objects.active = mesh_obj
-        bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
-        mesh_obj.location = (0,0,0)
-
-    bpy.context.view_layer.update()
 
-    min_overall_local = Vector((float('inf'), float('inf'), float('inf')))
-    max_overall_local = Vector((float('-inf'), float('-inf'), float('-inf')))
-    
-    for mesh_obj_child in parent_empty.children:
-        if mesh_obj_child.type == 'MESH' and mesh_obj_child.data and mesh_obj_child.data.vertices:
-            for corner_local_to_mesh in mesh_obj_child.bound_box:
-                corner_in_parent_space = mesh_obj_child.matrix_basis @ Vector(corner_local_to_mesh)
-                min_overall_local = Vector(min(c1, c2) for c1, c2 in zip(min_overall_local, corner_in_parent_space))
-                max_overall_local = Vector(max(c1, c2) for c1, c2 in zip(max_overall_local, corner_in_parent_space))
-
-    center_of_geometry_local_to_parent = (min_overall_local + max_overall_local) / 2.0
-    for mesh_obj_child in parent_empty.children:
-        if mesh_obj_child.type == 'MESH':
-            mesh_obj_child.location -= center_of_geometry_local_to_parent
-    
     bpy.context.view_layer.update()
 
-    # Re-calculate bounds after centering
-    min_overall_local = Vector((float('inf'), float('inf'), float('inf')))
-    max_overall_local = Vector((float('-inf'), float('-inf'), float('-inf')))
-    for mesh_obj_child in parent_empty.children:
-        if mesh_obj_child.type == 'MESH' and mesh_obj_child.data and mesh_obj_child.data.vertices:
-            for corner_local_to_mesh in mesh_obj_child.bound_box:
-                corner_in_parent_space = mesh_obj_child.matrix_basis @ Vector(corner_local_to_mesh)
-                min_overall_local = Vector(min(c1, c2) for c1, c2 in zip(min_overall_local, corner_in_parent_space))
-                max_overall_local = Vector(max(c1, c2) for c1, c2 in zip(max_overall_local, corner_in_parent_space))
-
-    dims_local_centered = max_overall_local - min_overall_local
-    largest_dim_local = max(dims_local_centered) if any(d > 1e-7 for d in dims_local_centered) else 0
-
-    if largest_dim_local > 1e-7:
-        scale_factor = target_largest_dimension / largest_dim_local
+    # 所有部件的顶点一起在根对象空间求精确包围盒：整体居中，部件之间的相对位置保持不变
+    model_vertices = mesh_utils.root_space_vertices(parent_empty)
+    scale_factor = None
+    if len(model_vertices):
+        center_of_geometry_local_to_parent, scale_factor = mesh_utils.centering_and_scale(
+            model_vertices, target_largest_dimension)
+        for mesh_obj_child in parent_empty.children:
+            if mesh_obj_child.type == 'MESH':
+                mesh_obj_child.location -= Vector(center_of_geometry_local_to_parent)
+        bpy.context.view_layer.update()
+
+    if scale_factor:
         parent_empty.scale = (scale_factor, scale_factor, scale_factor)
     else:
         print(f"警告：对象 '{parent_empty.name}' 的维度过小或为零。不进行缩放。")
         parent_empty.scale = (1.0, 1.0, 1.0)
+    return parent_empty
 
-    parent_empty.location = target_location_center
-    parent_empty.rotation_euler = (0, 0, 0)
-    bpy.context.view_layer.update()
 
+def apply_random_stl_material(parent_empty, desired_object_name_base, rng):
     mat_name = f"Mat_{desired_object_name_base}"
     mat = bpy.data.materials.get(mat_name) or bpy.data.materials.new(name=mat_name)
     
@@ -449,11 +1723,17 @@ def import_and_prepare_stl(stl_filepath, desired_object_name_base, target_locati
 
     bsdf_node = next((n for n in mat.node_tree.nodes if n.type == 'BSDF_PRINCIPLED'), None)
     
-    random_gray_color = random.uniform(0.1, 0.9)
+    material_params = {
+        "base_gray": rng.uniform(0.1, 0.9),
+        "roughness": rng.uniform(0.4, 1.0),
+        "specular_ior_level": rng.uniform(0.0, 0.5),
+        "metallic": 0.0,
+    }
+    random_gray_color = material_params["base_gray"]
     bsdf_node.inputs['Base Color'].default_value = (random_gray_color, random_gray_color, random_gray_color, 1.0)
-    bsdf_node.inputs['Roughness'].default_value = random.uniform(0.4, 1.0)
-    bsdf_node.inputs['Specular IOR Level'].default_value = random.uniform(0.0, 0.5)
-    bsdf_node.inputs['Metallic'].default_value = 0.0
+    bsdf_node.inputs['Roughness'].default_value = material_params["roughness"]
+    bsdf_node.inputs['Specular IOR Level'].default_value = material_params["specular_ior_level"]
+    bsdf_node.inputs['Metallic'].default_value = material_params["metallic"]
 
     for mesh_obj_child in parent_empty.children:
         if mesh_obj_child.type == 'MESH':
@@ -461,8 +1741,7 @@ def import_and_prepare_stl(stl_filepath, desired_object_name_base, target_locati
                 mesh_obj_child.data.materials.append(mat)
             else:
                 mesh_obj_child.data.materials[0] = mat
-                
-    return parent_empty
+    return material_params
 
 
 def add_reference_plane_world_position(camera_obj):
@@ -474,7 +1753,7 @@ def add_reference_plane_world_position(camera_obj):
     
     try:
         # --- 【核心修改】平面尺寸和位置已转换为厘米 ---
-        size = 1000.0 # 原: 10.0
+        size = REFERENCE_PLANE_HALF_SIZE
         verts = [(-size, -size, 0), (size, -size, 0), (size, size, 0), (-size, size, 0)]
         faces = [(0, 1, 2, 3)]
         plane_mesh = bpy.data.meshes.new(name=f"Mesh_{REFERENCE_PLANE_NAME}")
@@ -522,7 +1801,12 @@ def add_reference_plane_world_position(camera_obj):
     return plane_obj
 
 
-def place_object_on_plane(target_obj_root, reference_plane_obj):
+def place_object_on_plane(target_obj_root, reference_plane_obj, local_vertices=None):
+    """
+    Moves the object along the plane normal until its lowest vertex rests on
+    the plane. local_vertices: the model's vertices in root space
+    (mesh_utils.root_space_vertices), read once per model instead of per view.
+    """
     if not target_obj_root or not reference_plane_obj:
         print("错误 (place_object_on_plane): 传入的对象无效。")
         return
@@ -533,26 +1817,20 @@ def place_object_on_plane(target_obj_root, reference_plane_obj):
     plane_normal = reference_plane_obj.matrix_world.to_3x3() @ Vector((0.0, 0.0, 1.0))
     plane_normal.normalize()
 
-    world_corners = []
     bpy.context.view_layer.update()
     
-    mesh_children = [child for child in target_obj_root.children if child.type == 'MESH' and child.data and child.data.vertices]
-    if not mesh_children:
+    if local_vertices is None:
+        local_vertices = mesh_utils.root_space_vertices(target_obj_root)
+    if len(local_vertices) == 0:
         print("   警告：当前对象没有可计算的几何体子节点，跳过放置步骤。")
         return
 
-    for mesh_child in mesh_children:
-        for corner_local in mesh_child.bound_box:
-            world_corners.append(mesh_child.matrix_world @ Vector(corner_local))
-
-    min_projection = min(corner.dot(plane_normal) for corner in world_corners)
-    
-    plane_point_projection = plane_location.dot(plane_normal)
-    
     # --- 【核心修改】偏移量已从米转换为厘米 ---
     z_offset = 0.1 # 原: 0.001
     
-    offset_distance = plane_point_projection - min_projection + z_offset
+    offset_distance = mesh_utils.contact_offset(
+        local_vertices, mesh_utils.matrix_to_numpy(target_obj_root.matrix_world),
+        tuple(plane_location), tuple(plane_normal), z_offset)
     translation_vector = offset_distance * plane_normal
     
     target_obj_root.location += translation_vector
@@ -560,49 +1838,9 @@ def place_object_on_plane(target_obj_root, reference_plane_obj):
     print(f"   物体已移动以放置在平面上 (沿法线移动距离: {offset_distance:.4f})。")
 
 
-def rename_files_sequentially(folder_path, base_name_prefix="image"):
-    print(f"\n--- 尝试在文件夹中重命名文件: {folder_path} 使用前缀 '{base_name_prefix}' ---")
-    if not (folder_path and os.path.isdir(folder_path)):
-        print(f"错误: 文件夹 '{folder_path}' 无效。跳过 '{base_name_prefix}' 的重命名。")
-        return
-    
-    image_extensions = ('.png', '.jpg', '.jpeg', '.exr', '.tif', '.tiff', '.bmp')
-    try:
-        image_files_to_rename = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(image_extensions)])
-    except Exception as e:
-        print(f"错误: 列出目录 '{folder_path}' 时发生错误: {e}")
-        return
-
-    if not image_files_to_rename:
-        print(f"在 '{folder_path}' 中未找到图像文件进行 '{base_name_prefix}' 重命名。")
-        return
-
-    print(f"找到 {len(image_files_to_rename)} 个图像文件，准备在 '{folder_path}' 中进行 '{base_name_prefix}' 重命名。")
-    renamed_count = 0
-    padding_digits = 6
-    for i, original_filename in enumerate(image_files_to_rename):
-        old_filepath = os.path.join(folder_path, original_filename)
-        _, extension = os.path.splitext(original_filename)
-        new_indexed_filename = f"{base_name_prefix}_{i + 1:0{padding_digits}d}{extension}"
-        new_filepath = os.path.join(folder_path, new_indexed_filename)
-        
-        if old_filepath == new_filepath:
-            renamed_count +=1
-            continue
-        if os.path.exists(new_filepath):
-            print(f"   警告: 目标文件 '{new_indexed_filename}' 已存在。跳过对 '{original_filename}' 的重命名。")
-            continue
-        try:
-            os.rename(old_filepath, new_filepath)
-            renamed_count += 1
-        except Exception as e:
-            print(f"   重命名 '{original_filename}' 到 '{new_indexed_filename}' 时发生错误: {e}")
-    print(f"在 '{folder_path}' ({base_name_prefix}): 成功重命名/确认 {renamed_count} 个文件。")
-
-
-def get_second_mapping_node_in_projector_group(projector_light_obj, group_node_instance_name_in_light, group_definition_name_fallback):
+def get_projector_node_group_instance(projector_light_obj, group_node_instance_name_in_light, group_definition_name_fallback):
     if not (projector_light_obj and projector_light_obj.type == 'LIGHT' and projector_light_obj.data and projector_light_obj.data.use_nodes):
-        print("错误 (get_second_mapping): 投影仪灯光无效或未使用节点。")
+        print("错误 (get_projector_node_group): 投影仪灯光无效或未使用节点。")
         return None
     
     main_light_material_tree = projector_light_obj.data.node_tree
@@ -617,6 +1855,14 @@ def get_second_mapping_node_in_projector_group(projector_light_obj, group_node_i
     
     if not (node_group_instance and node_group_instance.type == 'GROUP' and node_group_instance.node_tree):
         return None
+    return node_group_instance
+
+
+def get_second_mapping_node_in_projector_group(projector_light_obj, group_node_instance_name_in_light, group_definition_name_fallback):
+    node_group_instance = get_projector_node_group_instance(
+        projector_light_obj, group_node_instance_name_in_light, group_definition_name_fallback)
+    if not node_group_instance:
+        return None
 
     internal_projector_node_tree = node_group_instance.node_tree
     mapping_nodes_in_group = sorted([node for node in internal_projector_node_tree.nodes if node.type == 'MAPPING'], key=lambda node: node.location.x)
@@ -624,6 +1870,140 @@ def get_second_mapping_node_in_projector_group(projector_light_obj, group_node_i
     return mapping_nodes_in_group[1] if len(mapping_nodes_in_group) >= 2 else None
 
 
+def build_projector_uv_node_group(projector_light_obj):
+    """
+    Copies the projector's node group (the one holding the mapping nodes that
+    get_second_mapping_node_in_projector_group adjusts) into a group usable in
+    surface materials, so the AOV uses exactly the projector's texture mapping.
+
+    Inside the light the group reads the light-space ray direction; in a
+    material the same direction is the normalized surface position in the
+    projector's object space, so every Texture Coordinate node is bound to the
+    projector and its 'Normal' links are rerouted through that direction.
+    Must be rebuilt whenever the projector mapping (scale/rotation) changes.
+    """
+    node_group_instance = get_projector_node_group_instance(
+        projector_light_obj, PROJECTOR_NODE_GROUP_INSTANCE_NAME_IN_LIGHT, PROJECTOR_NODE_GROUP_DEFINITION_NAME)
+    if not node_group_instance:
+        print("错误：未找到投影仪节点组，无法构建投影仪UV节点组。")
+        return None
+
+    old_group = bpy.data.node_groups.get(PROJECTOR_UV_NODE_GROUP_NAME)
+    if old_group:
+        bpy.data.node_groups.remove(old_group)
+    uv_group = node_group_instance.node_tree.copy()
+    uv_group.name = PROJECTOR_UV_NODE_GROUP_NAME
+    nodes, links = uv_group.nodes, uv_group.links
+
+    def new_light_direction_socket(location):
+        tex_coord = nodes.new('ShaderNodeTexCoord')
+        tex_coord.object = projector_light_obj
+        tex_coord.location = location
+        normalize = nodes.new('ShaderNodeVectorMath')
+        normalize.operation = 'NORMALIZE'
+        normalize.location = (location[0] + 200, location[1])
+        links.new(tex_coord.outputs['Object'], normalize.inputs[0])
+        return normalize.outputs['Vector']
+
+    rerouted_links = 0
+    for tex_coord in [n for n in nodes if n.type == 'TEX_COORD']:
+        direction_socket = new_light_direction_socket((tex_coord.location.x, tex_coord.location.y - 250))
+        for link in [l for l in links if l.from_node == tex_coord and l.from_socket.name == 'Normal']:
+            to_socket = link.to_socket
+            links.remove(link)
+            links.new(direction_socket, to_socket)
+            rerouted_links += 1
+
+    if rerouted_links == 0:
+        # 节点组没有内部纹理坐标节点时，方向由组的第一个矢量输入提供
+        group_input = next((n for n in nodes if n.type == 'GROUP_INPUT'), None)
+        vector_output = next((o for o in group_input.outputs if o.type == 'VECTOR'), None) if group_input else None
+        if not vector_output:
+            print("警告：投影仪节点组中找不到光线方向输入，投影仪UV可能不正确。")
+        else:
+            direction_socket = new_light_direction_socket((group_input.location.x, group_input.location.y - 250))
+            for link in [l for l in links if l.from_socket == vector_output]:
+                to_socket = link.to_socket
+                links.remove(link)
+                links.new(direction_socket, to_socket)
+    print(f"已构建投影仪UV节点组 '{uv_group.name}' (重定向 {rerouted_links} 条纹理坐标连接)。")
+    return uv_group
+
+
+def add_projector_uv_aov_to_material(material):
+    """Adds (once) the projector UV group -> AOV Output nodes to a material."""
+    uv_group = bpy.data.node_groups.get(PROJECTOR_UV_NODE_GROUP_NAME)
+    if not (material and material.use_nodes and uv_group):
+        return False
+    nodes, links = material.node_tree.nodes, material.node_tree.links
+    if nodes.get(PROJECTOR_UV_AOV_NODE_NAME):
+        return True
+
+    group_node = nodes.new('ShaderNodeGroup')
+    group_node.node_tree = uv_group
+    group_node.location = (-200, -400)
+    aov_node = nodes.new('ShaderNodeOutputAOV')
+    aov_node.name = PROJECTOR_UV_AOV_NODE_NAME
+    aov_node.aov_name = PROJECTOR_UV_AOV_NAME
+    aov_node.location = (100, -400)
+
+    uv_output = next((o for o in group_node.outputs if o.type == 'VECTOR'), None)
+    if uv_output is None and group_node.outputs:
+        uv_output = group_node.outputs[0]
+    if uv_output is None:
+        print(f"警告：投影仪UV节点组没有输出，材质 '{material.name}' 未添加AOV。")
+        return False
+    links.new(uv_output, aov_node.inputs['Color'])
+    return True
+
+
+def get_projector_white_image():
+    """A small all-white image: the projector pass measures irradiance per unit pattern value."""
+    image = bpy.data.images.get(PROJECTOR_WHITE_IMAGE_NAME)
+    if image is None:
+        image = bpy.data.images.new(PROJECTOR_WHITE_IMAGE_NAME, 16, 16, alpha=False, float_buffer=True)
+        image.generated_color = (1.0, 1.0, 1.0, 1.0)
+    return image
+
+
+def render_view_projector_pass(image_texture_node, view_id, extra_output_node_names=()):
+    """
+    Replaces the K pattern renders of one view with a single render: the
+    projector shows a white pattern and the compositor writes
+    'irradiance_######' and 'projector_uv_######' EXRs (frame = view id) for
+    pattern_synthesis.py. Without light groups the world is switched off so
+    the render only holds the projector's contribution.
+    """
+    scene = bpy.context.scene
+    world = scene.world
+    background_node = None
+    original_world_strength = None
+    if world and world.use_nodes and not g_light_groups_active:
+        background_node = next((n for n in world.node_tree.nodes if n.type == 'BACKGROUND'), None)
+    if background_node:
+        original_world_strength = background_node.inputs['Strength'].default_value
+        background_node.inputs['Strength'].default_value = 0.0
+
+    original_image = image_texture_node.image
+    image_texture_node.image = get_projector_white_image()
+    scene.frame_set(view_id)
+    output_node_names = (PROJECTOR_PASS_OUTPUT_NODE_NAME,) + tuple(extra_output_node_names)
+    set_output_nodes_muted(output_node_names, False)
+    set_render_timing_label("projector_pass")
+    try:
+        bpy.ops.render.render()
+    except Exception as e:
+        print(f"渲染视角 {view_id} 的投影通道时发生严重错误: {e}")
+        print(traceback.format_exc())
+        return False
+    finally:
+        set_output_nodes_muted(output_node_names, True)
+        image_texture_node.image = original_image
+        if background_node:
+            background_node.inputs['Strength'].default_value = original_world_strength
+    return True
+
+
 def adjust_projector_texture_scale_x(mapping_node_ref, scale_x_value):
     if not (mapping_node_ref and mapping_node_ref.type == 'MAPPING'): return False
     try:
@@ -662,10 +2042,10 @@ def record_parameters_to_file(filepath, camera_obj, projector_light_obj):
     sensor_height_mm = cam_data.sensor_height
     focal_length_mm = cam_data.lens
     
-    fx = (focal_length_mm / sensor_width_mm) * scene.render.resolution_x
-    fy = (focal_length_mm / sensor_height_mm) * scene.render.resolution_y
-    cx = scene.render.resolution_x / 2.0 + cam_data.shift_x * scene.render.resolution_x
-    cy = scene.render.resolution_y / 2.0 + cam_data.shift_y * scene.render.resolution_y
+    # 按 sensor_fit 计算：AUTO 时 sensor_width 对应较长的图像边，fx == fy
+    fx, fy, cx, cy = reference_plane_depth.blender_camera_intrinsics(
+        focal_length_mm, sensor_width_mm, sensor_height_mm, cam_data.sensor_fit,
+        scene.render.resolution_x, scene.render.resolution_y, cam_data.shift_x, cam_data.shift_y)
     
     cam_extrinsic_matrix = camera_obj.matrix_world.inverted()
     
@@ -682,6 +2062,9 @@ def record_parameters_to_file(filepath, camera_obj, projector_light_obj):
             'focal_length_mm': focal_length_mm,
             'sensor_width_mm': sensor_width_mm,
             'sensor_height_mm': sensor_height_mm,
+            'sensor_fit': cam_data.sensor_fit,
+            'shift_x': cam_data.shift_x,
+            'shift_y': cam_data.shift_y,
             'clip_start': cam_data.clip_start,
             'clip_end': cam_data.clip_end,
         },
@@ -697,10 +2080,25 @@ def record_parameters_to_file(filepath, camera_obj, projector_light_obj):
         'parent_name': projector_light_obj.parent.name if projector_light_obj.parent else None,
         'intrinsics_equivalent': {
             'spot_angle_degrees': projector_fov_deg,
-            'pattern_texture_folder': image_pattern_folder,
+            'pattern_texture_folder': image_pattern_folder if PATTERN_SOURCE == "folder" else None,
         },
         'extrinsics': {'world_to_proj_matrix': [list(row) for row in proj_extrinsic_matrix]}
     }
+
+    if g_generated_patterns:
+        params['projector']['generated_patterns'] = {
+            'source': PATTERN_SOURCE,
+            'params': PATTERN_GENERATOR_PARAMS,
+            'patterns': [pattern.metadata for pattern in g_generated_patterns],
+        }
+
+    reference_plane_obj = bpy.data.objects.get(REFERENCE_PLANE_NAME)
+    if reference_plane_obj:
+        params['reference_plane'] = {
+            'name': reference_plane_obj.name,
+            'matrix_world': [list(row) for row in reference_plane_obj.matrix_world],
+            'half_size': REFERENCE_PLANE_HALF_SIZE,
+        }
     
     try:
         with open(filepath, 'w') as f:
@@ -713,6 +2111,96 @@ def record_parameters_to_file(filepath, camera_obj, projector_light_obj):
         return False
 
 
+def write_depth_exr(depth, filepath):
+    """Writes a (rows top-down) depth array with the same EXR settings as DepthOutputNode."""
+    import numpy as np
+
+    scene = bpy.context.scene
+    height, width = depth.shape
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    # bpy 像素从底行开始；RGB 相同，保存为BW时亮度即深度
+    rgba[..., :3] = depth[::-1, :, np.newaxis]
+    image = bpy.data.images.new("ReferencePlaneDepth", width, height, alpha=False, float_buffer=True)
+    image_settings = scene.render.image_settings
+    saved_settings = (image_settings.file_format, image_settings.color_mode,
+                      image_settings.color_depth, image_settings.exr_codec)
+    try:
+        image.pixels.foreach_set(rgba.ravel())
+        image_settings.file_format = 'OPEN_EXR'
+        image_settings.color_mode = 'BW'
+        image_settings.color_depth = '32'
+        image_settings.exr_codec = g_render_profile["exr_codec"]
+        image.save_render(filepath, scene=scene)
+    finally:
+        image_settings.file_format = saved_settings[0]
+        image_settings.color_mode = saved_settings[1]
+        image_settings.color_depth = saved_settings[2]
+        image_settings.exr_codec = saved_settings[3]
+        bpy.data.images.remove(image)
+
+
+def check_reference_depth_against_scene(depth, params, camera_obj):
+    """
+    Ray-casts a 3x3 grid of pixels against the actual scene and compares the
+    hits on the reference plane with the analytic depth. Returns None if they
+    agree, otherwise a description of the mismatch.
+    """
+    scene = bpy.context.scene
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    world_to_cam = camera_obj.matrix_world.inverted()
+    clip_start, clip_end = camera_obj.data.clip_start, camera_obj.data.clip_end
+    height, width = depth.shape
+    for row in (height // 6, height // 2, height * 5 // 6):
+        for col in (width // 6, width // 2, width * 5 // 6):
+            origin, direction = reference_plane_depth.pixel_rays(params, col, row)
+            hit, location, _, _, hit_obj, _ = scene.ray_cast(
+                depsgraph, Vector(origin), Vector(direction).normalized())
+            expected = float(depth[row, col])
+            # 场景射线不受相机裁剪限制；超出裁剪距离的命中在渲染中是背景
+            if hit and not clip_start <= (location - Vector(origin)).length <= clip_end:
+                hit = False
+            if not hit:
+                if expected < reference_plane_depth.BACKGROUND_DEPTH:
+                    return f"像素 ({col}, {row}) 解析结果命中平面，但场景射线未命中"
+                continue
+            if hit_obj.name != REFERENCE_PLANE_NAME:
+                continue
+            actual = -(world_to_cam @ location).z
+            if abs(actual - expected) > 1e-3 * max(1.0, actual):
+                return f"像素 ({col}, {row}) 深度不一致: 解析 {expected:.4f}, 场景 {actual:.4f}"
+    return None
+
+
+def create_reference_plane_depth(depth_output_path, camera_obj):
+    """
+    Writes depth_reference_plane0001.exr from the analytic ray-plane model
+    (cached by parameter hash). Falls back to render_reference_plane_depth_only()
+    when the parameters are unavailable or validation fails.
+    """
+    if ANALYTIC_REFERENCE_DEPTH:
+        print("\n--- 解析计算参考平面深度图 ---")
+        try:
+            params = reference_plane_depth.load_scene_parameters(PARAMS_OUTPUT_FILE)
+            depth = reference_plane_depth.load_cached_depth(params)
+            cache_hit = depth is not None
+            if not cache_hit:
+                depth = reference_plane_depth.compute_reference_plane_depth(params)
+            problem = (reference_plane_depth.validate_depth_map(depth, params) or
+                       check_reference_depth_against_scene(depth, params, camera_obj))
+            if problem is None:
+                if not cache_hit:
+                    reference_plane_depth.store_cached_depth(params, depth)
+                output_path = os.path.join(depth_output_path, "depth_reference_plane0001.exr")
+                write_depth_exr(depth, output_path)
+                print(f"   参考平面深度图已{'从缓存' if cache_hit else '解析计算并'}写出: {output_path}")
+                return True
+            print(f"   警告：解析深度校验失败 ({problem})，回退到渲染。")
+        except Exception as e:
+            print(f"   警告：解析计算参考平面深度失败 ({e})，回退到渲染。")
+            traceback.print_exc()
+    return render_reference_plane_depth_only(depth_output_path)
+
+
 def render_reference_plane_depth_only(depth_output_path):
     print("\n" + "="*20 + " 开始渲染参考平面深度图 " + "="*20)
     
@@ -732,26 +2220,24 @@ def render_reference_plane_depth_only(depth_output_path):
     was_plane_hidden = ref_plane_obj.hide_render
     ref_plane_obj.hide_render = False
 
-    depth_output_node = bpy.context.scene.node_tree.nodes.get("DepthOutputNode")
+    depth_output_node = bpy.context.scene.node_tree.nodes.get(DEPTH_OUTPUT_NODE_NAME)
     if not depth_output_node:
-        print("   严重错误：找不到名为 'DepthOutputNode' 的合成器节点。")
+        print(f"   严重错误：找不到名为 '{DEPTH_OUTPUT_NODE_NAME}' 的合成器节点。")
         if stl_root_object: stl_root_object.hide_render = was_stl_root_hidden
         ref_plane_obj.hide_render = was_plane_hidden
         return False
         
     original_slot_path = depth_output_node.file_slots[0].path
     depth_output_node.file_slots[0].path = "depth_reference_plane"
+    original_frame = bpy.context.scene.frame_current
 
-    print("   准备渲染...")
-    try:
-        bpy.ops.render.render(write_still=True)
+    print("   准备渲染 (深度渲染配置)...")
+    if render_geometry_outputs_only(1):
         print(f"   成功渲染参考平面深度图到: {os.path.join(depth_output_path, 'depth_reference_plane0001.exr')}")
-    except Exception as e:
-        print(f"   渲染参考平面时发生严重错误: {e}")
-        traceback.print_exc()
     
     print("   正在恢复场景设置...")
     depth_output_node.file_slots[0].path = original_slot_path
+    bpy.context.scene.frame_set(original_frame)
 
     if stl_root_object:
         stl_root_object.hide_render = was_stl_root_hidden
@@ -764,12 +2250,17 @@ def render_reference_plane_depth_only(depth_output_path):
 
 
 # --- 主脚本执行 ---
-def main_script_logic():
+def prepare_scene():
+    """
+    Builds everything that stays fixed across STL models: units, output dirs,
+    camera, projector light, reference plane, render settings and compositor.
+
+    Returns a scene context dict consumed by render_stl_files(), or None on a
+    fatal error. The render server calls this once and reuses the context
+    for every job that does not change the scene configuration.
+    """
     global g_projector_internal_mapping_node
-    global projector_texture_scale_x, projector_pattern_rotation_z_deg
 
-    print("开始结构光脚本 (STL批量处理模式)...")
-    
     # --- 【核心修改】在脚本开始时调用新函数以设置单位 ---
     setup_scene_units()
     
@@ -778,22 +2269,18 @@ def main_script_logic():
     abs_main_output_dir = setup_output_directory()
     if not abs_main_output_dir:
         print("严重错误: 无法设置主输出目录。脚本终止。")
-        return
+        return None
 
     ensure_directory_exists(depth_output_dir_abs)
     ensure_directory_exists(AMBIENT_RGB_OUTPUT_DIR)
 
-    pattern_image_files = get_pattern_images(image_pattern_folder)
+    # 文件路径或 pattern_generator.GeneratedPattern
+    pattern_image_files = load_pattern_sources()
     if not pattern_image_files:
-        print("在图案文件夹中没有找到投影图案图像。脚本终止。")
-        return
-
-    stl_file_paths = get_stl_files_from_folder(stl_model_folder)
-    if not stl_file_paths:
-        print("在指定的STL模型文件夹中没有找到STL模型。脚本终止。")
-        return
+        print("没有可用的投影图案 (图案文件夹为空或图案生成失败)。脚本终止。")
+        return None
 
-    print(f"找到 {len(pattern_image_files)} 个图案图像 和 {len(stl_file_paths)} 个STL模型。")
+    print(f"找到 {len(pattern_image_files)} 个图案图像。")
 
     print("\n--- 设置固定的相机和投影仪位置 ---")
     scanner_cam_obj = get_or_create_camera(
@@ -804,7 +2291,7 @@ def main_script_logic():
     )
     if not scanner_cam_obj:
         print("严重错误：无法解析或创建扫描仪相机。脚本终止。")
-        return
+        return None
     
     projector_parent_obj = bpy.data.objects.get(PROJECTOR_PARENT_NAME)
     projector_light_emitter_obj = None
@@ -844,19 +2331,21 @@ def main_script_logic():
     
     if not (projector_parent_obj and projector_light_emitter_obj and image_tex_node and emission_node):
         print("\n严重失败：无法解析或创建相机或投影仪组件。脚本终止。")
-        return
+        return None
         
     print(f"相机 '{scanner_cam_obj.name}' 和投影仪 '{projector_parent_obj.name}' 位置已固定。")
 
     reference_plane_obj = add_reference_plane_world_position(scanner_cam_obj)
     if not reference_plane_obj:
         print("严重错误: 未能创建参考平面，无法进行物体放置。脚本终止。")
-        return
+        return None
 
     setup_render_settings()
     setup_compositor_nodes(depth_output_dir_abs)
+    install_render_timing_stats()
     
-    if not record_parameters_to_file(PARAMS_OUTPUT_FILE, scanner_cam_obj, projector_light_emitter_obj):
+    is_primary_worker = WORKER_SHARD_INDEX == 0
+    if is_primary_worker and not record_parameters_to_file(PARAMS_OUTPUT_FILE, scanner_cam_obj, projector_light_emitter_obj):
         print("严重警告：未能记录场景参数。后续的三维重建可能无法进行。")
 
     node_tree_to_modify = projector_light_emitter_obj.data.node_tree
@@ -873,6 +2362,9 @@ def main_script_logic():
         projector_light_emitter_obj.data.spot_size = math.radians(60.0)
         projector_light_emitter_obj.data.show_cone = True
 
+    if g_light_groups_active:
+        projector_light_emitter_obj.lightgroup = PROJECTOR_LIGHT_GROUP_NAME
+
     g_projector_internal_mapping_node = get_second_mapping_node_in_projector_group(
         projector_light_emitter_obj,
         PROJECTOR_NODE_GROUP_INSTANCE_NAME_IN_LIGHT,
@@ -884,141 +2376,374 @@ def main_script_logic():
         adjust_projector_texture_rotation_z(g_projector_internal_mapping_node, projector_pattern_rotation_z_deg)
     else:
         print(f"警告: 未能找到投影仪节点组内部的目标Mapping节点。")
-            
-    render_reference_plane_depth_only(depth_output_dir_abs)
-
-    pattern_render_id_counter = 0
-    ambient_render_id_counter = 0
-    current_stl_object_ref = None
 
-    for stl_idx, stl_file_path in enumerate(stl_file_paths):
-        print(f"\n--- 开始处理STL模型 {stl_idx + 1}/{len(stl_file_paths)}: {os.path.basename(stl_file_path)} ---")
-
-        projector_texture_scale_x = PROJECTOR_FOCAL_LENGTH_FIXED
-        projector_pattern_rotation_z_deg = PRJECTOR_PATTERN_ROTATION_Z_DEG
-        
-        min_strength = max(0, AMBIENT_STRENGTH_BASELINE - AMBIENT_STRENGTH_VARIATION)
-        max_strength = AMBIENT_STRENGTH_BASELINE + AMBIENT_STRENGTH_VARIATION
-        random_background_strength = random.uniform(min_strength, max_strength)
-        
-        if USE_DISCRETE_POWER_LEVELS:
-            current_projector_power = random.choice(PROJECTOR_POWER_LEVELS)
-        else:
-            min_power = max(0, PROJECTOR_POWER_NOMINAL - PROJECTOR_POWER_DRIFT)
-            max_power = PROJECTOR_POWER_NOMINAL + PROJECTOR_POWER_DRIFT
-            current_projector_power = random.uniform(min_power, max_power)
+    if PATTERN_SYNTHESIS_MODE:
+        # 投影仪映射 (焦距/旋转) 在整个运行中固定，UV节点组只需构建一次
+        if not build_projector_uv_node_group(projector_light_emitter_obj):
+            print("严重错误：图案合成模式需要投影仪UV节点组。脚本终止。")
+            return None
+        add_projector_uv_aov_to_material(reference_plane_obj.active_material)
             
-        print(f"   本轮随机参数: 投影仪功率={current_projector_power:.2f}, 环境光强度={random_background_strength:.2f}")
+    if is_primary_worker:
+        create_reference_plane_depth(depth_output_dir_abs, scanner_cam_obj)
+
+    return {
+        "abs_main_output_dir": abs_main_output_dir,
+        "pattern_image_files": pattern_image_files,
+        "scanner_cam_obj": scanner_cam_obj,
+        "projector_light_emitter_obj": projector_light_emitter_obj,
+        "image_tex_node": image_tex_node,
+        "emission_node": emission_node,
+        "reference_plane_obj": reference_plane_obj,
+        "rendered_view_ids": [],
+    }
 
-        random_z_rot_env_map = random.uniform(0.0, 360.0)
 
-        if current_stl_object_ref:
-            clear_object_by_name(current_stl_object_ref.name)
-        clear_object_by_name(f"{CURRENT_STL_TARGET_NAME}_ROOT")
+def render_stl_files(scene_ctx, stl_file_paths, stl_index_offset=0):
+    """Renders every view and pattern of the given STL files into a prepared scene."""
+    global projector_texture_scale_x, projector_pattern_rotation_z_deg, g_open_outputs
 
-        target_obj_root = import_and_prepare_stl(stl_file_path,
-                                                 CURRENT_STL_TARGET_NAME,
-                                                 STL_TARGET_LOCATION,
-                                                 STL_TARGET_LARGEST_DIMENSION)
-        if not target_obj_root:
-            print(f"错误：无法导入或准备STL模型 '{os.path.basename(stl_file_path)}'。跳过。")
-            continue
-        current_stl_object_ref = target_obj_root
+    abs_main_output_dir = scene_ctx["abs_main_output_dir"]
+    pattern_image_files = scene_ctx["pattern_image_files"]
+    projector_light_emitter_obj = scene_ctx["projector_light_emitter_obj"]
+    image_tex_node = scene_ctx["image_tex_node"]
+    emission_node = scene_ctx["emission_node"]
+    reference_plane_obj = scene_ctx["reference_plane_obj"]
+
+    current_stl_object_ref = None
+    views_per_stl = len(VIEW_Y_ANGLES_DEG) * len(VIEW_Z_ANGLES_DEG)
+    pattern_count = len(pattern_image_files)
+    # 出错时按打开的逆序关闭全部输出与辅助进程；正常结束时分片、索引和清单交给 finalize_outputs
+    with contextlib.ExitStack() as open_outputs:
+        open_run_naming(stl_index_offset + len(stl_file_paths), views_per_stl, pattern_count)
+        manifest = open_generation_manifest(pattern_count, views_per_stl)
+        open_outputs.callback(close_generation_manifest)
+        open_render_cache(scene_ctx)
+        open_image_writer()
+        open_outputs.callback(close_image_writer)
+        open_sample_index()
+        open_outputs.callback(close_sample_index)
+        open_shard_writer()
+        open_outputs.callback(close_shard_writer)
+        open_metadata_stream()
+        open_outputs.callback(close_metadata_stream)
+        pattern_file_extension = bpy.context.scene.render.file_extension
+
+        # 需要导入的STL (清单中未全部完成)，按处理顺序交给预取进程
+        import_queue = [
+            stl_file_path for stl_idx, stl_file_path in enumerate(stl_file_paths)
+            if not all(manifest.all_done(units, os.path.basename(stl_file_path))
+                       for _, units in stl_view_render_units(stl_index_offset + stl_idx, views_per_stl, pattern_count))]
+        import_position = 0
+        open_stl_prefetcher()
+        open_outputs.callback(close_stl_prefetcher)
+
+        for stl_idx, stl_file_path in enumerate(stl_file_paths):
+            global_stl_idx = stl_index_offset + stl_idx
+            stl_name = os.path.basename(stl_file_path)
+            print(f"\n--- 开始处理STL模型 {stl_idx + 1}/{len(stl_file_paths)}: {stl_name} ---")
+
+            stl_view_units = stl_view_render_units(global_stl_idx, views_per_stl, pattern_count)
+            if all(manifest.all_done(units, stl_name) for _, units in stl_view_units):
+                print(f"   清单记录该模型的全部 {views_per_stl} 个视角已完成，跳过导入。")
+                if PATTERN_SYNTHESIS_MODE:
+                    scene_ctx["rendered_view_ids"].extend(
+                        view_id for view_id, _ in stl_view_units if not manifest.is_done("synthesis", view_id, stl_name))
+                if any(view_sample_pending(view_id) for view_id, _ in stl_view_units):
+                    # 崩溃前未写完的分片/未提交的索引批次中的样本，从零散文件重新记录
+                    _, sample_params = draw_sample_params(stl_file_path)
+                    for view_idx, view_angles in enumerate(view_angle_list()):
+                        first_pattern_id, view_id = compute_render_ids(global_stl_idx, view_idx, views_per_stl, pattern_count)
+                        queue_view_sample(scene_ctx, stl_name, view_id, first_pattern_id, view_angles, sample_params)
+                continue
+
+            import_position += 1
+            if g_stl_prefetcher:
+                g_stl_prefetcher.schedule(import_queue[import_position:import_position + g_stl_prefetcher.depth])
+
+            projector_texture_scale_x = PROJECTOR_FOCAL_LENGTH_FIXED
+            projector_pattern_rotation_z_deg = PRJECTOR_PATTERN_ROTATION_Z_DEG
+
+            # 设置种子时随机参数只取决于种子和STL内容，与STL在文件夹中的位置无关
+            stl_rng, sample_params = draw_sample_params(stl_file_path)
+            current_projector_power = sample_params["projector_power"]
+            random_background_strength = sample_params["background_strength"]
+            random_z_rot_env_map = sample_params["environment_rotation_z"]
+            print(f"   本轮随机参数: 投影仪功率={current_projector_power:.2f}, 环境光强度={random_background_strength:.2f}")
+
+            if current_stl_object_ref:
+                clear_object_hierarchy(current_stl_object_ref.name)
+            clear_object_hierarchy(f"{CURRENT_STL_TARGET_NAME}_ROOT")
+
+            target_obj_root = import_and_prepare_stl(stl_file_path,
+                                                     CURRENT_STL_TARGET_NAME,
+                                                     STL_TARGET_LOCATION,
+                                                     STL_TARGET_LARGEST_DIMENSION,
+                                                     rng=stl_rng)
+            if not target_obj_root:
+                print(f"错误：无法导入或准备STL模型 '{os.path.basename(stl_file_path)}'。跳过。")
+                continue
+            current_stl_object_ref = target_obj_root
+            model_local_vertices = mesh_utils.root_space_vertices(target_obj_root)
+            material_params = target_obj_root["material_params"].to_dict()
+            # 缓存键取最终实例化的网格而非STL文件：读取器、焊接、网格简化和网格缓存版本变化时缓存随之失效
+            mesh_digest = mesh_utils.root_mesh_digest(target_obj_root) if g_render_cache is not None else None
+            cache_sample_params = dict(sample_params, material=material_params)
+            invalidate_persistent_render_data("导入新网格")
+
+            if PATTERN_SYNTHESIS_MODE:
+                for mesh_obj_child in target_obj_root.children:
+                    if mesh_obj_child.type == 'MESH':
+                        add_projector_uv_aov_to_material(mesh_obj_child.active_material)
         
-        if g_projector_internal_mapping_node:
-            adjust_projector_texture_scale_x(g_projector_internal_mapping_node, projector_texture_scale_x)
-            adjust_projector_texture_rotation_z(g_projector_internal_mapping_node, projector_pattern_rotation_z_deg)
+            if g_projector_internal_mapping_node:
+                adjust_projector_texture_scale_x(g_projector_internal_mapping_node, projector_texture_scale_x)
+                adjust_projector_texture_rotation_z(g_projector_internal_mapping_node, projector_pattern_rotation_z_deg)
         
-        setup_world_background(None, random_z_rot_env_map, random_background_strength)
-
-        initial_target_obj_matrix_world = target_obj_root.matrix_world.copy()
-        #y_angle_orientations_deg = [0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0]
-        #z_angle_orientations_deg = [0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0]
-        y_angle_orientations_deg = [0.0, 45.0]
-        z_angle_orientations_deg = [0.0]
-        total_views_for_model = len(y_angle_orientations_deg) * len(z_angle_orientations_deg)
-        current_view_count_for_model = 0
-
-        for y_rot_deg in y_angle_orientations_deg:
-            for z_rot_deg in z_angle_orientations_deg:
-                current_view_count_for_model += 1
-                print(f"\n   --- 模型 '{current_stl_object_ref.name}' - 视角 {current_view_count_for_model}/{total_views_for_model} (Y:{y_rot_deg}°, Z:{z_rot_deg}°) ---")
-
-                loc, rot_quat, scale = initial_target_obj_matrix_world.decompose()
-                mat_rot_Y_world = Matrix.Rotation(math.radians(y_rot_deg), 4, 'Y')
-                mat_rot_Z_world = Matrix.Rotation(math.radians(z_rot_deg), 4, 'Z')
-                target_obj_root.matrix_world = (Matrix.Translation(loc) @
-                                                mat_rot_Z_world @ mat_rot_Y_world @
-                                                rot_quat.to_matrix().to_4x4() @
-                                                Matrix.Diagonal(scale).to_4x4())
-                bpy.context.view_layer.update()
-
-                place_object_on_plane(target_obj_root, reference_plane_obj)
-
-                for pattern_idx, pattern_filepath in enumerate(pattern_image_files):
-                    pattern_render_id_counter += 1
-                    bpy.context.scene.frame_set(pattern_render_id_counter)
-                    output_filename_base_pattern = f"{pattern_render_id_counter:06d}_pattern"
-
-                    if bpy.context.scene.node_tree:
-                        depth_out_node = bpy.context.scene.node_tree.nodes.get("DepthOutputNode")
-                        if depth_out_node: depth_out_node.mute = False
-                    
+            setup_world_background(None, random_z_rot_env_map, random_background_strength)
+
+            initial_target_obj_matrix_world = target_obj_root.matrix_world.copy()
+            current_view_count_for_model = 0
+
+            for y_rot_deg in VIEW_Y_ANGLES_DEG:
+                for z_rot_deg in VIEW_Z_ANGLES_DEG:
+                    first_pattern_id, ambient_render_id = compute_render_ids(
+                        global_stl_idx, current_view_count_for_model, views_per_stl, pattern_count)
+                    current_view_count_for_model += 1
+                    print(f"\n   --- 模型 '{current_stl_object_ref.name}' - 视角 {current_view_count_for_model}/{views_per_stl} (Y:{y_rot_deg}°, Z:{z_rot_deg}°) ---")
+
+                    view_angles = (y_rot_deg, z_rot_deg)
+                    if manifest.all_done(view_render_units(first_pattern_id, ambient_render_id, pattern_count), stl_name):
+                        print("   清单记录该视角已完成，跳过。")
+                        if PATTERN_SYNTHESIS_MODE and not manifest.is_done("synthesis", ambient_render_id, stl_name):
+                            scene_ctx["rendered_view_ids"].append(ambient_render_id)
+                        queue_view_sample(scene_ctx, stl_name, ambient_render_id, first_pattern_id, view_angles, sample_params)
+                        continue
+                    ambient_pending = not manifest.is_done("ambient", ambient_render_id, stl_name)
+
+                    loc, rot_quat, scale = initial_target_obj_matrix_world.decompose()
+                    mat_rot_Y_world = Matrix.Rotation(math.radians(y_rot_deg), 4, 'Y')
+                    mat_rot_Z_world = Matrix.Rotation(math.radians(z_rot_deg), 4, 'Z')
+                    target_obj_root.matrix_world = (Matrix.Translation(loc) @
+                                                    mat_rot_Z_world @ mat_rot_Y_world @
+                                                    rot_quat.to_matrix().to_4x4() @
+                                                    Matrix.Diagonal(scale).to_4x4())
+                    bpy.context.view_layer.update()
+
+                    place_object_on_plane(target_obj_root, reference_plane_obj, model_local_vertices)
+                    # 随机参数记录在该视角第一个渲染单元记入清单之前写入并落盘
+                    record_metadata = functools.partial(record_view_metadata, view_metadata_record(
+                        stl_name, ambient_render_id, first_pattern_id, view_angles, sample_params,
+                        material_params, target_obj_root.matrix_world) if g_metadata_stream is not None else None)
+                    if current_view_count_for_model > 1:
+                        invalidate_persistent_render_data("切换视角")
+
+                    # 几何在图案之间不变：深度等几何通道每个视角用廉价的深度配置单独渲染一次，
+                    # 帧号即视角编号；其余渲染全部静音几何输出
+                    if not manifest.is_done("depth", ambient_render_id, stl_name):
+                        depth_output_paths = output_node_file_paths(GEOMETRY_OUTPUT_NODE_NAMES, ambient_render_id)
+                        if render_cached(render_cache_key("depth", mesh_digest, view_angles), depth_output_paths,
+                                         lambda: render_geometry_outputs_only(ambient_render_id)):
+                            mark_done_when_written("depth", ambient_render_id, stl_name,
+                                                   depth_output_paths, record_metadata)
+                
                     emission_node.inputs['Strength'].default_value = current_projector_power
                     if projector_light_emitter_obj:
                         projector_light_emitter_obj.hide_render = False
 
-                    project_and_render_via_nodes(
-                        image_tex_node, emission_node, pattern_filepath,
-                        output_filename_base_pattern,
-                        abs_main_output_dir
-                    )
-
-                ambient_render_id_counter += 1
-                bpy.context.scene.frame_set(ambient_render_id_counter)
-                output_filename_base_ambient = f"{ambient_render_id_counter:06d}_ambient"
+                    view_output_node_names = get_light_group_view_output_node_names()
+                    if PATTERN_SYNTHESIS_MODE:
+                        # 光照组模式下环境光随投影通道一起写出，缺少环境光时也要重渲染投影通道
+                        if (not manifest.is_done("projector_pass", ambient_render_id, stl_name) or
+                                (view_output_node_names and ambient_pending)):
+                            projector_pass_paths = output_node_file_paths(
+                                (PROJECTOR_PASS_OUTPUT_NODE_NAME,) + view_output_node_names, ambient_render_id)
+                            if render_cached(render_cache_key("projector_pass", mesh_digest, view_angles, cache_sample_params),
+                                             projector_pass_paths,
+                                             lambda: render_view_projector_pass(image_tex_node, ambient_render_id,
+                                                                                view_output_node_names)):
+                                mark_done_when_written("projector_pass", ambient_render_id, stl_name,
+                                                       projector_pass_paths, record_metadata)
+                                if view_output_node_names:
+                                    mark_done_when_written("ambient", ambient_render_id, stl_name,
+                                                           projector_pass_paths, record_metadata)
+                    else:
+                        for pattern_idx, pattern_source in enumerate(pattern_image_files):
+                            pattern_render_id = first_pattern_id + pattern_idx
+                            # 世界光照组环境光随第一张图案写出，'######' 取视角编号
+                            writes_view_outputs = pattern_idx == 0 and bool(view_output_node_names)
+                            if (manifest.is_done("pattern", pattern_render_id, stl_name) and
+                                    not (writes_view_outputs and ambient_pending)):
+                                continue
+
+                            output_filename_base_pattern = f"{pattern_render_id:06d}_pattern"
+                            pattern_output_paths = [os.path.join(abs_main_output_dir,
+                                                                 output_filename_base_pattern + pattern_file_extension)]
+                            if writes_view_outputs:
+                                pattern_output_paths += output_node_file_paths(view_output_node_names, ambient_render_id)
+                            pattern_cache_key = render_cache_key(
+                                "pattern+view_outputs" if writes_view_outputs else "pattern",
+                                mesh_digest, view_angles, cache_sample_params, pattern_source)
+
+                            # 光照组模式下第一张图案单独渲染 (帧号=视角编号)，其余图案才走动画
+                            if RENDER_PATTERNS_AS_ANIMATION and (pattern_idx > 0 or not view_output_node_names):
+                                if pattern_cache_key and g_render_cache.restore(pattern_cache_key, pattern_output_paths):
+                                    manifest.mark_done_if_written("pattern", pattern_render_id, stl_name,
+                                                                  pattern_output_paths, record_metadata)
+                                    continue
+                                if render_view_patterns_as_animation(
+                                        image_tex_node, pattern_image_files[pattern_idx:],
+                                        pattern_render_id, abs_main_output_dir):
+                                    # 动画渲染同步写出每一帧；缺帧的图案不记为完成，续跑时重渲染
+                                    for animated_idx in range(pattern_idx, pattern_count):
+                                        animated_id = first_pattern_id + animated_idx
+                                        animated_paths = [os.path.join(abs_main_output_dir,
+                                                                       f"{animated_id:06d}_pattern{pattern_file_extension}")]
+                                        if (manifest.mark_done_if_written("pattern", animated_id, stl_name,
+                                                                          animated_paths, record_metadata)
+                                                and g_render_cache is not None):
+                                            g_render_cache.store(
+                                                render_cache_key("pattern", mesh_digest, view_angles, cache_sample_params,
+                                                                 pattern_image_files[animated_idx]),
+                                                animated_paths)
+                                break
+
+                            bpy.context.scene.frame_set(ambient_render_id if writes_view_outputs else pattern_render_id)
+                            set_output_nodes_muted(view_output_node_names, not writes_view_outputs)
+                            set_render_timing_label("pattern")
+
+                            rendered = render_cached(
+                                pattern_cache_key, pattern_output_paths,
+                                lambda: project_and_render_via_nodes(
+                                    image_tex_node, emission_node, pattern_source,
+                                    output_filename_base_pattern,
+                                    abs_main_output_dir
+                                ))
+                            set_output_nodes_muted(view_output_node_names, True)
+                            if rendered:
+                                mark_done_when_written("pattern", pattern_render_id, stl_name,
+                                                       pattern_output_paths, record_metadata)
+                                if writes_view_outputs:
+                                    mark_done_when_written("ambient", ambient_render_id, stl_name,
+                                                           pattern_output_paths, record_metadata)
+
+                    if g_light_groups_active or not ambient_pending:
+                        scene_ctx["rendered_view_ids"].append(ambient_render_id)
+                        queue_view_sample(scene_ctx, stl_name, ambient_render_id, first_pattern_id, view_angles, sample_params)
+                        continue
+
+                    bpy.context.scene.frame_set(ambient_render_id)
+                    output_filename_base_ambient = f"{ambient_render_id:06d}_ambient"
                 
-                original_projector_strength = emission_node.inputs['Strength'].default_value
-                emission_node.inputs['Strength'].default_value = 0.0
+                    original_projector_strength = emission_node.inputs['Strength'].default_value
+                    emission_node.inputs['Strength'].default_value = 0.0
                 
-                if projector_light_emitter_obj:
-                    projector_light_emitter_obj.hide_render = True
+                    if projector_light_emitter_obj:
+                        projector_light_emitter_obj.hide_render = True
                     
-                if bpy.context.scene.node_tree:
-                    depth_out_node = bpy.context.scene.node_tree.nodes.get("DepthOutputNode")
-                    if depth_out_node: depth_out_node.mute = True
+                    if PATTERN_SYNTHESIS_MODE:
+                        set_output_nodes_muted((AMBIENT_PASS_OUTPUT_NODE_NAME,), False)
+                    set_render_timing_label("ambient")
+                    ambient_output_paths = [os.path.join(AMBIENT_RGB_OUTPUT_DIR,
+                                                         output_filename_base_ambient + pattern_file_extension)]
+                    if PATTERN_SYNTHESIS_MODE:
+                        ambient_output_paths += output_node_file_paths((AMBIENT_PASS_OUTPUT_NODE_NAME,), ambient_render_id)
                             
-                project_and_render_via_nodes(
-                    image_tex_node, emission_node,
-                    pattern_image_files[0],
-                    output_filename_base_ambient,
-                    AMBIENT_RGB_OUTPUT_DIR
-                )
+                    ambient_rendered = render_cached(
+                        render_cache_key("ambient", mesh_digest, view_angles, cache_sample_params), ambient_output_paths,
+                        lambda: project_and_render_via_nodes(
+                            image_tex_node, emission_node,
+                            pattern_image_files[0],
+                            output_filename_base_ambient,
+                            AMBIENT_RGB_OUTPUT_DIR
+                        ))
                 
-                emission_node.inputs['Strength'].default_value = original_projector_strength
-                if projector_light_emitter_obj:
-                    projector_light_emitter_obj.hide_render = False
-                if bpy.context.scene.node_tree:
-                    depth_out_node = bpy.context.scene.node_tree.nodes.get("DepthOutputNode")
-                    if depth_out_node: depth_out_node.mute = False
+                    emission_node.inputs['Strength'].default_value = original_projector_strength
+                    if projector_light_emitter_obj:
+                        projector_light_emitter_obj.hide_render = False
+                    set_output_nodes_muted((AMBIENT_PASS_OUTPUT_NODE_NAME,), True)
+                    if ambient_rendered:
+                        mark_done_when_written("ambient", ambient_render_id, stl_name,
+                                               ambient_output_paths, record_metadata)
+                    scene_ctx["rendered_view_ids"].append(ambient_render_id)
+                    queue_view_sample(scene_ctx, stl_name, ambient_render_id, first_pattern_id, view_angles, sample_params)
+
+        close_stl_prefetcher()
+        close_image_writer()
+        close_metadata_stream()
+        g_open_outputs = open_outputs.pop_all()
 
     if current_stl_object_ref:
         print(f"\n处理完所有STL，正在清理最后一个导入的模型: {current_stl_object_ref.name}")
-        clear_object_by_name(current_stl_object_ref.name)
+        clear_object_hierarchy(current_stl_object_ref.name)
 
     print("\n--- 所有STL模型处理完毕。 ---")
-    
-    print("\n开始对输出文件夹中的图像进行重命名...")
-    if abs_main_output_dir:
-        rename_files_sequentially(abs_main_output_dir, "pattern")
-    if depth_output_dir_abs:
-        print(f"提醒：深度图文件夹 '{depth_output_dir_abs}' 的重命名操作已跳过，以保留 'depth_reference_plane.exr'。")
-    if AMBIENT_RGB_OUTPUT_DIR:
-        rename_files_sequentially(AMBIENT_RGB_OUTPUT_DIR, "ambient")
+
+
+def finalize_outputs(scene_ctx):
+    """Reports stats, runs pattern synthesis and closes the outputs render_stl_files left open (also on error)."""
+    global g_open_outputs
+
+    open_outputs, g_open_outputs = g_open_outputs or contextlib.ExitStack(), None
+    with open_outputs:
+        abs_main_output_dir = scene_ctx["abs_main_output_dir"]
+
+        if g_render_timing_stats is not None:
+            g_render_timing_stats.report()
+            g_render_timing_stats.samples.clear()
+
+        if g_render_cache is not None:
+            print(f"渲染缓存: 命中 {g_render_cache.hits} 次, 未命中 {g_render_cache.misses} 次")
+        patterns = pattern_cache.get_pattern_cache()
+        if patterns.loads:
+            print(f"图案纹理缓存: 加载 {patterns.loads} 个图案 (其中 {patterns.compacted} 个转为8位), "
+                  f"占用 {patterns.total_bytes / 1024 ** 2:.1f} MB")
+
+        manifest = g_generation_manifest
+        if PATTERN_SYNTHESIS_MODE:
+            import pattern_synthesis
+
+            def mark_view_synthesized(view_id):
+                if manifest is not None:
+                    stl_name = manifest.completed.get(("projector_pass", view_id))
+                    manifest.mark_done("synthesis", view_id, stl_name)
+                pending_sample = scene_ctx.get("pending_samples", {}).pop(view_id, None)
+                if pending_sample is not None:
+                    store_view_sample(*pending_sample)
+
+            print("\n开始根据投影通道合成图案图像...")
+            pattern_synthesis.run_synthesis(
+                os.path.dirname(PROJECTOR_PASS_OUTPUT_DIR), image_pattern_folder,
+                view_ids=scene_ctx.get("rendered_view_ids"), pattern_output_dir=abs_main_output_dir,
+                png_color_depth=g_render_profile["png_color_depth"], view_done_callback=mark_view_synthesized,
+                patterns=[pattern.linear_pixels() for pattern in g_generated_patterns] if g_generated_patterns else None,
+                view_id_offset=g_run_naming.view_id_offset, pattern_id_offset=g_run_naming.pattern_id_offset)
+            scene_ctx["rendered_view_ids"] = []
 
     print("\n--- 脚本执行完毕。 ---")
 
 
+def main_script_logic(config_path=None):
+    print("开始结构光脚本 (STL批量处理模式)...")
+    apply_config_overrides(load_script_config(config_path))
+
+    if WORKER_STL_FILES is not None:
+        stl_file_paths = list(WORKER_STL_FILES)
+    else:
+        stl_file_paths = get_stl_files_from_folder(stl_model_folder)
+    if not stl_file_paths:
+        print("在指定的STL模型文件夹中没有找到STL模型。脚本终止。")
+        return
+    print(f"找到 {len(stl_file_paths)} 个STL模型。")
+
+    scene_ctx = prepare_scene()
+    if not scene_ctx:
+        return
+
+    render_stl_files(scene_ctx, stl_file_paths, WORKER_STL_INDEX_OFFSET)
+    finalize_outputs(scene_ctx)
+
+
 # --- 脚本入口点 ---
 if __name__ == "__main__":
     try: